@@ -0,0 +1,428 @@
+"""
+Cold-storage tiering of old messages.
+
+Read messages older than ``MESSAGE_HOT_DAYS`` are moved out of the main
+message table into one SQLite file per calendar month under
+``MESSAGE_ARCHIVE_DIR``, so the hot table and its indexes stay small enough to
+live in the page cache. The move attaches the month's file to the main
+connection and copies rows across with ``INSERT ... SELECT``; an
+``ArchivedMessageMonth`` row per conversation and month records where
+archived messages live, so reads only open the files a conversation actually
+has rows in.
+
+Unread messages are never archived, which keeps unread counts and
+``mark_read`` entirely on the hot table.
+
+Each file also carries its own FTS5 index, built like the main database's
+``api_message_fts`` (participants indexed as ``u<member id>`` tokens), so
+message search and the member export reach archived history too. Deleting
+an account removes its conversations from the files, index included, with
+``delete_conversation_month``.
+"""
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.models import Member, Message, ArchivedMessageMonth
+
+
+COLUMNS = 'id, sender_id, receiver_id, content, created_at, is_read'
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS {db}.message (
+        id INTEGER PRIMARY KEY,
+        sender_id INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        is_read BOOL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {db}.message_pair ON message (sender_id, receiver_id, id)",
+    """
+    CREATE VIEW IF NOT EXISTS {db}.message_fts_source AS
+    SELECT id, content, 'u' || sender_id || ' u' || receiver_id AS members FROM message
+    """,
+)
+
+# Created separately so that files archived before it existed get their
+# index built from the rows they already hold.
+FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE {db}.message_fts USING fts5(
+        content, members, content='message_fts_source', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+SEARCH_SQL = """
+    WITH hits AS (
+        SELECT rowid AS id FROM message_fts WHERE message_fts MATCH ? ORDER BY rowid DESC LIMIT ?
+    )
+    SELECT message.id, message.content, message.created_at FROM hits JOIN message ON message.id = hits.id
+"""
+
+
+def hot_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(days=settings.MESSAGE_HOT_DAYS)
+
+
+def archive_path(month):
+    return settings.MESSAGE_ARCHIVE_DIR / f"messages-{month:%Y-%m}.sqlite3"
+
+
+def _pair(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+def _month_bounds(month):
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    if month.month == 12:
+        end = start.replace(year=month.year + 1, month=1)
+    else:
+        end = start.replace(month=month.month + 1)
+    return start, end
+
+
+def archive_messages(cutoff=None, batch_size=1000, progress=None):
+    """
+    Move read messages created before ``cutoff`` into their monthly archive
+    files. Returns the number of messages moved.
+    """
+    cutoff = cutoff or hot_cutoff()
+    settings.MESSAGE_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    index_archives()
+
+    months = Message.objects.filter(created_at__lt=cutoff, is_read=True).datetimes(
+        'created_at', 'month', tzinfo=dt_timezone.utc
+    )
+    moved = 0
+    for start in months:
+        month = start.date()
+        start, end = _month_bounds(month)
+        moved += _archive_month(month, start, min(end, cutoff), batch_size, progress)
+    return moved
+
+
+def _create_schema(cursor):
+    for statement in SCHEMA:
+        cursor.execute(statement.format(db='archive'))
+    cursor.execute("SELECT 1 FROM archive.sqlite_master WHERE name = 'message_fts'")
+    if cursor.fetchone() is None:
+        cursor.execute(FTS_SCHEMA.format(db='archive'))
+        cursor.execute("INSERT INTO archive.message_fts (message_fts) VALUES ('rebuild')")
+
+
+def index_archives():
+    """
+    Give archive files written before they were searchable their search
+    index; returns how many were indexed
+    """
+    indexed = 0
+    with connection.cursor() as cursor:
+        for path in sorted(settings.MESSAGE_ARCHIVE_DIR.glob('messages-*.sqlite3')):
+            with closing(sqlite3.connect(path)) as db:
+                if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'message_fts'").fetchone():
+                    continue
+            cursor.execute("ATTACH DATABASE %s AS archive", [str(path)])
+            try:
+                with transaction.atomic():
+                    _create_schema(cursor)
+            finally:
+                cursor.execute("DETACH DATABASE archive")
+            indexed += 1
+    return indexed
+
+
+def _archive_month(month, start, end, batch_size, progress):
+    table = connection.ops.quote_name(Message._meta.db_table)
+    moved = 0
+    with connection.cursor() as cursor:
+        # ATTACH is refused inside a transaction, so it brackets the batches.
+        cursor.execute("ATTACH DATABASE %s AS archive", [str(archive_path(month))])
+        try:
+            with transaction.atomic():
+                _create_schema(cursor)
+
+            while True:
+                with transaction.atomic():
+                    rows = list(
+                        Message.objects.filter(created_at__gte=start, created_at__lt=end, is_read=True)
+                        .order_by('id')
+                        .values_list('id', 'sender_id', 'receiver_id')[:batch_size]
+                    )
+                    if not rows:
+                        break
+                    ids = [row[0] for row in rows]
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    # A batch that was copied but not deleted (e.g. a crash
+                    # between the two databases committing) is safe to redo:
+                    # rows already in the archive are neither copied nor
+                    # indexed again.
+                    cursor.execute(f"SELECT id FROM archive.message WHERE id IN ({placeholders})", ids)
+                    copied = {row[0] for row in cursor.fetchall()}
+                    new_ids = [message_id for message_id in ids if message_id not in copied]
+                    if new_ids:
+                        placeholders = ', '.join(['%s'] * len(new_ids))
+                        cursor.execute(
+                            f"INSERT INTO archive.message ({COLUMNS}) "
+                            f"SELECT {COLUMNS} FROM {table} WHERE id IN ({placeholders})",
+                            new_ids,
+                        )
+                        cursor.execute(
+                            f"INSERT INTO archive.message_fts (rowid, content, members) "
+                            f"SELECT id, content, members FROM archive.message_fts_source WHERE id IN ({placeholders})",
+                            new_ids,
+                        )
+                    _count_archived(month, [row for row in rows if row[0] not in copied])
+                    Message.objects.filter(id__in=ids).delete()
+                moved += len(rows)
+                if progress:
+                    progress(month, moved)
+        finally:
+            cursor.execute("DETACH DATABASE archive")
+    return moved
+
+
+def _count_archived(month, rows):
+    counts = {}
+    for _, sender_id, receiver_id in rows:
+        pair = _pair(sender_id, receiver_id)
+        counts[pair] = counts.get(pair, 0) + 1
+
+    ArchivedMessageMonth.objects.bulk_create(
+        [ArchivedMessageMonth(pair_low=low, pair_high=high, month=month) for low, high in counts],
+        ignore_conflicts=True,
+    )
+    for (low, high), count in counts.items():
+        ArchivedMessageMonth.objects.filter(pair_low=low, pair_high=high, month=month).update(
+            messages=F('messages') + count
+        )
+
+
+def delete_conversation_month(low, high, month):
+    """
+    Delete the archived messages between members ``low`` and ``high`` from
+    ``month``'s file, with their search index entries and their
+    ``ArchivedMessageMonth`` row. Returns the number of messages deleted.
+    """
+    path = archive_path(month)
+    deleted = 0
+    if path.exists():
+        with closing(sqlite3.connect(path, timeout=30)) as db:
+            # Overwrite the freed pages, so the content is gone from the file.
+            db.execute("PRAGMA secure_delete = ON")
+            pair = "(sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?)"
+            with db:
+                if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'message_fts'").fetchone():
+                    db.execute(
+                        "INSERT INTO message_fts (message_fts, rowid, content, members) "
+                        f"SELECT 'delete', id, content, members FROM message_fts_source WHERE id IN "
+                        f"(SELECT id FROM message WHERE {pair})",
+                        (low, high, high, low),
+                    )
+                deleted = db.execute(f"DELETE FROM message WHERE {pair}", (low, high, high, low)).rowcount
+    ArchivedMessageMonth.objects.filter(pair_low=low, pair_high=high, month=month).delete()
+    return deleted
+
+
+def _open(month):
+    path = archive_path(month)
+    if not path.exists():
+        return None
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def _datetime(value):
+    value = parse_datetime(value)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _message(row, members):
+    message_id, sender_id, receiver_id, content, created_at, is_read = row
+    return Message(
+        id=message_id,
+        sender=members[sender_id],
+        receiver=members[receiver_id],
+        content=content,
+        created_at=_datetime(created_at),
+        is_read=bool(is_read),
+    )
+
+
+def _member_months(member_id, other_id=None):
+    """
+    Months holding archived messages of ``member_id`` (with ``other_id``
+    only, if given), newest first
+    """
+    if other_id is None:
+        entries = ArchivedMessageMonth.objects.filter(Q(pair_low=member_id) | Q(pair_high=member_id))
+    else:
+        low, high = _pair(member_id, other_id)
+        entries = ArchivedMessageMonth.objects.filter(pair_low=low, pair_high=high)
+    return list(entries.order_by('-month').values_list('month', flat=True).distinct())
+
+
+def archived_count(member, other):
+    low, high = _pair(member.id, other.id)
+    total = ArchivedMessageMonth.objects.filter(pair_low=low, pair_high=high).aggregate(total=Sum('messages'))
+    return total['total'] or 0
+
+
+def conversation_messages(member, other, before=None, limit=50, after=None):
+    """
+    Return up to ``limit`` archived messages between two members with ids
+    below ``before`` and above ``after``, newest first
+    """
+    low, high = _pair(member.id, other.id)
+    months = ArchivedMessageMonth.objects.filter(pair_low=low, pair_high=high).values_list('month', flat=True)
+    members = {member.id: member, other.id: other}
+
+    messages = []
+    for month in months:
+        db = _open(month)
+        if db is None:
+            continue
+        with closing(db):
+            rows = db.execute(
+                f"SELECT {COLUMNS} FROM message "
+                "WHERE ((sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?)) "
+                "AND id < ? AND id > ? ORDER BY id DESC LIMIT ?",
+                (member.id, other.id, other.id, member.id, before or 2 ** 63 - 1, after or 0, limit - len(messages)),
+            ).fetchall()
+        messages.extend(_message(row, members) for row in rows)
+        if len(messages) >= limit:
+            break
+    return messages
+
+
+def cold_conversations(member, exclude=()):
+    """
+    Map partner id to the latest archived message for conversations of
+    ``member`` that have no hot messages left. Partners in ``exclude`` (those
+    already found in the hot table) are skipped without opening any archive.
+    """
+    latest = {}
+    entries = ArchivedMessageMonth.objects.filter(Q(pair_low=member.id) | Q(pair_high=member.id)).order_by('-month')
+    for low, high, month in entries.values_list('pair_low', 'pair_high', 'month'):
+        partner_id = high if low == member.id else low
+        if partner_id not in exclude and partner_id not in latest:
+            latest[partner_id] = month
+    if not latest:
+        return {}
+
+    members = Member.objects.in_bulk(list(latest) + [member.id])
+
+    by_month = {}
+    for partner_id, month in latest.items():
+        if partner_id in members:
+            by_month.setdefault(month, []).append(partner_id)
+
+    messages = {}
+    for month, partner_ids in by_month.items():
+        db = _open(month)
+        if db is None:
+            continue
+        with closing(db):
+            for partner_id in partner_ids:
+                row = db.execute(
+                    f"SELECT {COLUMNS} FROM message "
+                    "WHERE (sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?) "
+                    "ORDER BY id DESC LIMIT 1",
+                    (member.id, partner_id, partner_id, member.id),
+                ).fetchone()
+                if row:
+                    messages[partner_id] = _message(row, members)
+    return messages
+
+
+def member_message_rows(member):
+    """
+    Yield every archived message sent or received by ``member`` as a dict,
+    oldest month first, reading one month file at a time
+    """
+    partners = {}
+    entries = ArchivedMessageMonth.objects.filter(Q(pair_low=member.id) | Q(pair_high=member.id))
+    for low, high, month in entries.order_by('month').values_list('pair_low', 'pair_high', 'month'):
+        partners.setdefault(month, []).append(high if low == member.id else low)
+
+    for month, partner_ids in partners.items():
+        db = _open(month)
+        if db is None:
+            continue
+        with closing(db):
+            for partner_id in partner_ids:
+                rows = db.execute(
+                    f"SELECT {COLUMNS} FROM message "
+                    "WHERE (sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?)",
+                    (member.id, partner_id, partner_id, member.id),
+                )
+                for message_id, sender_id, receiver_id, content, created_at, is_read in rows:
+                    yield {
+                        'id': message_id,
+                        'sender_id': sender_id,
+                        'receiver_id': receiver_id,
+                        'content': content,
+                        'created_at': _datetime(created_at),
+                        'is_read': bool(is_read),
+                    }
+
+
+def search_candidates(member_id, match, limit, other_id=None, now=None):
+    """
+    ``[(id, content, age in days), ...]``: up to ``limit`` archived messages
+    of ``member_id`` matching the FTS5 expression ``match``, newest first.
+    Months are searched newest first until ``limit`` is reached.
+    """
+    now = now or timezone.now()
+    candidates = []
+    for month in _member_months(member_id, other_id):
+        db = _open(month)
+        if db is None:
+            continue
+        with closing(db):
+            if not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'message_fts'").fetchone():
+                continue
+            for message_id, content, created_at in db.execute(SEARCH_SQL, (match, limit - len(candidates))):
+                age = (now - _datetime(created_at)).total_seconds() / 86400
+                candidates.append((message_id, content, age))
+        if len(candidates) >= limit:
+            break
+    return candidates
+
+
+def messages_by_id(member, ids):
+    """
+    Map id to archived message for those of ``ids`` that ``member`` sent or
+    received
+    """
+    wanted = set(ids)
+    found = []
+    for month in _member_months(member.id):
+        if not wanted:
+            break
+        db = _open(month)
+        if db is None:
+            continue
+        with closing(db):
+            placeholders = ', '.join(['?'] * len(wanted))
+            rows = db.execute(
+                f"SELECT {COLUMNS} FROM message WHERE id IN ({placeholders}) AND (sender_id = ? OR receiver_id = ?)",
+                (*wanted, member.id, member.id),
+            ).fetchall()
+        found.extend(rows)
+        wanted.difference_update(row[0] for row in rows)
+
+    members = Member.objects.in_bulk({row[1] for row in found} | {row[2] for row in found})
+    return {
+        row[0]: _message(row, members)
+        for row in found if row[1] in members and row[2] in members
+    }
@@ -0,0 +1,252 @@
+"""
+Per-member change log for clients that mirror their friends, subscriptions,
+conversations and own posts locally.
+
+The views that change those collections append ``ChangeLogEntry`` rows for
+every member whose mirror is affected: "insert", "update" or "delete" of
+one object (a friend, a followed or following member, a conversation
+partner, a post) in one collection. ``GET /sync/?since=<token>`` reads the
+member's entries after the token with one range scan of the (member, id)
+index, collapses repeated changes to the same object, and returns the
+current state of every inserted or updated object. Work and payload grow
+with the number of changes, not with the size of the collections.
+
+A token is the id of the last entry the client has seen plus the time that
+entry was written. Entries are purged after ``SYNC_RETENTION_DAYS``, so a
+token older than that may have lost changes: the response then says
+``reset`` and the client refetches the full lists. It does so with the
+token it got in that response, so nothing that changes during the refetch
+is missed.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from api import tasks
+from api.models import ChangeLogEntry, Friendship, Member, Message, Post, Subscription
+from api.serializers import MemberSerializer, MessageSerializer, PostSerializer
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def record(member_ids, collection, object_id, op):
+    """
+    Log one change of ``object_id`` in ``collection`` for each member
+    """
+    if isinstance(member_ids, int):
+        member_ids = [member_ids]
+    now = timezone.now()
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(member_id=member_id, collection=collection, object_id=object_id, op=op, created_at=now)
+        for member_id in member_ids
+    ])
+
+
+def friendship(member_id, friend_id, op):
+    record(member_id, 'friends', friend_id, op)
+    record(friend_id, 'friends', member_id, op)
+
+
+def subscription(follower_id, following_id, op):
+    record(follower_id, 'following', following_id, op)
+    record(following_id, 'followers', follower_id, op)
+
+
+def conversation(member_id, partner_id):
+    record(member_id, 'conversations', partner_id, 'update')
+    if partner_id != member_id:
+        record(partner_id, 'conversations', member_id, 'update')
+
+
+def member_deleted(member_id):
+    """
+    Drop a deleted member from the subscription lists of everyone who has
+    them (their friends' lists were updated when the friendships were
+    dropped at deletion). Their audience is unbounded, so this runs as a
+    task, ahead of the purge that removes the subscriptions themselves.
+    """
+    forget_member_task.enqueue_on_commit(key=f'forget_member:{member_id}', member_id=member_id)
+
+
+@tasks.task(name='forget_member', priority=1)
+def forget_member_task(member_id):
+    _record_for_audience(member_id, 'delete', (
+        ('following', Subscription.objects.filter(following_id=member_id).values_list('follower_id', flat=True)),
+        ('followers', Subscription.objects.filter(follower_id=member_id).values_list('following_id', flat=True)),
+    ))
+
+
+def member_updated(member_id):
+    """
+    Log a profile change for everyone who mirrors the member as a friend,
+    a followed or a following member. Like a deletion, that audience is
+    unbounded, so it is written by a task; repeated edits while one is
+    queued coalesce, and the entries carry no data, only the id to refetch.
+    """
+    member_updated_task.enqueue_on_commit(key=f'member_updated:{member_id}', member_id=member_id)
+
+
+@tasks.task(name='member_updated', priority=1)
+def member_updated_task(member_id):
+    _record_for_audience(member_id, 'update', (
+        ('friends', Friendship.objects.filter(member_id=member_id).values_list('friend_id', flat=True)),
+        ('following', Subscription.objects.filter(following_id=member_id).values_list('follower_id', flat=True)),
+        ('followers', Subscription.objects.filter(follower_id=member_id).values_list('following_id', flat=True)),
+    ))
+
+
+def _record_for_audience(member_id, op, relations):
+    """
+    Log ``op`` of the member in each ``(collection, member ids)`` relation,
+    in batches so that no audience is held in memory at once
+    """
+    now = timezone.now()
+    for collection, member_ids in relations:
+        batch = []
+        for other_id in member_ids.iterator(chunk_size=2000):
+            batch.append(ChangeLogEntry(
+                member_id=other_id, collection=collection, object_id=member_id, op=op, created_at=now
+            ))
+            if len(batch) >= 2000:
+                ChangeLogEntry.objects.bulk_create(batch)
+                batch = []
+        ChangeLogEntry.objects.bulk_create(batch)
+
+
+def make_token(entry_id, written_at):
+    return f'{entry_id}.{int(written_at.timestamp())}'
+
+
+def parse_token(token):
+    try:
+        entry_id, written = token.split('.')
+        return int(entry_id), datetime.fromtimestamp(int(written), tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise InvalidToken(token)
+
+
+def current_token(member):
+    """
+    Token for "everything up to now", for a client about to fetch full lists
+    """
+    last = ChangeLogEntry.objects.filter(member=member).aggregate(last=Max('id'))['last']
+    return make_token(last or 0, timezone.now())
+
+
+def _collapse(entries):
+    """
+    The net change per object: an insert later updated is an insert, an
+    insert later deleted is nothing, a delete later re-inserted an update
+    """
+    net = {}
+    for entry in entries:
+        key = (entry.collection, entry.object_id)
+        first = net.pop(key, (entry.op, None))[0]
+        net[key] = (first, entry.op)
+    changes = []
+    for (collection, object_id), (first, last) in net.items():
+        if last == 'delete':
+            if first != 'insert':
+                changes.append((collection, object_id, 'delete'))
+        else:
+            changes.append((collection, object_id, 'insert' if first == 'insert' else 'update'))
+    return changes
+
+
+def _current_state(member, changes, request):
+    """
+    Serialized current state of the changed objects, ``{(collection, id): data}``;
+    objects that no longer belong to the collection are left out
+    """
+    wanted = {}
+    for collection, object_id, op in changes:
+        if op != 'delete':
+            wanted.setdefault(collection, set()).add(object_id)
+    state = {}
+
+    members = {}
+    if wanted.get('friends'):
+        ids = Friendship.objects.filter(member=member, friend_id__in=wanted['friends']).values_list('friend_id', flat=True)
+        members['friends'] = set(ids)
+    if wanted.get('following'):
+        ids = Subscription.objects.filter(follower=member, following_id__in=wanted['following']).values_list('following_id', flat=True)
+        members['following'] = set(ids)
+    if wanted.get('followers'):
+        ids = Subscription.objects.filter(following=member, follower_id__in=wanted['followers']).values_list('follower_id', flat=True)
+        members['followers'] = set(ids)
+    if members:
+        loaded = Member.objects.in_bulk(set().union(*members.values()))
+        for collection, ids in members.items():
+            for member_id in ids:
+                if member_id in loaded:
+                    state[(collection, member_id)] = MemberSerializer(loaded[member_id]).data
+
+    if wanted.get('posts'):
+        posts = Post.objects.filter(author=member, id__in=wanted['posts']).select_related(
+            'author', 'repost_of', 'repost_of__author'
+        )
+        for post in posts:
+            state[('posts', post.id)] = PostSerializer(post, context={'request': request}).data
+
+    if wanted.get('conversations'):
+        partners = Member.objects.in_bulk(wanted['conversations'])
+        unread = dict(
+            Message.objects.filter(receiver=member, sender_id__in=partners, is_read=False)
+            .values_list('sender_id').annotate(n=Count('id')).order_by()
+        )
+        for partner_id, partner in partners.items():
+            last_message = Message.objects.filter(
+                Q(sender=member, receiver_id=partner_id) | Q(sender_id=partner_id, receiver=member)
+            ).select_related('sender', 'receiver').order_by('-id').first()
+            if last_message is None:
+                continue
+            state[('conversations', partner_id)] = {
+                'member': MemberSerializer(partner).data,
+                'last_message': MessageSerializer(last_message).data,
+                'unread_count': unread.get(partner_id, 0),
+            }
+    return state
+
+
+def changes_since(member, token, request=None, limit=None):
+    """
+    The member's changes after ``token``, as the ``GET /sync/`` payload
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    since, written_at = parse_token(token)
+    if written_at < timezone.now() - timedelta(days=settings.SYNC_RETENTION_DAYS):
+        return {'reset': True, 'token': current_token(member), 'has_more': False, 'changes': []}
+
+    entries = list(ChangeLogEntry.objects.filter(member=member, id__gt=since).order_by('id')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    changes = _collapse(entries)
+    state = _current_state(member, changes, request)
+
+    results = []
+    for collection, object_id, op in changes:
+        data = state.get((collection, object_id))
+        if op == 'delete' or data is None:
+            # Gone again since it was logged (e.g. a deleted post or member).
+            results.append({'collection': collection, 'op': 'delete', 'id': object_id})
+        else:
+            results.append({'collection': collection, 'op': op, 'id': object_id, 'data': data})
+
+    if not entries:
+        next_token = make_token(since, timezone.now())
+    elif has_more:
+        # Entries after this page are at least as old as its last one.
+        next_token = make_token(entries[-1].id, entries[-1].created_at)
+    else:
+        next_token = make_token(entries[-1].id, timezone.now())
+    return {'reset': False, 'token': next_token, 'has_more': has_more, 'changes': results}
+
+
+@tasks.task(name='purge_change_log', every=3600)
+def purge_change_log():
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_RETENTION_DAYS)
+    ChangeLogEntry.objects.filter(created_at__lt=cutoff).delete()
@@ -0,0 +1,263 @@
+"""
+Deleting members and posts without one huge cascading transaction.
+
+A delete request tombstones the row (sets ``deleted_at``), which hides it
+from every default queryset at once, together with the rows that cascade
+from it directly and can themselves be tombstoned (a member's posts, the
+shares of a post), and records a ``DeletionJob``. A deleted member's
+friendship edges are dropped in the same transaction, so path searches,
+mutual friends and suggestions stop going through them at once. A
+background task then:
+
+* tombstones the rows further down (the shares of a deleted member's
+  posts), in batches;
+* purges every dependent row, deepest relations first, in batches of
+  ``DELETION_BATCH_SIZE`` primary keys, each batch in its own short
+  transaction with a pause in between so other writers get the lock;
+* for a member, deletes their conversations from the message archive files;
+* finally deletes the tombstoned row itself.
+
+Dependents are found generically from the model's reverse relations, so new
+models that point at members or posts are picked up without changes here.
+Relations that are ``SET_NULL`` are nulled in batches; any other
+``on_delete`` behaviour is left to Django's collector on the parent batch.
+State kept outside the rows is cleaned up by the ``BEFORE_DELETE`` hook of
+the model, run in the transaction of each batch: partners' unread counters
+for messages, stored files for uploads.
+A run stops after ``DELETION_TIME_SLICE_SECONDS`` and re-queues itself, and
+every batch is idempotent, so an interrupted purge simply carries on.
+"""
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api import archive, changelog, graph, inbox, tasks, uploads
+from api.models import ArchivedMessageMonth, DeletionJob, Member, Message, Upload
+
+
+# Called with the primary keys of each batch about to be deleted.
+BEFORE_DELETE = {
+    Message: inbox.messages_removed,
+    Upload: uploads.delete_files_on_commit,
+}
+
+
+def _unfriend(member_id):
+    friend_ids = graph.unfriend_all(member_id)
+    changelog.record(friend_ids, 'friends', member_id, 'delete')
+
+
+# Called with the primary key of an object being tombstoned, in the same
+# transaction.
+ON_TOMBSTONE = {
+    Member: _unfriend,
+}
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def _relations(model):
+    """
+    Reverse foreign keys and one-to-ones pointing at ``model``, including
+    hidden ones (``related_name='+'``)
+    """
+    return [
+        rel for rel in model._meta.get_fields(include_hidden=True)
+        if rel.auto_created and not rel.concrete and (rel.one_to_many or rel.one_to_one)
+    ]
+
+
+def is_tombstoned(model):
+    try:
+        model._meta.get_field('deleted_at')
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def _hidden_with(model):
+    """
+    Relations whose rows are tombstoned along with a ``model`` row
+    """
+    return [
+        rel for rel in _relations(model)
+        if rel.on_delete is models.CASCADE and is_tombstoned(rel.related_model)
+    ]
+
+
+def tombstone(obj, requested_by=None):
+    """
+    Hide ``obj`` immediately and schedule the purge of it and everything that
+    depends on it. Returns the ``DeletionJob``.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        type(obj)._base_manager.filter(pk=obj.pk).update(deleted_at=now)
+        obj.deleted_at = now
+        if type(obj) in ON_TOMBSTONE:
+            ON_TOMBSTONE[type(obj)](obj.pk)
+        for rel in _hidden_with(type(obj)):
+            rel.related_model._base_manager.filter(
+                **{rel.field.name: obj.pk, 'deleted_at__isnull': True}
+            ).update(deleted_at=now)
+        job = DeletionJob.objects.create(
+            model=obj._meta.label_lower, object_id=obj.pk, requested_by=requested_by
+        )
+        purge_task.enqueue_on_commit(key=f'purge_deleted:{job.id}', deletion_id=job.id)
+    return job
+
+
+def _batches(queryset, size):
+    """
+    Primary keys of ``queryset`` in batches, re-querying after each one since
+    the caller removes the rows it was given
+    """
+    while True:
+        batch = list(queryset.order_by().values_list('pk', flat=True)[:size])
+        if not batch:
+            return
+        yield batch
+
+
+class _Purge:
+    def __init__(self, job, deadline):
+        self.job = job
+        self.deadline = deadline
+        self.batch_size = settings.DELETION_BATCH_SIZE
+        self.pause = settings.DELETION_BATCH_PAUSE_SECONDS
+
+    def _step(self, current, rows):
+        DeletionJob.objects.filter(pk=self.job.pk).update(
+            rows_deleted=F('rows_deleted') + rows, current=current, updated_at=timezone.now()
+        )
+        time.sleep(self.pause)
+        if time.monotonic() >= self.deadline:
+            raise _OutOfTime
+
+    def hide(self, model, pks, hidden_at):
+        """
+        Tombstone the rows below ``pks`` at ``hidden_at``; returns how many.
+        Rows already hidden at that time (by ``tombstone`` or an earlier run)
+        are walked too, so their own dependents are reached, but batches with
+        nothing left to hide do not pause.
+        """
+        total = 0
+        for rel in _hidden_with(model):
+            related = rel.related_model
+            rows = related._base_manager.filter(
+                Q(deleted_at__isnull=True) | Q(deleted_at=hidden_at), **{f'{rel.field.name}__in': pks}
+            ).order_by('pk')
+            last = None
+            while True:
+                page = rows if last is None else rows.filter(pk__gt=last)
+                batch = list(page.values_list('pk', flat=True)[:self.batch_size])
+                if not batch:
+                    break
+                with transaction.atomic():
+                    hidden = related._base_manager.filter(
+                        pk__in=batch, deleted_at__isnull=True
+                    ).update(deleted_at=hidden_at)
+                hidden += self.hide(related, batch, hidden_at)
+                if hidden:
+                    self._step(f'hiding {related._meta.label}.{rel.field.name}', 0)
+                total += hidden
+                last = batch[-1]
+        return total
+
+    def purge(self, model, pks):
+        for rel in _relations(model):
+            related = rel.related_model
+            field = rel.field.name
+            rows = related._base_manager.filter(**{f'{field}__in': pks})
+            current = f'{related._meta.label}.{field}'
+            if rel.on_delete is models.SET_NULL:
+                for batch in _batches(rows, self.batch_size):
+                    with transaction.atomic():
+                        related._base_manager.filter(pk__in=batch).update(**{field: None})
+                    self._step(current, 0)
+            elif rel.on_delete is models.CASCADE:
+                before_delete = BEFORE_DELETE.get(related)
+                for batch in _batches(rows, self.batch_size):
+                    self.purge(related, batch)
+                    with transaction.atomic():
+                        if before_delete:
+                            before_delete(batch)
+                        deleted, _ = related._base_manager.filter(pk__in=batch).delete()
+                    self._step(current, deleted)
+
+    def purge_archive(self, member_id):
+        """
+        Delete the member's archived conversations, one file and partner at
+        a time
+        """
+        while True:
+            entry = (
+                ArchivedMessageMonth.objects.filter(Q(pair_low=member_id) | Q(pair_high=member_id))
+                .values_list('pair_low', 'pair_high', 'month').first()
+            )
+            if entry is None:
+                return
+            self._step('archived messages', archive.delete_conversation_month(*entry))
+
+
+def purge(job, time_slice=None):
+    """
+    Work on ``job`` for up to ``time_slice`` seconds. Returns ``True`` once
+    the object and all its dependents are gone.
+    """
+    time_slice = settings.DELETION_TIME_SLICE_SECONDS if time_slice is None else time_slice
+    model = apps.get_model(job.model)
+    now = timezone.now()
+    DeletionJob.objects.filter(pk=job.pk).update(status='running', updated_at=now, last_error='')
+    hidden_at = model._base_manager.filter(pk=job.object_id).values_list('deleted_at', flat=True).first()
+    run = _Purge(job, time.monotonic() + time_slice)
+    try:
+        run.hide(model, [job.object_id], hidden_at or now)
+        run.purge(model, [job.object_id])
+        if model is Member:
+            run.purge_archive(job.object_id)
+        with transaction.atomic():
+            deleted, _ = model._base_manager.filter(pk=job.object_id).delete()
+    except _OutOfTime:
+        return False
+    except Exception as exc:
+        DeletionJob.objects.filter(pk=job.pk).update(status='failed', last_error=str(exc), updated_at=timezone.now())
+        raise
+
+    now = timezone.now()
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status='done', rows_deleted=F('rows_deleted') + deleted, current='', updated_at=now, finished_at=now
+    )
+    return True
+
+
+@tasks.task(name='purge_deleted', priority=-1)
+def purge_task(deletion_id):
+    job = DeletionJob.objects.filter(pk=deletion_id).first()
+    if job is None or job.status == 'done':
+        return
+    if not purge(job):
+        purge_task.enqueue(key=f'purge_deleted:{job.id}', deletion_id=job.id)
+
+
+def progress(job):
+    """
+    Rows still to be purged for ``job``, per dependent relation. Counts run
+    over the tombstoned object's direct dependents only, so they are cheap.
+    """
+    model = apps.get_model(job.model)
+    remaining = {}
+    for rel in _relations(model):
+        if rel.on_delete is not models.CASCADE:
+            continue
+        count = rel.related_model._base_manager.filter(**{rel.field.name: job.object_id}).count()
+        if count:
+            remaining[f'{rel.related_model._meta.label}.{rel.field.name}'] = count
+    return remaining
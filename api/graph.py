@@ -0,0 +1,428 @@
+"""
+Compact in-memory social graph and friend suggestion scoring.
+
+The graph is held in CSR form: a sorted array of member ids, an ``indptr``
+array of row offsets and an ``indices`` array of neighbour positions, all
+``array('q')``. That is a few machine words per edge, compared with hundreds
+of bytes per edge for dicts of sets, which keeps a whole-network batch run
+within a single worker's memory.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from api import tasks
+from api.models import Member, FriendRequest, Friendship, Subscription, FriendSuggestion, SuggestionRefresh
+
+
+# A candidate followed by someone the member follows counts for half a mutual
+# friend.
+FOLLOW_WEIGHT = 0.5
+
+CHUNK_SIZE = 5000
+
+# Frontier members expanded per query by shortest_path.
+BFS_BATCH = 500
+
+
+class CSRGraph:
+    """
+    Adjacency lists for a fixed set of member ids in compressed sparse rows
+    """
+
+    def __init__(self, ids, indptr, indices):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, ids, edges, symmetric=False):
+        """
+        Build from ``(from_id, to_id)`` pairs. ``ids`` must be a sorted
+        ``array('q')``; edges touching unknown ids are ignored.
+        """
+        src, dst = array('q'), array('q')
+        for a, b in edges:
+            i, j = _position(ids, a), _position(ids, b)
+            if i < 0 or j < 0 or i == j:
+                continue
+            src.append(i)
+            dst.append(j)
+            if symmetric:
+                src.append(j)
+                dst.append(i)
+
+        n = len(ids)
+        indptr = array('q', bytes(8 * (n + 1)))
+        for i in src:
+            indptr[i + 1] += 1
+        for i in range(n):
+            indptr[i + 1] += indptr[i]
+
+        indices = array('q', bytes(8 * len(src)))
+        fill = array('q', indptr[:n])
+        for i, j in zip(src, dst):
+            indices[fill[i]] = j
+            fill[i] += 1
+
+        # Sort and de-duplicate each row so rows can be merged/intersected.
+        rows_indptr = array('q', [0])
+        rows = array('q')
+        for i in range(n):
+            rows.extend(sorted(set(indices[indptr[i]:indptr[i + 1]])))
+            rows_indptr.append(len(rows))
+        return cls(ids, rows_indptr, rows)
+
+    def position(self, member_id):
+        return _position(self.ids, member_id)
+
+    def neighbours(self, i):
+        """
+        Positions adjacent to position ``i``
+        """
+        if i < 0:
+            return ()
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+
+def _position(ids, member_id):
+    i = bisect_left(ids, member_id)
+    if i < len(ids) and ids[i] == member_id:
+        return i
+    return -1
+
+
+def friend_id_arrays(member_ids):
+    """
+    Map each of ``member_ids`` to a sorted ``array('q')`` of its friend ids,
+    using one query for the whole batch
+    """
+    friends = {member_id: array('q') for member_id in member_ids}
+    rows = Friendship.objects.filter(member_id__in=friends).order_by('member_id', 'friend_id')
+    for member_id, friend_id in rows.values_list('member_id', 'friend_id'):
+        friends[member_id].append(friend_id)
+    return friends
+
+
+def friend_id_array(member_id):
+    return friend_id_arrays([member_id])[member_id]
+
+
+def intersect_sorted(a, b):
+    """
+    Intersect two sorted id arrays. A linear merge is used for similar sizes;
+    when one side is much smaller its ids are binary-searched in the other.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    result = array('q')
+    if not a:
+        return result
+
+    if len(a) * 8 < len(b):
+        lo = 0
+        for value in a:
+            lo = bisect_left(b, value, lo)
+            if lo == len(b):
+                break
+            if b[lo] == value:
+                result.append(value)
+        return result
+
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            result.append(a[i])
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def shortest_path(source_id, target_id, max_hops=6, max_visits=10000):
+    """
+    Bidirectional BFS over friendships. Each step expands the smaller
+    frontier, ``BFS_BATCH`` members per query. The search stops once
+    ``max_hops`` levels are exceeded or ``max_visits`` friendship rows have
+    been read; every query is limited to the rows left in that budget, so a
+    dense neighbourhood cannot make a single step unbounded.
+
+    Returns ``(path, exhausted)``: ``path`` is the list of member ids from
+    source to target or ``None``; ``exhausted`` tells whether the search gave
+    up on budget rather than proving there is no path.
+    """
+    if source_id == target_id:
+        return [source_id], False
+
+    parents = ({source_id: None}, {target_id: None})
+    frontiers = ([source_id], [target_id])
+    hops = 0
+    budget = max_visits
+
+    while frontiers[0] and frontiers[1]:
+        if hops >= max_hops:
+            return None, True
+
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        own, other = parents[side], parents[1 - side]
+        frontier, next_frontier = frontiers[side], []
+        for start in range(0, len(frontier), BFS_BATCH):
+            if budget <= 0:
+                return None, True
+            rows = list(
+                Friendship.objects.filter(member_id__in=frontier[start:start + BFS_BATCH])
+                .values_list('member_id', 'friend_id')[:budget]
+            )
+            truncated = len(rows) == budget
+            budget -= len(rows)
+            for member_id, friend_id in rows:
+                if friend_id in own:
+                    continue
+                own[friend_id] = member_id
+                if friend_id in other:
+                    return _join_path(parents, friend_id), False
+                next_frontier.append(friend_id)
+            if truncated:
+                return None, True
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+        hops += 1
+
+    return None, False
+
+
+def _join_path(parents, meeting_id):
+    forward, backward = parents
+    path = []
+    node = meeting_id
+    while node is not None:
+        path.append(node)
+        node = forward[node]
+    path.reverse()
+    node = backward[meeting_id]
+    while node is not None:
+        path.append(node)
+        node = backward[node]
+    return path
+
+
+def member_ids():
+    return array('q', Member.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=CHUNK_SIZE))
+
+
+def friend_edges():
+    return Friendship.objects.values_list('member_id', 'friend_id').iterator(chunk_size=CHUNK_SIZE)
+
+
+def follow_edges():
+    return Subscription.objects.values_list('follower_id', 'following_id').iterator(chunk_size=CHUNK_SIZE)
+
+
+def open_requests():
+    return FriendRequest.objects.exclude(status='accepted').values_list('from_member_id', 'to_member_id')
+
+
+def request_edges():
+    return open_requests().iterator(chunk_size=CHUNK_SIZE)
+
+
+def rows_for(queryset, field, ids):
+    """
+    Rows of ``queryset`` whose ``field`` is one of ``ids``, queried
+    ``CHUNK_SIZE`` ids at a time to stay under SQLite's parameter limit
+    """
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield from queryset.filter(**{f'{field}__in': ids[start:start + CHUNK_SIZE]})
+
+
+class SuggestionEngine:
+    """
+    Score friends-of-friends candidates by mutual count over CSR graphs
+    """
+
+    def __init__(self, ids, friends, follows, requested, top_k=None):
+        self.top_k = top_k or settings.FRIEND_SUGGESTIONS_TOP_K
+        self.ids = ids
+        self.friends = friends
+        self.follows = follows
+        # Anyone with a pending or rejected request in either direction is
+        # never suggested.
+        self.requested = requested
+
+    @classmethod
+    def whole_network(cls, top_k=None):
+        ids = member_ids()
+        return cls(
+            ids,
+            CSRGraph.from_edges(ids, friend_edges()),
+            CSRGraph.from_edges(ids, follow_edges()),
+            CSRGraph.from_edges(ids, request_edges(), symmetric=True),
+            top_k,
+        )
+
+    @classmethod
+    def neighbourhood(cls, member_ids, top_k=None):
+        """
+        An engine that can only score ``member_ids``: it loads the edges
+        within two hops of them, which is all ``suggest`` looks at, instead
+        of the whole network
+        """
+        targets = set(member_ids)
+        friendships = Friendship.objects.values_list('member_id', 'friend_id')
+        friends = list(rows_for(friendships, 'member_id', targets))
+        friends += rows_for(friendships, 'member_id', {b for _, b in friends} - targets)
+
+        subscriptions = Subscription.objects.values_list('follower_id', 'following_id')
+        follows = list(rows_for(subscriptions, 'follower_id', targets))
+        follows += rows_for(subscriptions, 'follower_id', {b for _, b in follows} - targets)
+
+        requests = list(rows_for(open_requests(), 'from_member_id', targets))
+        requests += rows_for(open_requests(), 'to_member_id', targets)
+
+        seen = set(targets)
+        for a, b in friends + follows + requests:
+            seen.add(a)
+            seen.add(b)
+        # Deleted members drop out here, as they do from member_ids().
+        ids = array('q', sorted(rows_for(Member.objects.values_list('id', flat=True), 'id', seen)))
+        return cls(
+            ids,
+            CSRGraph.from_edges(ids, friends),
+            CSRGraph.from_edges(ids, follows),
+            CSRGraph.from_edges(ids, requests, symmetric=True),
+            top_k,
+        )
+
+    def suggest(self, i):
+        """
+        Return ``[(score, mutual_count, position), ...]`` for position ``i``
+        """
+        friends = self.friends.neighbours(i)
+        excluded = set(friends)
+        excluded.update(self.requested.neighbours(i))
+        excluded.add(i)
+
+        mutual = {}
+        for v in friends:
+            for w in self.friends.neighbours(v):
+                if w not in excluded:
+                    mutual[w] = mutual.get(w, 0) + 1
+
+        scores = {w: float(count) for w, count in mutual.items()}
+        for v in self.follows.neighbours(i):
+            for w in self.follows.neighbours(v):
+                if w not in excluded:
+                    scores[w] = scores.get(w, 0.0) + FOLLOW_WEIGHT
+
+        best = heapq.nlargest(self.top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, mutual.get(w, 0), w) for w, score in best]
+
+    def store(self, member_ids):
+        """
+        Replace stored suggestions for ``member_ids``; returns rows written
+        """
+        written = 0
+        for member_id in member_ids:
+            i = self.friends.position(member_id)
+            rows = [
+                FriendSuggestion(
+                    member_id=member_id,
+                    suggested_id=self.ids[w],
+                    mutual_count=mutual,
+                    score=score,
+                )
+                for score, mutual, w in self.suggest(i)
+            ]
+            with transaction.atomic():
+                FriendSuggestion.objects.filter(member_id=member_id).delete()
+                FriendSuggestion.objects.bulk_create(rows)
+            written += len(rows)
+        return written
+
+
+def refresh_suggestions(full=False, top_k=None):
+    """
+    Recompute suggestions for queued members, or for everyone when ``full``.
+    Returns ``(members_refreshed, rows_written)``.
+    """
+    queued = list(SuggestionRefresh.objects.values_list('member_id', 'queued_at'))
+
+    if full:
+        engine = SuggestionEngine.whole_network(top_k=top_k)
+        targets = list(engine.ids)
+    else:
+        targets = [member_id for member_id, _ in queued]
+        engine = SuggestionEngine.neighbourhood(targets, top_k=top_k)
+
+    written = engine.store(targets)
+
+    # Only clear entries that have not been re-queued while we were working.
+    for member_id, queued_at in queued:
+        SuggestionRefresh.objects.filter(member_id=member_id, queued_at=queued_at).delete()
+    return len(targets), written
+
+
+@tasks.task(name='refresh_suggestions', priority=-1)
+def refresh_suggestions_task():
+    refresh_suggestions()
+
+
+def mark_neighbourhood_changed(*member_ids):
+    """
+    Queue suggestion refreshes after a friendship between ``member_ids``
+    changed. The members themselves and their friends see different
+    candidates.
+    """
+    affected = set(member_ids)
+    affected.update(Friendship.objects.filter(member_id__in=member_ids).values_list('friend_id', flat=True))
+    _queue_refresh(affected)
+
+
+def unfriend_all(member_id):
+    """
+    Delete both directions of every friendship of ``member_id`` (a deleted
+    member) and queue suggestion refreshes around the former friends.
+    Returns their ids.
+    """
+    friend_ids = list(Friendship.friend_ids(member_id))
+    Friendship.objects.filter(Q(member_id=member_id) | Q(friend_id=member_id)).delete()
+    if friend_ids:
+        mark_neighbourhood_changed(*friend_ids)
+    return friend_ids
+
+
+def mark_follow_changed(follower_id, following_id):
+    """
+    Queue suggestion refreshes after ``follower_id`` followed or unfollowed
+    ``following_id``. Follow scores run through the members one follows, so
+    besides the two members this moves the scores of everyone following
+    ``follower_id``.
+    """
+    affected = {follower_id, following_id}
+    affected.update(Subscription.objects.filter(following_id=follower_id).values_list('follower_id', flat=True))
+    _queue_refresh(affected)
+
+
+def _queue_refresh(affected):
+    """
+    One refresh job, shared by all changes made within the delay, picks the
+    members up
+    """
+    affected = sorted(affected)
+    for start in range(0, len(affected), CHUNK_SIZE):
+        chunk = affected[start:start + CHUNK_SIZE]
+        SuggestionRefresh.objects.filter(member_id__in=chunk).delete()
+        SuggestionRefresh.objects.bulk_create(
+            [SuggestionRefresh(member_id=member_id) for member_id in chunk],
+            ignore_conflicts=True,
+        )
+    tasks.enqueue_on_commit(
+        'refresh_suggestions', key='refresh_suggestions', delay=settings.FRIEND_SUGGESTIONS_REFRESH_DELAY_SECONDS
+    )
@@ -0,0 +1,113 @@
+"""
+Password hashing and verification offloaded to a bounded process pool.
+
+PBKDF2 takes tens of milliseconds of pure CPU per call. Running it in a pool
+lets a gunicorn worker's other threads keep serving cheap requests, and lets
+logins use every core. Each worker process admits at most
+``PASSWORD_HASHING_MAX_PENDING`` hashing jobs at once, counted until a job
+actually leaves the pool; beyond that, requests are shed immediately with a
+503 so a login burst cannot queue up behind the pool and hold every thread.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Authentication is temporarily overloaded, please retry shortly.'
+    default_code = 'hashing_overloaded'
+    wait = 1
+
+
+_executor = None
+_executor_pid = None
+_executor_size = None
+_lock = threading.Lock()
+_pending = 0
+
+
+def _get_executor():
+    global _executor, _executor_pid, _executor_size
+    with _lock:
+        size = settings.PASSWORD_HASHING_PROCESSES
+        if _executor is not None and _executor_pid == os.getpid() and _executor_size != size:
+            # Resized (benchmarks, tests): jobs already queued still finish.
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _executor is None or _executor_pid != os.getpid():
+            # Workers run threads, so fork() is unsafe here; forkserver starts
+            # children from a clean single-threaded process.
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_PROCESSES,
+                mp_context=multiprocessing.get_context(method),
+                initializer=django.setup,
+            )
+            _executor_pid = os.getpid()
+            _executor_size = size
+        return _executor
+
+
+def shutdown():
+    """
+    Stop this process's pool, waiting for its jobs; the next hash starts a
+    new one
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None and _executor_pid == os.getpid():
+        executor.shutdown(wait=True)
+
+
+def _release(future=None):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _run(func, *args):
+    global _pending
+    if not settings.PASSWORD_HASHING_PROCESSES:
+        return func(*args)
+
+    with _lock:
+        if _pending >= settings.PASSWORD_HASHING_MAX_PENDING:
+            raise HashingOverloaded()
+        _pending += 1
+    try:
+        future = _get_executor().submit(func, *args)
+    except BaseException:
+        _release()
+        raise
+    # The job is only released once it finishes, not when its caller stops
+    # waiting: one that outlives the timeout still holds a pool process.
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=settings.PASSWORD_HASHING_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise HashingOverloaded()
+
+
+def pending():
+    """
+    Number of hashing jobs currently admitted in this process
+    """
+    return _pending
+
+
+def make_password(raw_password):
+    return _run(hashers.make_password, raw_password)
+
+
+def check_password(raw_password, encoded):
+    return _run(hashers.check_password, raw_password, encoded)
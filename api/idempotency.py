@@ -0,0 +1,178 @@
+"""
+``Idempotency-Key`` support for mutating endpoints that clients retry.
+
+The first request with a given key claims an ``IdempotencyKey`` row (unique
+on member and key) in state ``processing``, runs the view and stores the
+response. A retry with the same key gets the stored response back, marked
+with ``Idempotent-Replayed: true``, without the view or its models being
+touched. A duplicate that arrives while the first is still running polls
+the row until it completes, up to ``IDEMPOTENCY_WAIT_SECONDS``, then gets
+409. Reusing a key for a different request body is a 422.
+
+A claim whose request crashed (still ``processing`` after
+``IDEMPOTENCY_LOCK_SECONDS``) is taken over by the next retry. Server
+errors are not stored, so they can be retried. Keys expire after
+``IDEMPOTENCY_TTL_HOURS`` and are purged hourly. So that one client minting
+a fresh key per request cannot grow the table without bound in between,
+each new claim also evicts the member's oldest completed keys beyond
+``IDEMPOTENCY_MAX_KEYS_PER_MEMBER``; a retry of an evicted key runs again.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from api import tasks
+from api.models import IdempotencyKey, Member
+
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# How often a duplicate checks whether the first request has finished.
+POLL_INTERVAL = 0.05
+
+
+def fingerprint(request, kwargs):
+    """
+    Digest of what the request asks for, so a key cannot be reused for a
+    different request
+    """
+    payload = json.dumps(
+        [request.method, request.path, kwargs, request.data], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _evict(member):
+    """
+    Delete the member's completed keys beyond the newest
+    ``IDEMPOTENCY_MAX_KEYS_PER_MEMBER``
+    """
+    evicted = list(
+        IdempotencyKey.objects.filter(member=member, status='complete')
+        .order_by('-created_at', '-pk')
+        .values_list('pk', flat=True)[settings.IDEMPOTENCY_MAX_KEYS_PER_MEMBER:]
+    )
+    if evicted:
+        IdempotencyKey.objects.filter(pk__in=evicted).delete()
+
+
+def _claim(member, key, digest):
+    """
+    Take ownership of ``key``. Returns ``(record, owned)``.
+    """
+    now = timezone.now()
+    record = IdempotencyKey(
+        member=member, key=key, fingerprint=digest, created_at=now,
+        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    )
+    try:
+        with transaction.atomic():
+            record.save()
+    except IntegrityError:
+        pass
+    else:
+        _evict(member)
+        return record, True
+
+    existing = IdempotencyKey.objects.filter(member=member, key=key).first()
+    if existing is None:
+        return _claim(member, key, digest)
+    abandoned = existing.status == 'processing' and existing.created_at < now - timedelta(
+        seconds=settings.IDEMPOTENCY_LOCK_SECONDS
+    )
+    if existing.expires_at <= now or abandoned:
+        # Only one of several retries can win the takeover.
+        taken = IdempotencyKey.objects.filter(
+            pk=existing.pk, status=existing.status, created_at=existing.created_at
+        ).update(
+            fingerprint=digest, status='processing', response_status=None, response_body=None,
+            created_at=now, expires_at=record.expires_at,
+        )
+        if taken:
+            existing.refresh_from_db()
+            return existing, True
+        existing.refresh_from_db()
+    return existing, False
+
+
+def _wait(record):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while record.status == 'processing' and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+        if record is None:
+            return None
+    return record
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Honour the ``Idempotency-Key`` header on a view method. Safe methods
+    and requests without the header are passed straight through.
+    """
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or request.method in ('GET', 'HEAD', 'OPTIONS') or not isinstance(request.user, Member):
+            return view(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = fingerprint(request, kwargs)
+        record, owned = _claim(request.user, key, digest)
+        if not owned:
+            if record.fingerprint != digest:
+                return Response(
+                    {"detail": f"{HEADER} was already used for a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            record = _wait(record)
+            if record is None:
+                # The first request failed and released the key: run again.
+                return wrapper(self, request, *args, **kwargs)
+            if record.status == 'processing':
+                return Response(
+                    {"detail": f"A request with this {HEADER} is still being processed"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return _replay(record)
+
+        try:
+            response = view(self, request, *args, **kwargs)
+        except BaseException:
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            raise
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            return response
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status='complete',
+            response_status=response.status_code,
+            response_body=json.loads(json.dumps(response.data, default=str)),
+        )
+        return response
+    return wrapper
+
+
+@tasks.task(name='purge_idempotency_keys', every=3600)
+def purge_idempotency_keys():
+    IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).delete()
@@ -0,0 +1,278 @@
+"""
+Streaming bulk import of members, posts and the social graph.
+
+Records flow through a chain of generators (read -> skip -> batch -> prepare)
+so that only one batch is held in memory at a time. Each batch is written with
+``bulk_create`` inside its own transaction together with the checkpoint row,
+which makes an interrupted import resumable without duplicating rows.
+"""
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from api import tags
+from api.models import Member, Post, FriendRequest, Friendship, Subscription, ImportCheckpoint
+
+
+KINDS = ('members', 'posts', 'friendships', 'subscriptions')
+
+# Unique key of each imported model that has one.
+UNIQUE_KEYS = {
+    Member: ('username',),
+    FriendRequest: ('pair_low', 'pair_high'),
+    Subscription: ('follower_id', 'following_id'),
+}
+
+
+def read_records(path):
+    """
+    Yield records from a JSONL or CSV file one at a time
+    """
+    with open(path, newline='', encoding='utf-8') as fh:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(fh)
+        else:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(records, size):
+    """
+    Group an iterable into lists of at most ``size`` records
+    """
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _hash_password(raw_password):
+    # No password gives an unusable hash, not the hash of an empty one.
+    return make_password(raw_password or None)
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    return parse_datetime(value)
+
+
+def _member_ids(usernames):
+    return dict(
+        Member.objects.filter(username__in=set(usernames)).values_list('username', 'id')
+    )
+
+
+class Importer:
+    """
+    Import one file of a given kind, resuming from its checkpoint
+    """
+
+    def __init__(self, kind, path, name=None, batch_size=1000, processes=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        self.kind = kind
+        self.path = path
+        self.name = name or f"{kind}:{path}"
+        self.batch_size = batch_size
+        self.processes = processes
+
+    def checkpoint(self):
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            name=self.name, defaults={'kind': self.kind}
+        )
+        return checkpoint
+
+    def run(self, progress=None):
+        checkpoint = self.checkpoint()
+        records = islice(read_records(self.path), checkpoint.records_done, None)
+
+        executor = None
+        if self.kind == 'members':
+            executor = ProcessPoolExecutor(max_workers=self.processes, initializer=django.setup)
+
+        try:
+            for batch, objects in self._prepared_batches(batched(records, self.batch_size), executor):
+                with transaction.atomic():
+                    written = self._write(objects)
+                    checkpoint.records_done += len(batch)
+                    checkpoint.records_skipped += len(batch) - written
+                    checkpoint.save(update_fields=['records_done', 'records_skipped', 'updated_at'])
+                if progress:
+                    progress(checkpoint)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        return checkpoint
+
+    def _prepared_batches(self, batches, executor):
+        """
+        Turn raw batches into model instances. For members, the password
+        hashing of the next batch is submitted to the pool before the current
+        one is handed back, so hashing overlaps with the database writes.
+        """
+        if executor is None:
+            for batch in batches:
+                yield batch, self._build(batch)
+            return
+
+        pending = None
+        for batch in batches:
+            raws = [r.get('password') for r in batch if not r.get('password_hash')]
+            future = executor.map(_hash_password, raws, chunksize=max(1, len(raws) // 32))
+            if pending:
+                yield pending[0], self._build_members(*pending)
+            pending = (batch, future)
+        if pending:
+            yield pending[0], self._build_members(*pending)
+
+    def _build(self, batch):
+        if self.kind == 'posts':
+            return self._build_posts(batch)
+        if self.kind == 'friendships':
+            return self._build_friendships(batch)
+        return self._build_subscriptions(batch)
+
+    def _build_members(self, batch, hashes):
+        hashes = iter(hashes)
+        members = []
+        for record in batch:
+            password = record.get('password_hash') or next(hashes)
+            member = Member(
+                username=record['username'],
+                password=password,
+                email=record.get('email', ''),
+                first_name=record.get('first_name', ''),
+                last_name=record.get('last_name', ''),
+                avatar_url=record.get('avatar_url') or None,
+                bio=record.get('bio', ''),
+            )
+            date_joined = _parse_datetime(record.get('date_joined'))
+            if date_joined:
+                member.date_joined = date_joined
+                member.last_seen = date_joined
+            members.append(member)
+        return members
+
+    def _build_posts(self, batch):
+        ids = _member_ids(r['author'] for r in batch)
+        posts = []
+        for record in batch:
+            author_id = ids.get(record['author'])
+            if author_id is None:
+                continue
+            post = Post(
+                author_id=author_id,
+                content=record.get('content', ''),
+                image_url=record.get('image_url') or None,
+                video_url=record.get('video_url') or None,
+            )
+            created_at = _parse_datetime(record.get('created_at'))
+            if created_at:
+                post.created_at = created_at
+            posts.append(post)
+        return posts
+
+    def _build_friendships(self, batch):
+        ids = _member_ids([r['from'] for r in batch] + [r['to'] for r in batch])
+        requests = []
+        for record in batch:
+            from_id, to_id = ids.get(record['from']), ids.get(record['to'])
+            if from_id is None or to_id is None or from_id == to_id:
+                continue
+            friend_request = FriendRequest(
+                from_member_id=from_id,
+                to_member_id=to_id,
+                status=record.get('status') or 'accepted',
+            )
+            friend_request.pair_low, friend_request.pair_high = FriendRequest.pair_key(from_id, to_id)
+            created_at = _parse_datetime(record.get('created_at'))
+            if created_at:
+                friend_request.created_at = created_at
+            requests.append(friend_request)
+        return requests
+
+    def _build_subscriptions(self, batch):
+        ids = _member_ids([r['follower'] for r in batch] + [r['following'] for r in batch])
+        subscriptions = []
+        for record in batch:
+            follower_id, following_id = ids.get(record['follower']), ids.get(record['following'])
+            if follower_id is None or following_id is None or follower_id == following_id:
+                continue
+            subscription = Subscription(follower_id=follower_id, following_id=following_id)
+            created_at = _parse_datetime(record.get('created_at'))
+            if created_at:
+                subscription.created_at = created_at
+            subscriptions.append(subscription)
+        return subscriptions
+
+    def _write(self, objects):
+        """
+        Insert the objects whose unique key is not taken yet and return how
+        many were inserted
+        """
+        if not objects:
+            return 0
+        model = type(objects[0])
+        # Members, friend requests and subscriptions carry unique keys, so rows
+        # that already exist (e.g. from a previous partial run) or repeat
+        # within the batch are skipped. They are left out here rather than by
+        # the insert, which would not say how many it dropped; the insert still
+        # ignores conflicts in case another writer got there first. Posts have
+        # no key, and inserting them plainly gives them their ids back.
+        new = self._new_objects(model, objects)
+        model.objects.bulk_create(new, batch_size=self.batch_size, ignore_conflicts=model in UNIQUE_KEYS)
+
+        if model is FriendRequest:
+            self._link_friendships(objects)
+        elif model is Post:
+            # Bulk inserts bypass the views, which index a post's tags and
+            # mentions as it is saved.
+            tags.index_new_posts(new)
+        return len(new)
+
+    def _new_objects(self, model, objects):
+        fields = UNIQUE_KEYS.get(model)
+        if fields is None:
+            return objects
+        keys = {tuple(getattr(obj, field) for field in fields) for obj in objects}
+        # Tombstoned rows still hold their key, hence the base manager.
+        stored = model._base_manager.filter(**{
+            f'{field}__in': {key[i] for key in keys} for i, field in enumerate(fields)
+        }).values_list(*fields)
+        taken = {key for key in stored if key in keys}
+
+        new = []
+        for obj in objects:
+            key = tuple(getattr(obj, field) for field in fields)
+            if key not in taken:
+                taken.add(key)
+                new.append(obj)
+        return new
+
+    def _link_friendships(self, requests):
+        # Link from what is stored rather than from the batch, since a
+        # conflicting row that was skipped may carry a different status.
+        pairs = {(r.pair_low, r.pair_high) for r in requests}
+        accepted = FriendRequest.objects.filter(
+            status='accepted',
+            pair_low__in={low for low, _ in pairs},
+            pair_high__in={high for _, high in pairs},
+        ).values_list('pair_low', 'pair_high', 'created_at')
+
+        edges = []
+        for low, high, created_at in accepted:
+            if (low, high) in pairs:
+                edges.append(Friendship(member_id=low, friend_id=high, created_at=created_at))
+                edges.append(Friendship(member_id=high, friend_id=low, created_at=created_at))
+        Friendship.objects.bulk_create(edges, batch_size=self.batch_size, ignore_conflicts=True)
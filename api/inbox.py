@@ -0,0 +1,100 @@
+"""
+Maintained count of each member's unread messages.
+
+Sending a message increments the receiver's ``InboxCounter`` and marking one
+read decrements it, each in the same transaction as the message change, so
+polling the unread count is a primary-key read instead of a ``COUNT`` over
+the inbox. Marking read is a conditional ``UPDATE ... WHERE is_read = 0``,
+so marking the same message twice only decrements once.
+
+A member's counter is created from an exact count the first time it is
+needed. The account deletion purge calls ``messages_removed`` for each batch
+of messages it deletes, so the partners' counters stay exact; ``reconcile``
+recomputes any counter that drifted anyway and runs daily.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from api import tasks
+from api.models import InboxCounter, Message
+
+
+def _count(member_id):
+    return Message.objects.filter(receiver_id=member_id, is_read=False).count()
+
+
+def _initialise(member_id):
+    counter, _ = InboxCounter.objects.get_or_create(member_id=member_id, defaults={'unread': _count(member_id)})
+    return counter
+
+
+def unread(member_id):
+    value = InboxCounter.objects.filter(pk=member_id).values_list('unread', flat=True).first()
+    if value is None:
+        value = _initialise(member_id).unread
+    return value
+
+
+def message_received(member_id):
+    """
+    Count a new unread message; call in the transaction that creates it
+    """
+    if not InboxCounter.objects.filter(pk=member_id).update(unread=F('unread') + 1):
+        _initialise(member_id)
+
+
+def mark_read(message):
+    """
+    Mark ``message`` read. Returns ``False`` if it already was.
+    """
+    with transaction.atomic():
+        changed = Message.objects.filter(pk=message.pk, is_read=False).update(is_read=True)
+        if changed:
+            InboxCounter.objects.filter(pk=message.receiver_id, unread__gt=0).update(unread=F('unread') - 1)
+    message.is_read = True
+    return bool(changed)
+
+
+def messages_removed(message_ids):
+    """
+    Discount the unread ones among ``message_ids`` from their receivers'
+    counters; call in the transaction that deletes them
+    """
+    unread = (
+        Message.objects.filter(pk__in=message_ids, is_read=False)
+        .values('receiver_id').annotate(n=Count('id')).values_list('receiver_id', 'n')
+    )
+    for receiver_id, count in unread:
+        InboxCounter.objects.filter(pk=receiver_id).update(unread=Greatest(F('unread') - count, Value(0)))
+
+
+def _exact():
+    return Coalesce(
+        Subquery(
+            Message.objects.filter(receiver_id=OuterRef('member_id'), is_read=False)
+            .values('receiver_id').annotate(n=Count('id')).values('n')
+        ),
+        Value(0),
+    )
+
+
+def reconcile(fix=True):
+    """
+    Compare every counter with the messages it counts and, with ``fix``,
+    reset the ones that drifted. Returns ``[(member_id, stored, actual)]``.
+    """
+    drifted = list(
+        InboxCounter.objects.annotate(actual=_exact()).exclude(unread=F('actual'))
+        .values_list('member_id', 'unread', 'actual')
+    )
+    if fix:
+        for member_id, _, _ in drifted:
+            # Recounted inside the UPDATE, so messages sent meanwhile are not lost.
+            InboxCounter.objects.filter(pk=member_id).update(unread=_exact())
+    return drifted
+
+
+@tasks.task(name='reconcile_inbox_counters', priority=-1, every=24 * 3600)
+def reconcile_inbox_counters():
+    reconcile()
@@ -0,0 +1,224 @@
+"""
+Optional write-behind buffering of likes (``LIKE_WRITE_BEHIND``).
+
+In this mode a like or unlike does not touch the main database's write lock.
+It is appended to a small, separate SQLite file in WAL mode with
+``synchronous=FULL``, so an acknowledged click survives a crash, and the
+request returns at once with an estimated count. The ``flush_likes`` task
+later applies the buffer to ``Like`` in one transaction per batch, with
+bulk inserts (``ignore_conflicts``, so the unique (member, post) pair still
+holds) and per-post bulk deletes, records trending and notification events
+for the likes it inserts, then drops the applied events from the buffer.
+
+Events are state assertions ("member M likes post P: yes/no") and only the
+last one per pair matters. Applying a batch is idempotent, so a flush
+interrupted between the two databases is simply repeated.
+
+Reads see buffered state: whether a member likes a post is the last
+buffered event for the pair, else the ``Like`` table. A post's count is a
+base count stored by the flusher plus the net of its unflushed events, so
+it costs no ``COUNT(*)`` on the main database for busy posts.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from api import notifications, tasks, trending
+from api.models import Like, Member, Post
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    op INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_post_member ON events (post_id, member_id, id);
+CREATE TABLE IF NOT EXISTS counts (
+    post_id INTEGER PRIMARY KEY,
+    likes INTEGER NOT NULL,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+# Base counts untouched for this long are dropped, so that likes removed
+# outside the buffer (e.g. by account deletion) stop skewing the estimate;
+# the next read of such a post counts Like rows again.
+COUNT_TTL_SECONDS = 3600
+
+_local = threading.local()
+
+
+def enabled():
+    return settings.LIKE_WRITE_BEHIND
+
+
+def _connect():
+    """
+    This thread's connection to the buffer, created on first use
+    """
+    path = str(settings.LIKE_BUFFER_PATH)
+    db = getattr(_local, 'db', None)
+    if db is not None and _local.path == path:
+        return db
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=FULL")
+    db.executescript(SCHEMA)
+    _local.db, _local.path = db, path
+    return db
+
+
+@contextmanager
+def _write():
+    db = _connect()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def _buffered_state(db, member_id, post_id):
+    row = db.execute(
+        "SELECT op FROM events WHERE post_id = ? AND member_id = ? ORDER BY id DESC LIMIT 1",
+        (post_id, member_id),
+    ).fetchone()
+    return None if row is None else row[0] > 0
+
+
+def is_liked(member_id, post_id):
+    state = _buffered_state(_connect(), member_id, post_id)
+    if state is not None:
+        return state
+    return Like.objects.filter(member_id=member_id, post_id=post_id).exists()
+
+
+def likes_count(post_id):
+    db = _connect()
+    row = db.execute(
+        "SELECT (SELECT likes FROM counts WHERE post_id = ?), "
+        "(SELECT coalesce(sum(op), 0) FROM events WHERE post_id = ?)",
+        (post_id, post_id),
+    ).fetchone()
+    base, pending = row
+    if base is None:
+        base = Like.objects.filter(post_id=post_id).count()
+    return max(base + pending, 0)
+
+
+def toggle(member_id, post_id, liked):
+    """
+    Buffer a like (``liked=True``) or unlike. Returns ``(changed, count)``;
+    ``changed`` is false when the member already was in that state.
+    """
+    with _write() as db:
+        current = _buffered_state(db, member_id, post_id)
+        if current is None:
+            current = Like.objects.filter(member_id=member_id, post_id=post_id).exists()
+        changed = current != liked
+        if changed:
+            db.execute(
+                "INSERT INTO events (member_id, post_id, op, created_at) VALUES (?, ?, ?, ?)",
+                (member_id, post_id, 1 if liked else -1, time.time()),
+            )
+    return changed, likes_count(post_id)
+
+
+def pending():
+    row = _connect().execute("SELECT count(*), min(created_at) FROM events").fetchone()
+    return {'events': row[0], 'oldest_seconds': time.time() - row[1] if row[1] else 0}
+
+
+def _apply(events):
+    """
+    Apply buffered events to ``Like`` in one transaction on the main
+    database. Returns ``(inserted, deleted, post_ids)``.
+    """
+    final = {}
+    for _, member_id, post_id, op, created_at in events:
+        final[(member_id, post_id)] = (op > 0, created_at)
+
+    post_ids = {post_id for _, post_id in final}
+    member_ids = {member_id for member_id, _ in final}
+    # Events for posts or members deleted since are dropped.
+    posts = Post.objects.in_bulk(post_ids)
+    live_members = set(Member.objects.filter(id__in=member_ids).values_list('id', flat=True))
+    existing = set(Like.objects.filter(post_id__in=post_ids, member_id__in=member_ids).values_list('member_id', 'post_id'))
+
+    to_insert, to_delete = [], {}
+    for (member_id, post_id), (liked, created_at) in final.items():
+        if post_id not in posts or member_id not in live_members:
+            continue
+        if liked and (member_id, post_id) not in existing:
+            to_insert.append(Like(
+                member_id=member_id, post_id=post_id,
+                created_at=datetime.fromtimestamp(created_at, tz=dt_timezone.utc),
+            ))
+        elif not liked and (member_id, post_id) in existing:
+            to_delete.setdefault(post_id, []).append(member_id)
+
+    deleted = 0
+    with transaction.atomic():
+        Like.objects.bulk_create(to_insert, ignore_conflicts=True, batch_size=500)
+        for post_id, members in to_delete.items():
+            deleted += Like.objects.filter(post_id=post_id, member_id__in=members).delete()[0]
+        members = Member.objects.in_bulk({like.member_id for like in to_insert})
+        for like in to_insert:
+            trending.record(posts[like.post_id], 'like')
+            notifications.record(posts[like.post_id], 'like', members[like.member_id])
+    return len(to_insert), deleted, post_ids
+
+
+def flush(batch_size=None):
+    """
+    Apply everything buffered so far, oldest first, one batch per main
+    database transaction. Returns ``(events, inserted, deleted)``.
+    """
+    batch_size = batch_size or settings.LIKE_FLUSH_BATCH_SIZE
+    db = _connect()
+    events = inserted = deleted = 0
+    while True:
+        batch = db.execute(
+            "SELECT id, member_id, post_id, op, created_at FROM events ORDER BY id LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not batch:
+            break
+        added, removed, post_ids = _apply(batch)
+        counts = dict(
+            Like.objects.filter(post_id__in=post_ids).values_list('post').annotate(n=Count('id')).order_by()
+        )
+        now = time.time()
+        # Dropping the applied events and storing the new base counts happen
+        # in one buffer transaction, so estimates never count an event twice.
+        with _write() as db:
+            db.execute("DELETE FROM events WHERE id <= ?", (batch[-1][0],))
+            db.executemany(
+                "INSERT INTO counts (post_id, likes, refreshed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (post_id) DO UPDATE SET likes = excluded.likes, refreshed_at = excluded.refreshed_at",
+                [(post_id, counts.get(post_id, 0), now) for post_id in post_ids],
+            )
+            db.execute("DELETE FROM counts WHERE refreshed_at < ?", (now - COUNT_TTL_SECONDS,))
+        events += len(batch)
+        inserted += added
+        deleted += removed
+        if len(batch) < batch_size:
+            break
+    return events, inserted, deleted
+
+
+@tasks.task(name='flush_likes', priority=1, every=settings.LIKE_FLUSH_INTERVAL_SECONDS if settings.LIKE_WRITE_BEHIND else None)
+def flush_likes():
+    flush()
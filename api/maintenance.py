@@ -0,0 +1,169 @@
+"""
+Online SQLite maintenance in small, time-boxed steps.
+
+A run refreshes planner statistics and hands free pages back to the file
+system without ever holding the write lock for long:
+
+* ``PRAGMA optimize`` with a bounded ``analysis_limit``;
+* ``ANALYZE`` of each table whose row count, estimated from its rowid
+  range, has drifted from the count recorded in ``sqlite_stat1`` (e.g.
+  after mass deletes), one table per statement;
+* ``PRAGMA incremental_vacuum(N)`` repeated until the free list is empty,
+  each call being its own short write transaction.
+
+Steps stop being started once the time budget is spent, and a step that
+finds the database locked is skipped rather than waited on. Every run is
+recorded as a ``MaintenanceRun``.
+"""
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import OperationalError, connection
+
+from api import tasks
+from api.models import MaintenanceRun
+
+
+# Rows examined per index by ANALYZE and PRAGMA optimize.
+ANALYSIS_LIMIT = 1000
+
+# A table is re-analyzed once its row count moved by this fraction (and by at
+# least MIN_DRIFT_ROWS) since its statistics were gathered.
+DRIFT = 0.1
+MIN_DRIFT_ROWS = 100
+
+# Pause between vacuum steps so queued writers get the lock.
+STEP_PAUSE = 0.05
+
+# Maintenance gives up on a locked database quickly instead of queueing.
+BUSY_TIMEOUT_MS = 50
+
+
+def _pragma(cursor, name):
+    cursor.execute(f"PRAGMA {name}")
+    return cursor.fetchone()[0]
+
+
+def _stat_rows(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+    if cursor.fetchone() is None:
+        return {}
+    cursor.execute("SELECT tbl, stat FROM sqlite_stat1")
+    rows = {}
+    for table, stat in cursor.fetchall():
+        if stat:
+            rows[table] = max(rows.get(table, 0), int(stat.split()[0]))
+    return rows
+
+
+def estimated_rows(cursor, table):
+    """
+    Row count of ``table`` estimated from its rowid range: two b-tree seeks,
+    where ``count(*)`` would read the whole table and, without WAL, hold
+    off every writer's commit meanwhile. Rows deleted from the middle of the
+    range go unnoticed until the ends move.
+    """
+    cursor.execute(f"SELECT max(rowid) - min(rowid) + 1 FROM {connection.ops.quote_name(table)}")
+    return cursor.fetchone()[0] or 0
+
+
+def stale_tables(cursor, deadline=None):
+    """
+    Yield the model tables whose estimated row count drifted from their
+    recorded statistics, stopping once ``time.monotonic()`` passes
+    ``deadline``
+    """
+    recorded = _stat_rows(cursor)
+    existing = set(connection.introspection.table_names(cursor))
+    for model in apps.get_models():
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        table = model._meta.db_table
+        if table not in existing:
+            continue
+        rows = estimated_rows(cursor, table)
+        before = recorded.get(table)
+        if before is None:
+            if rows >= MIN_DRIFT_ROWS:
+                yield table
+        elif abs(rows - before) >= max(MIN_DRIFT_ROWS, before * DRIFT):
+            yield table
+
+
+def run(budget=None, vacuum_pages=None):
+    """
+    Run one maintenance pass and return its ``MaintenanceRun``
+    """
+    budget = settings.DB_MAINTENANCE_BUDGET_SECONDS if budget is None else budget
+    vacuum_pages = vacuum_pages or settings.DB_MAINTENANCE_VACUUM_PAGES
+    started = time.monotonic()
+    deadline = started + budget
+    record = MaintenanceRun(completed=True)
+    notes = []
+
+    with connection.cursor() as cursor:
+        previous_timeout = _pragma(cursor, 'busy_timeout')
+        cursor.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        try:
+            try:
+                cursor.execute("PRAGMA optimize")
+            except OperationalError as exc:
+                notes.append(f"optimize skipped: {exc}")
+                record.completed = False
+
+            for table in stale_tables(cursor, deadline):
+                try:
+                    cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+                    record.tables_analyzed += 1
+                except OperationalError as exc:
+                    notes.append(f"analyze {table} skipped: {exc}")
+                    record.completed = False
+            if time.monotonic() >= deadline:
+                notes.append("budget spent during analyze")
+                record.completed = False
+
+            if _pragma(cursor, 'auto_vacuum') != 2:
+                notes.append("incremental vacuum unavailable: auto_vacuum is not INCREMENTAL")
+            else:
+                while _pragma(cursor, 'freelist_count') and time.monotonic() < deadline:
+                    free = _pragma(cursor, 'freelist_count')
+                    try:
+                        # The sqlite3 module steps a statement without result
+                        # columns only once, which frees a single page;
+                        # executescript() runs it to completion.
+                        connection.connection.executescript(f"PRAGMA incremental_vacuum({vacuum_pages});")
+                    except OperationalError as exc:
+                        notes.append(f"vacuum step skipped: {exc}")
+                        break
+                    record.pages_reclaimed += free - _pragma(cursor, 'freelist_count')
+                    time.sleep(STEP_PAUSE)
+                left = _pragma(cursor, 'freelist_count')
+                if left:
+                    notes.append(f"{left} free pages left")
+                    record.completed = False
+        finally:
+            cursor.execute(f"PRAGMA busy_timeout = {previous_timeout}")
+
+    record.duration = time.monotonic() - started
+    record.detail = '\n'.join(notes)
+    record.save()
+    return record
+
+
+@tasks.task(name='db_maintenance', priority=-2, max_attempts=1, every=settings.DB_MAINTENANCE_INTERVAL_SECONDS or None)
+def maintenance_task():
+    run()
+
+
+def convert_to_incremental():
+    """
+    Switch an existing database to incremental auto-vacuum. This rewrites the
+    whole file with VACUUM and holds the write lock throughout, so it belongs
+    in a maintenance window, not in the scheduler.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+        return _pragma(cursor, 'auto_vacuum') == 2
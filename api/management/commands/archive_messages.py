@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = "Move read messages older than MESSAGE_HOT_DAYS into monthly archive databases"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, help="Override MESSAGE_HOT_DAYS")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options['older_than_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+
+        def progress(month, moved):
+            self.stdout.write(f"{month:%Y-%m}: {moved} messages archived")
+
+        moved = archive.archive_messages(cutoff=cutoff, batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} messages"))
@@ -0,0 +1,130 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import likebuffer
+from api.models import Like, Member, Post
+from api.views import PostViewSet
+
+
+PREFIX = 'bench_like_'
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = ("Measure sustained like/unlike throughput on one hot post, direct vs write-behind. "
+            "Writes throwaway members and a post to the configured database and removes them afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--modes', nargs='+', choices=['direct', 'buffered'], default=['direct', 'buffered'])
+
+    def handle(self, *args, **options):
+        Member.all_objects.filter(username__startswith=PREFIX).delete()
+        members = Member.objects.bulk_create([
+            Member(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@example.invalid', password='!')
+            for i in range(options['members'] + 1)
+        ])
+        members = list(Member.objects.filter(username__startswith=PREFIX).order_by('id'))
+        author, clickers = members[0], members[1:]
+
+        self.stdout.write(f"{'mode':>9} {'clicks/s':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8} {'flush s':>8} {'consistent':>10}")
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for mode in options['modes']:
+                    post = Post.objects.create(author=author, content='benchmark')
+                    with override_settings(
+                        LIKE_WRITE_BEHIND=mode == 'buffered',
+                        LIKE_BUFFER_PATH=Path(directory) / 'like-buffer.sqlite3',
+                    ):
+                        rate, errors, latencies, flush_seconds, consistent = self._run(
+                            post, clickers, options['threads'], options['seconds']
+                        )
+                    self.stdout.write(
+                        f"{mode:>9} {rate:>9.1f} {errors:>7} {_percentile(latencies, 50) * 1000:>8.2f} "
+                        f"{_percentile(latencies, 99) * 1000:>8.2f} {flush_seconds:>8.2f} {str(consistent):>10}"
+                    )
+        finally:
+            Member.all_objects.filter(username__startswith=PREFIX).delete()
+
+    def _run(self, post, clickers, threads, seconds):
+        factory = APIRequestFactory()
+        # Throttling would cap every mode at the same rate.
+        views = {
+            'like': PostViewSet.as_view({'post': 'like'}, throttle_classes=[]),
+            'unlike': PostViewSet.as_view({'post': 'unlike'}, throttle_classes=[]),
+        }
+        deadline = time.monotonic() + seconds
+        latencies, errors = [], [0]
+        expected = {}
+        lock = threading.Lock()
+        stop_flusher = threading.Event()
+
+        def clicker(share):
+            liked = {member.id: False for member in share}
+            while time.monotonic() < deadline:
+                for member in share:
+                    action = 'unlike' if liked[member.id] else 'like'
+                    request = factory.post(f'/api/posts/{post.id}/{action}/')
+                    force_authenticate(request, user=member)
+                    started = time.perf_counter()
+                    try:
+                        response = views[action](request, pk=post.id)
+                        ok = response.status_code == 200
+                    except Exception:
+                        ok = False
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        if ok:
+                            liked[member.id] = not liked[member.id]
+                        else:
+                            errors[0] += 1
+                    if time.monotonic() >= deadline:
+                        break
+            with lock:
+                expected.update(liked)
+            connection.close()
+
+        def flusher():
+            while not stop_flusher.wait(1):
+                likebuffer.flush()
+            connection.close()
+
+        buffered = likebuffer.enabled()
+        flush_thread = threading.Thread(target=flusher) if buffered else None
+        if flush_thread:
+            flush_thread.start()
+        workers = [threading.Thread(target=clicker, args=(clickers[i::threads],)) for i in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        flush_seconds = 0.0
+        if flush_thread:
+            stop_flusher.set()
+            flush_thread.join()
+            flush_started = time.perf_counter()
+            likebuffer.flush()
+            flush_seconds = time.perf_counter() - flush_started
+
+        liked = set(Like.objects.filter(post=post).values_list('member_id', flat=True))
+        consistent = liked == {member_id for member_id, value in expected.items() if value}
+        return (len(latencies) - errors[0]) / elapsed, errors[0], latencies, flush_seconds, consistent
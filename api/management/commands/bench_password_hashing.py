@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from api import hashing
+from api.models import Member
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = "Compare login hashing throughput and concurrent read latency, inline vs process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=64)
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent login threads")
+        parser.add_argument('--processes', type=int, nargs='+', default=[0, 1, 2, 4],
+                            help="Pool sizes to compare; 0 hashes inline in the request thread")
+
+    def handle(self, *args, **options):
+        encoded = hashers.make_password('benchmark-password')
+        self.stdout.write(f"{'processes':>9} {'logins/s':>9} {'shed':>5} {'read p50 ms':>12} {'read p99 ms':>12}")
+        for processes in options['processes']:
+            with override_settings(
+                PASSWORD_HASHING_PROCESSES=processes,
+                PASSWORD_HASHING_MAX_PENDING=max(options['concurrency'], 1),
+            ):
+                try:
+                    rate, shed, reads = self._run(encoded, options['logins'], options['concurrency'])
+                finally:
+                    # The next size gets a pool of its own, not this one.
+                    hashing.shutdown()
+            self.stdout.write(
+                f"{processes:>9} {rate:>9.1f} {shed:>5} "
+                f"{_percentile(reads, 50) * 1000:>12.2f} {_percentile(reads, 99) * 1000:>12.2f}"
+            )
+
+    def _run(self, encoded, logins, concurrency):
+        # Warm the pool so process start-up is not counted.
+        hashing.check_password('warm-up', encoded)
+
+        done = threading.Event()
+        reads = []
+
+        def reader():
+            member_id = Member.objects.values_list('id', flat=True).first() or 0
+            while not done.is_set():
+                started = time.perf_counter()
+                Member.objects.filter(pk=member_id).exists()
+                reads.append(time.perf_counter() - started)
+                time.sleep(0.005)
+            connection.close()
+
+        shed = 0
+
+        def login(_):
+            nonlocal shed
+            try:
+                hashing.check_password('benchmark-password', encoded)
+            except hashing.HashingOverloaded:
+                shed += 1
+
+        read_thread = threading.Thread(target=reader)
+        read_thread.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        read_thread.join()
+
+        return (logins - shed) / elapsed, shed, reads
@@ -0,0 +1,183 @@
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.sqlite3.base import SQLiteCursorWrapper
+
+from api import search
+
+
+# Only the columns the search queries read; the FTS objects themselves are
+# copied from the migrated database so the benchmark runs the real DDL.
+TABLES = """
+CREATE TABLE api_member (id INTEGER PRIMARY KEY, deleted_at TEXT);
+CREATE TABLE api_post (
+    id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL, content TEXT NOT NULL,
+    created_at TEXT NOT NULL, deleted_at TEXT
+);
+CREATE TABLE api_message (
+    id INTEGER PRIMARY KEY, sender_id INTEGER NOT NULL, receiver_id INTEGER NOT NULL,
+    content TEXT NOT NULL, created_at TEXT NOT NULL
+);
+"""
+FTS_OBJECTS = ('api_message_fts_source', 'api_post_fts', 'api_message_fts')
+
+LOAD_BATCH = 50000
+DAYS = 365
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = ("Measure full-text search latency on a synthetic corpus (default 10M posts and 10M messages). "
+            "The corpus is built in a separate SQLite file, never in the configured database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000_000)
+        parser.add_argument('--messages', type=int, default=10_000_000)
+        parser.add_argument('--members', type=int, default=100_000)
+        parser.add_argument('--vocabulary', type=int, default=50_000, help="Distinct words, Zipf-distributed")
+        parser.add_argument('--queries', type=int, default=200, help="Queries per query class")
+        parser.add_argument('--path', default=os.path.join(tempfile.gettempdir(), 'bench-search.sqlite3'))
+        parser.add_argument('--reuse', action='store_true', help="Query an existing corpus at --path instead of rebuilding it")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = self._vocabulary(rng, options['vocabulary'])
+        if not (options['reuse'] and os.path.exists(options['path'])):
+            self._build(options['path'], rng, vocabulary, options)
+
+        db = sqlite3.connect(options['path'])
+        cursor = db.cursor(factory=SQLiteCursorWrapper)
+        cursor.execute("SELECT max(id) FROM api_member")
+        members = cursor.fetchone()[0]
+
+        # Word frequency falls with rank, so bands give common, medium and rare terms.
+        common = vocabulary[:20]
+        medium = vocabulary[200:2000]
+        rare = vocabulary[-20000:]
+        classes = {
+            'posts common': lambda: rng.choice(common),
+            'posts medium': lambda: rng.choice(medium),
+            'posts rare': lambda: rng.choice(rare),
+            'posts 2 words': lambda: f'{rng.choice(common)} {rng.choice(medium)}',
+            'posts 3 words': lambda: f'{rng.choice(common)} {rng.choice(common)} {rng.choice(medium)}',
+        }
+        self.stdout.write(f"{'query class':>16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hits':>6}")
+        everything = []
+        for name, make in classes.items():
+            everything += self._measure(name, lambda: search.search_posts(make(), cursor=cursor), options['queries'])
+        for name, make in (('messages common', lambda: rng.choice(common)), ('messages medium', lambda: rng.choice(medium))):
+            everything += self._measure(
+                name,
+                lambda: search.search_messages(rng.randint(1, members), make(), cursor=cursor, archived=False),
+                options['queries'],
+            )
+        self.stdout.write(
+            f"{'all':>16} {_percentile(everything, 50) * 1000:>8.2f} {_percentile(everything, 95) * 1000:>8.2f} "
+            f"{_percentile(everything, 99) * 1000:>8.2f} {max(everything) * 1000:>8.2f}"
+        )
+        db.close()
+
+    def _measure(self, name, query, count):
+        latencies, hits = [], 0
+        query()
+        for _ in range(count):
+            started = time.perf_counter()
+            results = query()
+            latencies.append(time.perf_counter() - started)
+            hits += len(results)
+        self.stdout.write(
+            f"{name:>16} {_percentile(latencies, 50) * 1000:>8.2f} {_percentile(latencies, 95) * 1000:>8.2f} "
+            f"{_percentile(latencies, 99) * 1000:>8.2f} {max(latencies) * 1000:>8.2f} {hits / count:>6.1f}"
+        )
+        return latencies
+
+    def _vocabulary(self, rng, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))))
+        words = sorted(words)
+        rng.shuffle(words)
+        return words
+
+    def _texts(self, rng, vocabulary, cum_weights):
+        while True:
+            yield ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(5, 40)))
+
+    def _build(self, path, rng, vocabulary, options):
+        with connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(FTS_OBJECTS))
+            cursor.execute(f"SELECT name, sql FROM sqlite_master WHERE name IN ({placeholders})", FTS_OBJECTS)
+            ddl = dict(cursor.fetchall())
+        missing = set(FTS_OBJECTS) - set(ddl)
+        if missing:
+            self.stderr.write(f"Search indexes missing from the database ({', '.join(sorted(missing))}); run migrate first")
+            return
+
+        if os.path.exists(path):
+            os.remove(path)
+        db = sqlite3.connect(path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.executescript(TABLES)
+        for name in FTS_OBJECTS:
+            db.execute(ddl[name])
+
+        cum_weights, total = [], 0.0
+        for rank in range(1, len(vocabulary) + 1):
+            total += 1 / rank
+            cum_weights.append(total)
+        texts = self._texts(rng, vocabulary, cum_weights)
+        start = datetime(2025, 1, 1)
+
+        def created_at(i, rows):
+            return (start + timedelta(days=DAYS * i / rows)).isoformat(' ')
+
+        members = options['members']
+        self._load(db, "INSERT INTO api_member (id) VALUES (?)", ((i,) for i in range(1, members + 1)), members)
+        rows = options['posts']
+        self._load(
+            db, "INSERT INTO api_post (id, author_id, content, created_at) VALUES (?, ?, ?, ?)",
+            ((i, rng.randint(1, members), next(texts), created_at(i, rows)) for i in range(1, rows + 1)), rows,
+        )
+        rows = options['messages']
+        self._load(
+            db, "INSERT INTO api_message (id, sender_id, receiver_id, content, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((i, rng.randint(1, members), rng.randint(1, members), next(texts), created_at(i, rows))
+             for i in range(1, rows + 1)), rows,
+        )
+        for table in ('api_post_fts', 'api_message_fts'):
+            started = time.perf_counter()
+            db.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+            db.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+            self.stdout.write(f"Indexed {table} in {time.perf_counter() - started:.0f} s")
+        db.close()
+
+    def _load(self, db, sql, rows, count):
+        started = time.perf_counter()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == LOAD_BATCH:
+                db.execute("BEGIN")
+                db.executemany(sql, batch)
+                db.execute("COMMIT")
+                batch = []
+        if batch:
+            db.execute("BEGIN")
+            db.executemany(sql, batch)
+            db.execute("COMMIT")
+        self.stdout.write(f"Loaded {count} rows in {time.perf_counter() - started:.0f} s")
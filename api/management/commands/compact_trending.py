@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import trending
+
+
+class Command(BaseCommand):
+    help = "Drop trending scores of posts older than TRENDING_WINDOW_HOURS"
+
+    def handle(self, *args, **options):
+        deleted = trending.compact()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} expired trending entries"))
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import maintenance
+
+
+class Command(BaseCommand):
+    help = "Refresh SQLite statistics and reclaim free pages in small time-boxed steps"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, help="Seconds per run (default DB_MAINTENANCE_BUDGET_SECONDS)")
+        parser.add_argument('--vacuum-pages', type=int, help="Pages released per vacuum step")
+        parser.add_argument('--every', type=int, default=settings.DB_MAINTENANCE_INTERVAL_SECONDS,
+                            help="Repeat every N seconds; 0 runs once")
+        parser.add_argument('--convert', action='store_true',
+                            help="Switch the database to incremental auto-vacuum with a full VACUUM, then exit")
+
+    def handle(self, *args, **options):
+        if options['convert']:
+            if maintenance.convert_to_incremental():
+                self.stdout.write(self.style.SUCCESS("Database now uses incremental auto-vacuum"))
+            else:
+                self.stderr.write("auto_vacuum could not be changed")
+            return
+
+        while True:
+            close_old_connections()
+            record = maintenance.run(budget=options['budget'], vacuum_pages=options['vacuum_pages'])
+            message = (
+                f"Maintenance took {record.duration:.2f}s: {record.tables_analyzed} tables analyzed, "
+                f"{record.pages_reclaimed} pages reclaimed"
+            )
+            self.stdout.write(self.style.SUCCESS(message) if record.completed else message)
+            if record.detail:
+                self.stdout.write(record.detail)
+            if options['every'] <= 0:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api import deletion
+from api.models import DeletionJob
+from api.serializers import DeletionJobSerializer
+
+
+class Command(BaseCommand):
+    help = "Show the progress of background member and post deletions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="Deletion job ids (default: unfinished jobs)")
+        parser.add_argument('--all', action='store_true', help="Include finished jobs")
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        jobs = DeletionJob.objects.order_by('created_at')
+        if options['ids']:
+            jobs = jobs.filter(pk__in=options['ids'])
+        elif not options['all']:
+            jobs = jobs.exclude(status='done')
+
+        report = []
+        for job in jobs:
+            entry = DeletionJobSerializer(job).data
+            entry['remaining'] = deletion.progress(job) if job.status != 'done' else {}
+            entry['last_error'] = job.last_error
+            report.append(entry)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        if not report:
+            self.stdout.write("No deletions in progress")
+        for entry in report:
+            self.stdout.write(
+                f"#{entry['id']} {entry['model']} {entry['object_id']}: {entry['status']}, "
+                f"{entry['rows_deleted']} rows purged" + (f", at {entry['current']}" if entry['current'] else '')
+            )
+            for relation, count in entry['remaining'].items():
+                self.stdout.write(f"  {relation:<32} {count:>10} left")
+            if entry['status'] == 'failed' and entry['last_error']:
+                self.stdout.write(f"  error: {entry['last_error']}")
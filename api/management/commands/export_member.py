@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exporter import ndjson_stream, zip_stream
+from api.models import Member
+
+
+class Command(BaseCommand):
+    help = "Stream a member's data to a file as NDJSON or a zip of NDJSON files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('member', help="Member username or ID")
+        parser.add_argument('--output', '-o', default='-', help="Output path ('-' for stdout)")
+        parser.add_argument('--zip', action='store_true', help="Write a zip with one NDJSON file per section")
+
+    def handle(self, *args, **options):
+        lookup = options['member']
+        try:
+            if lookup.isdigit():
+                member = Member.objects.get(pk=int(lookup))
+            else:
+                member = Member.objects.get(username=lookup)
+        except Member.DoesNotExist:
+            raise CommandError(f"Member not found: {lookup}")
+
+        stream = zip_stream(member) if options['zip'] else ndjson_stream(member)
+
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+            for chunk in stream:
+                out.write(chunk)
+            out.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as fh:
+            for chunk in stream:
+                fh.write(chunk)
+                written += len(chunk)
+        self.stderr.write(f"Wrote {written} bytes to {options['output']}")
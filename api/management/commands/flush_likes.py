@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import likebuffer
+
+
+class Command(BaseCommand):
+    help = "Apply buffered likes and unlikes (LIKE_WRITE_BEHIND) to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Events per database transaction")
+        parser.add_argument('--every', type=float, help="Keep flushing at this interval in seconds")
+        parser.add_argument('--status', action='store_true', help="Only report what is buffered")
+
+    def handle(self, *args, **options):
+        if options['status']:
+            state = likebuffer.pending()
+            self.stdout.write(f"{state['events']} events buffered, oldest {state['oldest_seconds']:.1f}s")
+            return
+
+        while True:
+            started = time.monotonic()
+            events, inserted, deleted = likebuffer.flush(options['batch_size'])
+            if events or not options['every']:
+                self.stdout.write(
+                    f"Applied {events} events: {inserted} likes added, {deleted} removed "
+                    f"in {time.monotonic() - started:.2f}s"
+                )
+            if not options['every']:
+                return
+            time.sleep(options['every'])
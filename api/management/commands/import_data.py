@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import Importer, KINDS
+
+
+class Command(BaseCommand):
+    help = "Stream members, posts, friendships or subscriptions from a JSONL/CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path', help="Path to a .jsonl or .csv file")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=None,
+                            help="Password hashing processes (defaults to the CPU count)")
+        parser.add_argument('--name', default=None,
+                            help="Checkpoint name; reuse it to resume an interrupted import")
+        parser.add_argument('--restart', action='store_true',
+                            help="Discard the existing checkpoint and import from the start")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        importer = Importer(
+            options['kind'],
+            options['path'],
+            name=options['name'],
+            batch_size=options['batch_size'],
+            processes=options['processes'],
+        )
+
+        checkpoint = importer.checkpoint()
+        if options['restart']:
+            checkpoint.delete()
+        elif checkpoint.records_done:
+            self.stdout.write(f"Resuming {importer.name} after {checkpoint.records_done} records")
+
+        def progress(cp):
+            self.stdout.write(f"{cp.records_done} records processed ({cp.records_skipped} skipped)")
+
+        try:
+            checkpoint = importer.run(progress=progress)
+        except FileNotFoundError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.name}: {checkpoint.records_done} records ({checkpoint.records_skipped} skipped)"
+        ))
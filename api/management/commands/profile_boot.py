@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+
+# Runs in a fresh interpreter under -X importtime: boots Django the way a
+# gunicorn worker does (WSGI application, then the URLconf that the first
+# request loads) and reports phase and per-app ready() timings on stdout.
+CHILD = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+import django
+from django.apps import AppConfig
+
+ready_times = {}
+create = AppConfig.create.__func__
+
+def timed_create(cls, entry):
+    app_config = create(cls, entry)
+    ready = app_config.ready
+    def timed_ready():
+        started = time.perf_counter()
+        ready()
+        ready_times[app_config.label] = time.perf_counter() - started
+    app_config.ready = timed_ready
+    return app_config
+
+AppConfig.create = classmethod(timed_create)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+t1 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t2 = time.perf_counter()
+json.dump({'setup': t1 - t0, 'urlconf': t2 - t1, 'ready': ready_times, 'modules': len(sys.modules)}, sys.stdout)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output into ``{module: (self_us, cumulative_us)}``
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Report import cost per module and per-app ready() time of a worker boot"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help="Modules to list")
+        parser.add_argument('--runs', type=int, default=3, help="Boots to average the totals over")
+        parser.add_argument('--json', action='store_true', help="Emit the raw report as JSON")
+
+    def boot(self):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD],
+            capture_output=True, text=True, env=env, check=True,
+        )
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report['imports'] = parse_importtime(result.stderr)
+        return report
+
+    def handle(self, *args, **options):
+        runs = [self.boot() for _ in range(max(1, options['runs']))]
+        report = runs[-1]
+        setup = sum(r['setup'] for r in runs) / len(runs)
+        urlconf = sum(r['urlconf'] for r in runs) / len(runs)
+
+        packages = {}
+        for name, (self_us, _) in report['imports'].items():
+            top = name.split('.')[0]
+            packages[top] = packages.get(top, 0) + self_us
+
+        if options['json']:
+            report.update(setup=setup, urlconf=urlconf, packages=packages)
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Boot over {len(runs)} runs: django.setup + WSGI {setup * 1000:.1f} ms, "
+                          f"URLconf {urlconf * 1000:.1f} ms, {report['modules']} modules loaded")
+
+        self.stdout.write("\nready() per app (ms):")
+        for label, seconds in sorted(report['ready'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {label:<24} {seconds * 1000:8.2f}")
+
+        self.stdout.write("\nImport time per top-level package, self time summed (ms):")
+        for name, total in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {name:<24} {total / 1000:8.2f}")
+
+        self.stdout.write(f"\nSlowest {options['top']} modules, cumulative (ms):")
+        slowest = sorted(report['imports'].items(), key=lambda item: -item[1][1])[:options['top']]
+        for name, (self_us, cumulative_us) in slowest:
+            self.stdout.write(f"  {name:<48} {cumulative_us / 1000:8.2f}  (self {self_us / 1000:.2f})")
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import uploads
+from api.models import Upload
+
+
+class Command(BaseCommand):
+    help = "Delete uploads left incomplete for longer than UPLOAD_EXPIRY_HOURS, with their chunks"
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.UPLOAD_EXPIRY_HOURS)
+        # An upload still assembling after that long lost its job.
+        expired = Upload.objects.filter(status__in=['pending', 'assembling'], created_at__lt=cutoff)
+        count = 0
+        for upload in expired.iterator():
+            uploads.discard_parts(upload)
+            upload.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Purged {count} expired uploads"))
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api import tasks
+
+
+def _seconds(value):
+    return '-' if value is None else f"{value:.3f}s"
+
+
+class Command(BaseCommand):
+    help = "Show background job queue depth and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=60, help="Minutes of finished jobs to include")
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        report = tasks.stats(window_minutes=options['window'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        depth = ', '.join(f"{status} {count}" for status, count in report['depth'].items())
+        self.stdout.write(f"Jobs: {depth}")
+        self.stdout.write(f"Due now: {report['due']}, oldest waiting {report['oldest_due_seconds']:.1f}s")
+        self.stdout.write(
+            f"Last {report['window_minutes']} min: wait p50 {_seconds(report['wait_seconds']['p50'])} "
+            f"p95 {_seconds(report['wait_seconds']['p95'])}, run p50 {_seconds(report['run_seconds']['p50'])} "
+            f"p95 {_seconds(report['run_seconds']['p95'])}"
+        )
+        for name, counts in sorted(report['finished'].items()):
+            self.stdout.write(f"  {name:<24} done {counts['done']:>6}  failed {counts['failed']:>6}")
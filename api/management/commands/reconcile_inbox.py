@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api import inbox
+
+
+class Command(BaseCommand):
+    help = "Recompute unread-message counters that drifted from the messages they count"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted counters")
+
+    def handle(self, *args, **options):
+        drifted = inbox.reconcile(fix=not options['dry_run'])
+        for member_id, stored, actual in drifted:
+            self.stdout.write(f"  member {member_id:<10} counter {stored:>8}  actual {actual:>8}")
+        verb = 'drifted' if options['dry_run'] else 'fixed'
+        self.stdout.write(f"{len(drifted)} counters {verb}")
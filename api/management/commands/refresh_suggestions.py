@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.graph import refresh_suggestions
+
+
+class Command(BaseCommand):
+    help = "Recompute friend suggestions for members whose neighbourhood changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute suggestions for every member")
+        parser.add_argument('--top-k', type=int, default=None, help="Suggestions to keep per member")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        members, rows = refresh_suggestions(full=options['full'], top_k=options['top_k'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed suggestions for {members} members ({rows} rows) in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,82 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from api import tasks
+
+
+# Shortest sleep after finding the queue empty; doubles up to the poll
+# interval while it stays empty.
+MIN_IDLE_SLEEP = 0.05
+
+STALE_CHECK_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is due")
+        parser.add_argument('--max-jobs', type=int, default=0, help="Exit after this many jobs (0 = no limit)")
+        parser.add_argument(
+            '--min-priority', type=int, default=None,
+            help="Only run jobs of at least this priority, leaving long low-priority jobs to other workers"
+        )
+
+    def handle(self, *args, **options):
+        tasks.autodiscover()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = tasks.worker_name()
+        tasks.schedule_periodic()
+        names = sorted(
+            name for name, registered in tasks.TASKS.items()
+            if options['min_priority'] is None or registered.priority >= options['min_priority']
+        )
+        self.stdout.write(f"Worker {worker} started with tasks: {', '.join(names)}")
+
+        processed = 0
+        idle = MIN_IDLE_SLEEP
+        last_stale_check = 0.0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - last_stale_check > STALE_CHECK_SECONDS:
+                requeued = tasks.requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Re-queued {requeued} stale jobs")
+                last_stale_check = time.monotonic()
+
+            try:
+                job = tasks.claim(worker, options['min_priority'])
+            except OperationalError as exc:
+                # The database stayed locked past the busy timeout; retry.
+                self.stderr.write(f"Claim failed: {exc}")
+                job = None
+            if job is None:
+                if options['burst']:
+                    break
+                time.sleep(idle)
+                idle = min(idle * 2, settings.TASK_POLL_INTERVAL_SECONDS)
+                continue
+
+            idle = MIN_IDLE_SLEEP
+            started = time.monotonic()
+            ok = tasks.run(job)
+            self.stdout.write(
+                f"Job {job.id} {job.name} {'done' if ok else 'failed'} "
+                f"in {time.monotonic() - started:.3f}s (attempt {job.attempts})"
+            )
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(f"Worker {worker} stopped after {processed} jobs")
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit.
+        self.stopping = True
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import snapshots
+
+
+class Command(BaseCommand):
+    help = "Take a consistent snapshot of the running database with SQLite's online backup API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=settings.DB_SNAPSHOT_KEEP,
+                            help="Snapshots to keep (default DB_SNAPSHOT_KEEP)")
+        parser.add_argument('--list', action='store_true', help="List existing snapshots and exit")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for path in snapshots.list_snapshots(settings.DB_SNAPSHOT_DIR):
+                self.stdout.write(f"{path} ({path.stat().st_size} bytes)")
+            return
+
+        started = time.monotonic()
+        path = snapshots.snapshot(connection.settings_dict['NAME'], settings.DB_SNAPSHOT_DIR, keep=options['keep'])
+        self.stdout.write(self.style.SUCCESS(f"Snapshot {path} written in {time.monotonic() - started:.2f}s"))
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('records_done', models.BigIntegerField(default=0)),
+                ('records_skipped', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RenameIndex(
+            model_name='comment',
+            new_name='api_comment_post_id_b7147a_idx',
+            old_name='api_comment_post_id_a9c1e0_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='friendrequest',
+            new_name='api_friendr_to_memb_b40f2b_idx',
+            old_name='api_friendr_to_memb_7c3a1f_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='friendrequest',
+            new_name='api_friendr_from_me_4604cb_idx',
+            old_name='api_friendr_from_me_d4e5b2_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='like',
+            new_name='api_like_post_id_341bca_idx',
+            old_name='api_like_post_id_ca3e94_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='member',
+            new_name='api_member_usernam_f80759_idx',
+            old_name='api_member_usernam_e2f4e1_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='member',
+            new_name='api_member_date_jo_7c52cd_idx',
+            old_name='api_member_date_jo_0c5f3a_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='message',
+            new_name='api_message_receive_fc0ee4_idx',
+            old_name='api_message_receive_9f1a2e_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='message',
+            new_name='api_message_sender__4b86e3_idx',
+            old_name='api_message_sender__b3c4d5_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='post',
+            new_name='api_post_created_a6c29a_idx',
+            old_name='api_post_created_36f90a_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='post',
+            new_name='api_post_author__387d67_idx',
+            old_name='api_post_author__ea0b9a_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='repost',
+            new_name='api_repost_member__4a6b18_idx',
+            old_name='api_repost_member__f6e7a8_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='subscription',
+            new_name='api_subscri_followe_575bf0_idx',
+            old_name='api_subscri_follow_c8d9e0_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='subscription',
+            new_name='api_subscri_followi_cb9100_idx',
+            old_name='api_subscri_follow_a1b2c3_idx',
+        ),
+    ]
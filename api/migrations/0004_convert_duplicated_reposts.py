@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Q
+
+
+# The old repost endpoint created the Repost row and then, immediately after,
+# a Post copying the original's media. The copy is the reposter's earliest
+# post with the same media created within this window of the Repost row.
+MATCH_WINDOW = timedelta(seconds=5)
+
+
+def convert_reposts(apps, schema_editor):
+    Post = apps.get_model('api', 'Post')
+    Repost = apps.get_model('api', 'Repost')
+    Like = apps.get_model('api', 'Like')
+    Comment = apps.get_model('api', 'Comment')
+
+    # Converted copy id -> the original post at the root of its chain. A
+    # repost of a copy copied the same media again, so it is converted into
+    # a reference to the root, not to the copy.
+    roots = {}
+
+    def convert(repost_id, member_id, post_id, created_at):
+        root_id = roots.get(post_id, post_id)
+        original = Post.objects.get(pk=root_id)
+        if root_id != post_id:
+            Repost.objects.filter(pk=repost_id).update(post_id=root_id)
+        copy = Post.objects.filter(
+            author_id=member_id,
+            repost_of__isnull=True,
+            image_url=original.image_url,
+            video_url=original.video_url,
+            created_at__gte=created_at,
+            created_at__lte=created_at + MATCH_WINDOW,
+        ).exclude(pk__in=[root_id, post_id]).order_by('created_at').first()
+        if copy is None:
+            return
+
+        # Fold engagement that landed on the copy back onto the original.
+        liked = set(Like.objects.filter(post_id=root_id).values_list('member_id', flat=True))
+        Like.objects.filter(post=copy).exclude(member_id__in=liked).update(post_id=root_id)
+        Like.objects.filter(post=copy).delete()
+        Comment.objects.filter(post=copy).update(post_id=root_id)
+        # Reposts of the copy are reposts of the original.
+        Repost.objects.filter(post=copy).update(post_id=root_id)
+        Post.objects.filter(repost_of=copy).update(repost_of_id=root_id)
+
+        Post.objects.filter(pk=copy.pk).update(repost_of_id=root_id, image_url=None, video_url=None)
+        roots[copy.pk] = root_id
+
+    # Keyset batches: convert() rewrites Repost rows, which an open SQLite
+    # cursor over the same table would see.
+    reposts = Repost.objects.order_by('created_at', 'id').values_list('id', 'member_id', 'post_id', 'created_at')
+    batch = list(reposts[:500])
+    while batch:
+        for repost in batch:
+            convert(*repost)
+        last_id, _, _, last_at = batch[-1]
+        batch = list(reposts.filter(Q(created_at__gt=last_at) | Q(created_at=last_at, id__gt=last_id))[:500])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_post_repost_of'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_reposts, migrations.RunPython.noop),
+    ]
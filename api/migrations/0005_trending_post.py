@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_convert_duplicated_reposts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='api.post')),
+                ('score', models.FloatField(default=0)),
+                ('post_created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['-score'], name='api_trendin_score_ab2a92_idx'), models.Index(fields=['post_created_at'], name='api_trendin_post_cr_40ec0a_idx')],
+            },
+        ),
+    ]
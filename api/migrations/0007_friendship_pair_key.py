@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_friend_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='friendrequest',
+            name='pair_high',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='friendrequest',
+            name='pair_low',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='Friendship',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('friend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.member')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friendships', to='api.member')),
+            ],
+            options={
+                'unique_together': {('member', 'friend')},
+            },
+        ),
+    ]
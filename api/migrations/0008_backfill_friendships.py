@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+STATUS_RANK = {'accepted': 0, 'pending': 1, 'rejected': 2}
+
+
+def backfill(apps, schema_editor):
+    FriendRequest = apps.get_model('api', 'FriendRequest')
+    Friendship = apps.get_model('api', 'Friendship')
+
+    # Keep one request per unordered pair: accepted beats pending beats
+    # rejected, newest first within a status. Duplicates could only come from
+    # the old racy (from, to) / (to, from) existence check.
+    kept = {}
+    duplicates = []
+    rows = FriendRequest.objects.order_by('-created_at', '-id').values_list(
+        'id', 'from_member_id', 'to_member_id', 'status', 'created_at'
+    ).iterator(chunk_size=2000)
+    for request_id, from_id, to_id, status, created_at in rows:
+        pair = (min(from_id, to_id), max(from_id, to_id))
+        current = kept.get(pair)
+        if current is None:
+            kept[pair] = (request_id, status, created_at)
+        elif STATUS_RANK.get(status, 3) < STATUS_RANK.get(current[1], 3):
+            duplicates.append(current[0])
+            kept[pair] = (request_id, status, created_at)
+        else:
+            duplicates.append(request_id)
+
+    for start in range(0, len(duplicates), 500):
+        FriendRequest.objects.filter(id__in=duplicates[start:start + 500]).delete()
+
+    edges = []
+    for (low, high), (request_id, status, created_at) in kept.items():
+        FriendRequest.objects.filter(id=request_id).update(pair_low=low, pair_high=high)
+        if status == 'accepted':
+            edges.append(Friendship(member_id=low, friend_id=high, created_at=created_at))
+            edges.append(Friendship(member_id=high, friend_id=low, created_at=created_at))
+        if len(edges) >= 2000:
+            Friendship.objects.bulk_create(edges, ignore_conflicts=True)
+            edges = []
+    Friendship.objects.bulk_create(edges, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_friendship_pair_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_backfill_friendships'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='friendrequest',
+            name='pair_high',
+            field=models.BigIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='friendrequest',
+            name='pair_low',
+            field=models.BigIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='friendrequest',
+            constraint=models.UniqueConstraint(fields=('pair_low', 'pair_high'), name='unique_friend_request_pair'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_friend_request_unique_pair'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessageMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pair_low', models.BigIntegerField()),
+                ('pair_high', models.BigIntegerField()),
+                ('month', models.DateField()),
+                ('messages', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['pair_high'], name='api_archive_pair_hi_dcc55d_idx')],
+                'unique_together': {('pair_low', 'pair_high', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_archived_message_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('duration', models.FloatField(default=0)),
+                ('tables_analyzed', models.PositiveIntegerField(default=0)),
+                ('pages_reclaimed', models.PositiveIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('detail', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:02
+
+import django.db.models.deletion
+import django.db.models.manager
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_job'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='member',
+            options={'base_manager_name': 'all_objects', 'ordering': ['-date_joined']},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'base_manager_name': 'all_objects', 'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelManagers(
+            name='member',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='post',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('rows_deleted', models.BigIntegerField(default=0)),
+                ('current', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.member')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id'], name='api_deletio_model_c28ccc_idx'), models.Index(fields=['status', 'created_at'], name='api_deletio_status_24b8ab_idx')],
+            },
+        ),
+    ]
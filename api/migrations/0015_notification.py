@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_tombstone_deletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('like', 'Like'), ('comment', 'Comment'), ('repost', 'Repost')], max_length=20)),
+                ('window', models.BigIntegerField()),
+                ('actor_count', models.PositiveIntegerField(default=1)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.member')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.post')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='api.member')),
+            ],
+            options={
+                'ordering': ['-updated_at', '-id'],
+                'indexes': [models.Index(fields=['recipient', '-updated_at', '-id'], name='api_notific_recipie_d2c7d2_idx'), models.Index(fields=['recipient', 'is_read'], name='api_notific_recipie_28b188_idx'), models.Index(fields=['updated_at'], name='api_notific_updated_025dc1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipient', 'post', 'verb', 'window'), name='unique_notification_window')],
+            },
+        ),
+    ]
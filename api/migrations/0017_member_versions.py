@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberVersions',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='api.member')),
+                ('feed', models.PositiveBigIntegerField(default=0)),
+                ('inbox', models.PositiveBigIntegerField(default=0)),
+                ('friend_requests', models.PositiveBigIntegerField(default=0)),
+                ('notifications', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
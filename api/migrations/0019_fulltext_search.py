@@ -0,0 +1,86 @@
+from django.db import migrations
+
+
+# External-content FTS5 indexes: the text lives only in api_post and
+# api_message, and triggers keep the indexes in step with every insert,
+# update and delete, including bulk ones. Messages are indexed through a
+# view that adds the participants as tokens ("u<sender id> u<receiver id>"),
+# so per-member search is an index intersection rather than a filter.
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_post_fts USING fts5(
+        content, content='api_post', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER api_post_fts_insert AFTER INSERT ON api_post BEGIN
+        INSERT INTO api_post_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER api_post_fts_delete AFTER DELETE ON api_post BEGIN
+        INSERT INTO api_post_fts (api_post_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER api_post_fts_update AFTER UPDATE OF content ON api_post BEGIN
+        INSERT INTO api_post_fts (api_post_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO api_post_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO api_post_fts (api_post_fts) VALUES ('rebuild')",
+    """
+    CREATE VIEW api_message_fts_source AS
+    SELECT id, content, 'u' || sender_id || ' u' || receiver_id AS members FROM api_message
+    """,
+    """
+    CREATE VIRTUAL TABLE api_message_fts USING fts5(
+        content, members, content='api_message_fts_source', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER api_message_fts_insert AFTER INSERT ON api_message BEGIN
+        INSERT INTO api_message_fts (rowid, content, members)
+        VALUES (new.id, new.content, 'u' || new.sender_id || ' u' || new.receiver_id);
+    END
+    """,
+    """
+    CREATE TRIGGER api_message_fts_delete AFTER DELETE ON api_message BEGIN
+        INSERT INTO api_message_fts (api_message_fts, rowid, content, members)
+        VALUES ('delete', old.id, old.content, 'u' || old.sender_id || ' u' || old.receiver_id);
+    END
+    """,
+    """
+    CREATE TRIGGER api_message_fts_update AFTER UPDATE OF content, sender_id, receiver_id ON api_message BEGIN
+        INSERT INTO api_message_fts (api_message_fts, rowid, content, members)
+        VALUES ('delete', old.id, old.content, 'u' || old.sender_id || ' u' || old.receiver_id);
+        INSERT INTO api_message_fts (rowid, content, members)
+        VALUES (new.id, new.content, 'u' || new.sender_id || ' u' || new.receiver_id);
+    END
+    """,
+    "INSERT INTO api_message_fts (api_message_fts) VALUES ('rebuild')",
+]
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_message_fts_update",
+    "DROP TRIGGER IF EXISTS api_message_fts_delete",
+    "DROP TRIGGER IF EXISTS api_message_fts_insert",
+    "DROP TABLE IF EXISTS api_message_fts",
+    "DROP VIEW IF EXISTS api_message_fts_source",
+    "DROP TRIGGER IF EXISTS api_post_fts_update",
+    "DROP TRIGGER IF EXISTS api_post_fts_delete",
+    "DROP TRIGGER IF EXISTS api_post_fts_insert",
+    "DROP TABLE IF EXISTS api_post_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_inbox_counter'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD, BACKWARD),
+    ]
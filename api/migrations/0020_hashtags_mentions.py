@@ -0,0 +1,104 @@
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# A copy of the extraction in api/tags.py as it was when this migration was
+# written, so that later changes there do not change what it backfills.
+HASHTAG = re.compile(r'(?<![\w#])#(\w{1,100})')
+MENTION = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+MAX_TAGS = 30
+MAX_MENTIONS = 30
+
+
+def hashtags(content):
+    found = dict.fromkeys(tag.casefold() for tag in HASHTAG.findall(content or ''))
+    return list(found)[:MAX_TAGS]
+
+
+def mentioned_usernames(content):
+    found = dict.fromkeys(name.rstrip('.') for name in MENTION.findall(content or ''))
+    return [name for name in found if name][:MAX_MENTIONS]
+
+
+# TagCount follows PostTerm inserts and deletes, whichever code path (or
+# cascade) makes them.
+TRIGGERS = [
+    """
+    CREATE TRIGGER api_postterm_tagcount_insert AFTER INSERT ON api_postterm
+    WHEN new.term LIKE '#%' BEGIN
+        INSERT INTO api_tagcount (tag, posts) VALUES (substr(new.term, 2), 1)
+        ON CONFLICT (tag) DO UPDATE SET posts = posts + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER api_postterm_tagcount_delete AFTER DELETE ON api_postterm
+    WHEN old.term LIKE '#%' BEGIN
+        UPDATE api_tagcount SET posts = posts - 1 WHERE tag = substr(old.term, 2);
+        DELETE FROM api_tagcount WHERE tag = substr(old.term, 2) AND posts <= 0;
+    END
+    """,
+]
+
+DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS api_postterm_tagcount_delete",
+    "DROP TRIGGER IF EXISTS api_postterm_tagcount_insert",
+]
+
+
+def backfill(apps, schema_editor):
+    Member = apps.get_model('api', 'Member')
+    Post = apps.get_model('api', 'Post')
+    PostTerm = apps.get_model('api', 'PostTerm')
+
+    rows = Post._base_manager.values_list('id', 'content', 'created_at').iterator(chunk_size=2000)
+    batch = []
+    for post_id, content, created_at in rows:
+        terms = {f'#{tag}' for tag in hashtags(content)}
+        usernames = mentioned_usernames(content)
+        if usernames:
+            terms.update(
+                f'@{member_id}' for member_id in
+                Member._base_manager.filter(username__in=usernames).values_list('id', flat=True)
+            )
+        batch.extend(PostTerm(term=term, post_id=post_id, created_at=created_at) for term in terms)
+        if len(batch) >= 2000:
+            PostTerm.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    PostTerm.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('tag', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('posts', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-posts', 'tag'], name='api_tagcount_top')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=101)),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', '-created_at', '-post'], name='api_postterm_timeline')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'term'), name='unique_post_term')],
+            },
+        ),
+        migrations.RunSQL(TRIGGERS, DROP_TRIGGERS),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_hashtags_mentions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('collection', models.CharField(choices=[('friends', 'Friends'), ('following', 'Following'), ('followers', 'Followers'), ('conversations', 'Conversations'), ('posts', 'Posts')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('insert', 'Insert'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.member')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['member', 'id'], name='api_changel_member__975c56_idx'), models.Index(fields=['created_at'], name='api_changel_created_697be7_idx')],
+            },
+        ),
+    ]
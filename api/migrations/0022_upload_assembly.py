@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='upload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('assembling', 'Assembling'), ('complete', 'Complete')], db_index=True, default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Existing notifications only know their latest actor; the others are
+# counted again if they act again within the window.
+BACKFILL = """
+    INSERT INTO api_notificationactor (notification_id, actor_id)
+    SELECT id, last_actor_id FROM api_notification WHERE last_actor_id IS NOT NULL
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_upload_assembly'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.member')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.notification')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('notification', 'actor'), name='unique_notification_actor')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
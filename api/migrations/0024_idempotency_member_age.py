@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_notification_actors'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='idempotencykey',
+            index=models.Index(fields=['member', 'status', '-created_at'], name='api_idempotency_member_age'),
+        ),
+    ]
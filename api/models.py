@@ -1,8 +1,19 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
 
 
+class LiveManager(models.Manager):
+    """
+    Default manager of tombstoned models: rows with ``deleted_at`` set are
+    gone as far as the application is concerned
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Member(models.Model):
     username = models.CharField(max_length=150, unique=True, db_index=True)
     password = models.CharField(max_length=128)
@@ -14,6 +25,10 @@ class Member(models.Model):
     date_joined = models.DateTimeField(default=timezone.now, db_index=True)
     last_seen = models.DateTimeField(default=timezone.now)
     is_online = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     is_authenticated = True
     is_anonymous = False
@@ -35,6 +50,7 @@ class Member(models.Model):
 
     class Meta:
         ordering = ['-date_joined']
+        base_manager_name = 'all_objects'
         indexes = [
             models.Index(fields=['username']),
             models.Index(fields=['-date_joined']),
@@ -46,14 +62,29 @@ class Post(models.Model):
     content = models.TextField()
     image_url = models.URLField(blank=True, null=True)
     video_url = models.URLField(blank=True, null=True)
+    repost_of = models.ForeignKey(
+        'self', on_delete=models.CASCADE, null=True, blank=True, related_name='shares'
+    )
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    @property
+    def original(self):
+        """
+        The post that engagement (likes, comments, reposts) belongs to
+        """
+        return self.repost_of if self.repost_of_id else self
 
     def __str__(self):
         return f"Post by {self.author.username} at {self.created_at}"
 
     class Meta:
         ordering = ['-created_at']
+        base_manager_name = 'all_objects'
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['author', '-created_at']),
@@ -117,8 +148,21 @@ class FriendRequest(models.Model):
     from_member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='sent_requests')
     to_member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='received_requests')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    pair_low = models.BigIntegerField(editable=False)
+    pair_high = models.BigIntegerField(editable=False)
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
+    @staticmethod
+    def pair_key(member_a_id, member_b_id):
+        """
+        Canonical (low_id, high_id) key shared by both directions of a pair
+        """
+        return min(member_a_id, member_b_id), max(member_a_id, member_b_id)
+
+    def save(self, *args, **kwargs):
+        self.pair_low, self.pair_high = self.pair_key(self.from_member_id, self.to_member_id)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Friend request from {self.from_member.username} to {self.to_member.username} ({self.status})"
 
@@ -128,6 +172,43 @@ class FriendRequest(models.Model):
             models.Index(fields=['to_member', 'status', '-created_at']),
             models.Index(fields=['from_member', '-created_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['pair_low', 'pair_high'], name='unique_friend_request_pair'),
+        ]
+
+
+class Friendship(models.Model):
+    """
+    Symmetric friendship edge: an accepted pair is stored once per direction
+    so that friend lookups are a single seek on ``member``.
+    """
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='friendships')
+    friend = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def link(cls, member_a_id, member_b_id):
+        cls.objects.bulk_create(
+            [cls(member_id=member_a_id, friend_id=member_b_id), cls(member_id=member_b_id, friend_id=member_a_id)],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def unlink(cls, member_a_id, member_b_id):
+        cls.objects.filter(
+            models.Q(member_id=member_a_id, friend_id=member_b_id) |
+            models.Q(member_id=member_b_id, friend_id=member_a_id)
+        ).delete()
+
+    @classmethod
+    def friend_ids(cls, member):
+        return cls.objects.filter(member=member).values_list('friend_id', flat=True)
+
+    def __str__(self):
+        return f"{self.member_id} is friends with {self.friend_id}"
+
+    class Meta:
+        unique_together = ('member', 'friend')
 
 
 class Subscription(models.Model):
@@ -163,3 +244,377 @@ class Message(models.Model):
             models.Index(fields=['receiver', 'is_read', '-created_at']),
             models.Index(fields=['sender', '-created_at']),
         ]
+
+
+class ImportCheckpoint(models.Model):
+    name = models.CharField(max_length=255, primary_key=True)
+    kind = models.CharField(max_length=20)
+    records_done = models.BigIntegerField(default=0)
+    records_skipped = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import {self.name} ({self.kind}): {self.records_done} records"
+
+
+class TrendingPost(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0)
+    post_created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trending score {self.score:.3f} for post {self.post_id}"
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['-score']),
+            models.Index(fields=['post_created_at']),
+        ]
+
+
+class FriendSuggestion(models.Model):
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='friend_suggestions')
+    suggested = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='+')
+    mutual_count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Suggest {self.suggested_id} to {self.member_id} ({self.mutual_count} mutual)"
+
+    class Meta:
+        unique_together = ('member', 'suggested')
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['member', '-score']),
+        ]
+
+
+class SuggestionRefresh(models.Model):
+    member = models.OneToOneField(Member, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    queued_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Refresh suggestions for {self.member_id}"
+
+
+class ArchivedMessageMonth(models.Model):
+    """
+    How many messages between a pair of members sit in a monthly archive file
+    """
+    pair_low = models.BigIntegerField()
+    pair_high = models.BigIntegerField()
+    month = models.DateField()
+    messages = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.messages} archived messages between {self.pair_low} and {self.pair_high} in {self.month:%Y-%m}"
+
+    class Meta:
+        unique_together = ('pair_low', 'pair_high', 'month')
+        ordering = ['-month']
+        indexes = [
+            models.Index(fields=['pair_high']),
+        ]
+
+
+class MaintenanceRun(models.Model):
+    started_at = models.DateTimeField(default=timezone.now, db_index=True)
+    duration = models.FloatField(default=0)
+    tables_analyzed = models.PositiveIntegerField(default=0)
+    pages_reclaimed = models.PositiveIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    detail = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Maintenance at {self.started_at:%Y-%m-%d %H:%M}: {self.pages_reclaimed} pages reclaimed"
+
+    class Meta:
+        ordering = ['-started_at']
+
+
+class Upload(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('assembling', 'Assembling'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    path = models.CharField(max_length=255, blank=True)
+    # Why the last assembly failed, until the next one is started.
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        """
+        Expected byte length of chunk ``index``; only the last one is short
+        """
+        if index == self.chunk_count - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
+
+    def __str__(self):
+        return f"Upload {self.filename} by {self.owner.username} ({self.status})"
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    key = models.CharField(max_length=255, null=True, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Job {self.id} {self.name} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at']),
+            models.Index(fields=['status', 'finished_at']),
+        ]
+        constraints = [
+            # At most one queued job per key, so repeated enqueues coalesce.
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='queued'), name='unique_queued_job_key'),
+        ]
+
+
+class DeletionJob(models.Model):
+    """
+    Progress of purging a tombstoned row and everything that depends on it
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    requested_by = models.ForeignKey(Member, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_deleted = models.BigIntegerField(default=0)
+    current = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Deletion of {self.model} {self.object_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class Notification(models.Model):
+    """
+    Likes, comments and reposts of one post within one time window,
+    aggregated into a single row that is updated in place
+    """
+    VERB_CHOICES = [
+        ('like', 'Like'),
+        ('comment', 'Comment'),
+        ('repost', 'Repost'),
+    ]
+
+    recipient = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='notifications')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    window = models.BigIntegerField()
+    last_actor = models.ForeignKey(Member, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    actor_count = models.PositiveIntegerField(default=1)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.actor_count} x {self.verb} on post {self.post_id} for {self.recipient_id}"
+
+    class Meta:
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at', '-id']),
+            models.Index(fields=['recipient', 'is_read']),
+            models.Index(fields=['updated_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'post', 'verb', 'window'], name='unique_notification_window'),
+        ]
+
+
+class NotificationActor(models.Model):
+    """
+    A member counted in a notification's ``actor_count``
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='+')
+
+    def __str__(self):
+        return f"{self.actor_id} in notification {self.notification_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'actor'], name='unique_notification_actor'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored outcome of a mutating request sent with an ``Idempotency-Key``
+    """
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('complete', 'Complete'),
+    ]
+
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of {self.member_id} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'key'], name='unique_member_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['member', 'status', '-created_at'], name='api_idempotency_member_age'),
+        ]
+
+
+class MemberVersions(models.Model):
+    """
+    Counters that move whenever something a member polls for changes
+    """
+    member = models.OneToOneField(Member, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    feed = models.PositiveBigIntegerField(default=0)
+    inbox = models.PositiveBigIntegerField(default=0)
+    friend_requests = models.PositiveBigIntegerField(default=0)
+    notifications = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Versions of {self.member_id}"
+
+
+class InboxCounter(models.Model):
+    """
+    Number of unread messages a member has, maintained on write
+    """
+    member = models.OneToOneField(Member, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.unread} unread for {self.member_id}"
+
+
+class PostTerm(models.Model):
+    """
+    Inverted index of the hashtags ("#tag") and mentions ("@<member id>")
+    in posts, maintained by api/tags.py
+    """
+    term = models.CharField(max_length=101)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.term} in post {self.post_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'term'], name='unique_post_term'),
+        ]
+        indexes = [
+            models.Index(fields=['term', '-created_at', '-post'], name='api_postterm_timeline'),
+        ]
+
+
+class TagCount(models.Model):
+    """
+    Number of posts carrying a hashtag, kept up to date by database triggers
+    on PostTerm (migration 0020)
+    """
+    tag = models.CharField(max_length=100, primary_key=True)
+    posts = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"#{self.tag}: {self.posts}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-posts', 'tag'], name='api_tagcount_top'),
+        ]
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One change to a collection that a member's client mirrors (friends,
+    subscriptions, conversations, own posts), read back by GET /sync/
+    """
+    COLLECTION_CHOICES = [
+        ('friends', 'Friends'),
+        ('following', 'Following'),
+        ('followers', 'Followers'),
+        ('conversations', 'Conversations'),
+        ('posts', 'Posts'),
+    ]
+    OP_CHOICES = [
+        ('insert', 'Insert'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='+')
+    collection = models.CharField(max_length=20, choices=COLLECTION_CHOICES)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.op} {self.collection}/{self.object_id} for {self.member_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['member', 'id']),
+            models.Index(fields=['created_at']),
+        ]
@@ -0,0 +1,119 @@
+"""
+Aggregated notifications for likes, comments and reposts.
+
+Events on the same post, of the same kind, for the same recipient and within
+the same ``NOTIFICATION_WINDOW_SECONDS`` bucket share one ``Notification``
+row: the first event inserts it and every later one is a single in-place
+``UPDATE`` of ``last_actor`` with F-expressions. The number of rows therefore
+grows with distinct notifications, not with raw events, and the
+per-recipient index stays small. An update also marks the row unread again
+and moves it to the top of the recipient's list.
+
+``actor_count`` counts distinct members. Each actor of a notification gets
+a ``NotificationActor`` row, and only an event whose insert of that row
+succeeds adds one, so A, B, A is two actors, not three.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api import tasks, versions
+from api.models import Notification, NotificationActor
+
+
+PHRASES = {
+    'like': 'liked your post',
+    'comment': 'commented on your post',
+    'repost': 'reposted your post',
+}
+
+
+def window(now):
+    return int(now.timestamp()) // settings.NOTIFICATION_WINDOW_SECONDS
+
+
+def _add_actor(notification_id, actor):
+    """
+    Record ``actor`` on the notification; returns ``False`` if already there
+    """
+    try:
+        with transaction.atomic():
+            NotificationActor.objects.create(notification_id=notification_id, actor=actor)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _bump(recipient_id, post, verb, actor, now):
+    notification_id = Notification.objects.filter(
+        recipient_id=recipient_id, post=post, verb=verb, window=window(now)
+    ).values_list('id', flat=True).first()
+    if notification_id is None:
+        return False
+    new_actor = _add_actor(notification_id, actor)
+    Notification.objects.filter(pk=notification_id).update(
+        actor_count=F('actor_count') + 1 if new_actor else F('actor_count'),
+        last_actor=actor,
+        is_read=False,
+        updated_at=now,
+    )
+    return True
+
+
+def record(post, verb, actor):
+    """
+    Notify the author of ``post`` that ``actor`` did ``verb`` to it
+    """
+    recipient_id = post.author_id
+    if recipient_id == actor.id:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        versions.bump(recipient_id, 'notifications')
+        if _bump(recipient_id, post, verb, actor, now):
+            return
+        try:
+            with transaction.atomic():
+                notification = Notification.objects.create(
+                    recipient_id=recipient_id, post=post, verb=verb, window=window(now),
+                    last_actor=actor, created_at=now, updated_at=now,
+                )
+                _add_actor(notification.id, actor)
+        except IntegrityError:
+            _bump(recipient_id, post, verb, actor, now)
+
+
+def summary(notification):
+    """
+    e.g. "ann and 41 others liked your post"
+    """
+    actor = notification.last_actor.username if notification.last_actor_id else 'Someone'
+    others = notification.actor_count - 1
+    if others == 1:
+        actor = f"{actor} and 1 other"
+    elif others > 1:
+        actor = f"{actor} and {others} others"
+    return f"{actor} {PHRASES[notification.verb]}"
+
+
+def mark_read(member, up_to=None):
+    """
+    Mark the member's notifications read, optionally only those updated no
+    later than ``up_to``. Returns how many changed.
+    """
+    unread = Notification.objects.filter(recipient=member, is_read=False)
+    if up_to is not None:
+        unread = unread.filter(updated_at__lte=up_to)
+    marked = unread.update(is_read=True)
+    if marked:
+        versions.bump(member.id, 'notifications')
+    return marked
+
+
+@tasks.task(name='purge_notifications', every=3600)
+def purge_notifications():
+    cutoff = timezone.now() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    Notification.objects.filter(updated_at__lt=cutoff).delete()
@@ -0,0 +1,36 @@
+from rest_framework.pagination import CursorPagination
+
+
+class LikeCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (post, -created_at) index of Like
+    """
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class NotificationCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (recipient, -updated_at, -id) index of
+    Notification
+    """
+    ordering = ('-updated_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PostTermCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (term, -created_at, -post) index of PostTerm
+    """
+    ordering = ('-created_at', '-post_id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        # Always the index order, whatever OrderingFilter the view has.
+        return self.ordering
@@ -0,0 +1,34 @@
+"""
+OpenAPI annotations that cost nothing at runtime.
+
+Views import ``extend_schema``, ``OpenApiParameter`` and ``OpenApiTypes``
+from here. While the schema is being generated (``API_SCHEMA_GENERATION``)
+these are drf-spectacular's own; otherwise they are inert stand-ins, so
+serving requests never imports drf-spectacular.
+"""
+from django.conf import settings
+
+
+if settings.API_SCHEMA_GENERATION:
+    from drf_spectacular.types import OpenApiTypes
+    from drf_spectacular.utils import OpenApiParameter, extend_schema
+else:
+    def extend_schema(*args, **kwargs):
+        def decorator(view):
+            return view
+        return decorator
+
+    class OpenApiParameter:
+        QUERY = 'query'
+        PATH = 'path'
+        HEADER = 'header'
+        COOKIE = 'cookie'
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+    class _OpenApiTypes:
+        def __getattr__(self, name):
+            return name
+
+    OpenApiTypes = _OpenApiTypes()
@@ -0,0 +1,212 @@
+"""
+Full-text search over posts and messages with SQLite FTS5.
+
+``api_post_fts`` and ``api_message_fts`` (migration 0019) are
+external-content indexes: they store only the inverted index, read the text
+from ``api_post`` and ``api_message``, and are kept in sync by triggers, so
+bulk writes and the deletion purge update them too. Messages also index
+their participants as ``u<member id>`` tokens, which turns "this member's
+messages matching X" into one FTS query instead of a filter over every hit.
+
+User input never reaches the MATCH syntax: it is split into words the way
+the ``unicode61`` tokenizer splits text, each word is quoted, and all of
+them must match.
+
+The index is only asked for the newest ``SEARCH_CANDIDATES`` matches, in
+rowid order, which FTS5 streams and stops early on. Ranking happens here on
+those candidates: BM25 over their text, divided by ``1 + age /
+SEARCH_RECENCY_DAYS``. FTS5's own ``bm25()`` and ``snippet()`` are not
+used, because ``bm25()`` counts every document containing each term to
+weigh it, which for a common word is a scan of millions of entries. A
+term's document frequency is estimated instead from how far back its own
+newest ``SEARCH_CANDIDATES`` matches reach. So a query costs the same for a
+word found in millions of posts as for a rare one.
+
+Archived messages are searched through the FTS5 index each monthly archive
+file carries (api/archive.py). Archived messages are older than every hot
+one, so the archives are only consulted, newest month first, when the hot
+table has fewer than ``SEARCH_CANDIDATES`` matches.
+"""
+import math
+import re
+import unicodedata
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+
+from api import archive
+
+# Word characters without the underscore, as in unicode61.
+WORD = re.compile(r'[^\W_]+')
+
+# Words of a query beyond this are ignored.
+MAX_TERMS = 8
+
+# Snippet length in words.
+SNIPPET_WORDS = 12
+
+# BM25 parameters, the usual ones (and FTS5's).
+K1 = 1.2
+B = 0.75
+
+CANDIDATES_SQL = {
+    'api_post_fts': """
+        WITH hits AS (
+            SELECT rowid AS id FROM api_post_fts WHERE api_post_fts MATCH %s ORDER BY rowid DESC LIMIT %s
+        )
+        SELECT p.id, p.content, julianday('now') - julianday(p.created_at)
+        FROM hits
+        JOIN api_post p ON p.id = hits.id
+        JOIN api_member m ON m.id = p.author_id
+        WHERE p.deleted_at IS NULL AND m.deleted_at IS NULL
+    """,
+    'api_message_fts': """
+        WITH hits AS (
+            SELECT rowid AS id FROM api_message_fts WHERE api_message_fts MATCH %s ORDER BY rowid DESC LIMIT %s
+        )
+        SELECT msg.id, msg.content, julianday('now') - julianday(msg.created_at)
+        FROM hits
+        JOIN api_message msg ON msg.id = hits.id
+    """,
+}
+
+
+def _fold(text):
+    """
+    ``text`` lower-cased and without diacritics, as the index stores it
+    """
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def terms(query):
+    """
+    The distinct indexed words of ``query``, in order
+    """
+    return list(dict.fromkeys(WORD.findall(_fold(query))))[:MAX_TERMS]
+
+
+def _phrase(words):
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def _document_frequency(cursor, table, term, limit, documents):
+    """
+    Documents containing ``term``, estimated from the density of its newest
+    ``limit`` matches when it has more
+    """
+    cursor.execute(
+        f"SELECT count(*), min(rowid) FROM (SELECT rowid FROM {table} WHERE {table} MATCH %s "
+        f"ORDER BY rowid DESC LIMIT %s)",
+        [f'content : ({_phrase([term])})', limit],
+    )
+    matches, oldest = cursor.fetchone()
+    if matches < limit:
+        return matches
+    return min(documents, matches * documents / max(documents - oldest + 1, 1))
+
+
+def _score(words, weights, average_length):
+    length_norm = K1 * (1 - B + B * len(words) / average_length)
+    score = 0.0
+    for term, weight in weights.items():
+        frequency = words.count(term)
+        score += weight * frequency * (K1 + 1) / (frequency + length_norm)
+    return score
+
+
+def snippet(text, query_terms):
+    """
+    The ``SNIPPET_WORDS`` words of ``text`` holding the most query terms,
+    HTML-escaped, with the terms wrapped in ``<mark>``
+    """
+    words = list(WORD.finditer(text))
+    if not words:
+        return escape(text)
+    hits = [_fold(match.group()) in query_terms for match in words]
+    start = max(
+        range(max(len(words) - SNIPPET_WORDS, 0) + 1),
+        key=lambda i: (sum(hits[i:i + SNIPPET_WORDS]), -i),
+    )
+    end = min(start + SNIPPET_WORDS, len(words))
+    parts = ['…' if start else '']
+    position = words[start].start() if start else 0
+    for i in range(start, end):
+        match = words[i]
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>' if hits[i] else escape(match.group()))
+        position = match.end()
+    parts.append(escape(text[position:]) if end == len(words) else '…')
+    return ''.join(parts)
+
+
+def _search(cursor, table, match, query_terms, limit, offset, more_candidates=None):
+    candidates_limit = settings.SEARCH_CANDIDATES
+    cursor.execute(CANDIDATES_SQL[table], [match, candidates_limit])
+    candidates = cursor.fetchall()
+    if more_candidates is not None and len(candidates) < candidates_limit:
+        candidates += more_candidates(candidates_limit - len(candidates))
+    if not candidates:
+        return []
+
+    # A single term's weight would not change the order.
+    weights = dict.fromkeys(query_terms, 1.0)
+    if len(query_terms) > 1:
+        cursor.execute(f"SELECT max(rowid) FROM {table}")
+        documents = cursor.fetchone()[0] or 0
+        for term in query_terms:
+            frequency = _document_frequency(cursor, table, term, candidates_limit, documents)
+            weights[term] = max(math.log((documents - frequency + 0.5) / (frequency + 0.5) + 1), 1e-6)
+
+    words = [WORD.findall(_fold(content)) for _, content, _ in candidates]
+    average_length = max(sum(map(len, words)) / len(words), 1)
+    scored = []
+    for (row_id, content, age), doc in zip(candidates, words):
+        relevance = _score(doc, weights, average_length)
+        scored.append((relevance / (1 + max(age, 0) / settings.SEARCH_RECENCY_DAYS), row_id, content))
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    wanted = set(query_terms)
+    return [(row_id, snippet(content, wanted)) for _, row_id, content in scored[offset:offset + limit]]
+
+
+def _run(cursor, table, match, query_terms, limit, offset, more_candidates=None):
+    with nullcontext(cursor) if cursor is not None else connection.cursor() as cursor:
+        return _search(cursor, table, match, query_terms, limit, offset, more_candidates)
+
+
+def search_posts(query, limit=20, offset=0, cursor=None):
+    """
+    ``[(post id, snippet), ...]`` for visible posts containing every word of
+    ``query``, best first
+    """
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    return _run(cursor, 'api_post_fts', f'content : ({_phrase(query_terms)})', query_terms, limit, offset)
+
+
+def search_messages(member_id, query, other_id=None, limit=20, offset=0, cursor=None, archived=True):
+    """
+    ``[(message id, snippet), ...]`` for messages sent or received by
+    ``member_id`` containing every word of ``query``, optionally only those
+    exchanged with ``other_id``, best first. Unless ``archived`` is false,
+    archived messages are searched too; resolve their ids with
+    ``archive.messages_by_id``.
+    """
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    members = [f'u{int(member_id)}']
+    if other_id is not None:
+        members.append(f'u{int(other_id)}')
+    match = f'members : ({_phrase(members)}) AND content : ({_phrase(query_terms)})'
+
+    def archived_candidates(count):
+        return archive.search_candidates(member_id, match, count, other_id=other_id)
+
+    more = archived_candidates if archived else None
+    return _run(cursor, 'api_message_fts', match, query_terms, limit, offset, more)
@@ -1,6 +1,8 @@
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
-from django.db import models
-from api.models import Member, Post, Comment, Like, FriendRequest, Subscription, Message
+from api import hashing, likebuffer, notifications, uploads
+from api.models import Member, Post, Comment, Like, FriendRequest, Subscription, Message, FriendSuggestion, Friendship, Upload, DeletionJob, Notification, TagCount
 
 
 class MemberSerializer(serializers.ModelSerializer):
@@ -28,11 +30,7 @@ class MemberSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
 
     def get_friends_count(self, obj):
-        return FriendRequest.objects.filter(
-            status='accepted'
-        ).filter(
-            models.Q(from_member=obj) | models.Q(to_member=obj)
-        ).count()
+        return Friendship.objects.filter(member=obj).count()
 
     def get_followers_count(self, obj):
         return Subscription.objects.filter(following=obj).count()
@@ -41,6 +39,17 @@ class MemberSerializer(serializers.ModelSerializer):
         return Subscription.objects.filter(follower=obj).count()
 
 
+class MemberSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact member representation for long lists; runs no extra queries
+    """
+
+    class Meta:
+        model = Member
+        fields = ['id', 'username', 'first_name', 'last_name', 'avatar_url', 'is_online']
+        read_only_fields = fields
+
+
 class MemberRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8, max_length=128)
     password_confirm = serializers.CharField(write_only=True, min_length=8, max_length=128)
@@ -57,12 +66,12 @@ class MemberRegistrationSerializer(serializers.ModelSerializer):
         ]
 
     def validate_username(self, value):
-        if Member.objects.filter(username=value).exists():
+        if Member.all_objects.filter(username=value).exists():
             raise serializers.ValidationError("Username already exists")
         return value
 
     def validate_email(self, value):
-        if Member.objects.filter(email=value).exists():
+        if Member.all_objects.filter(email=value).exists():
             raise serializers.ValidationError("Email already exists")
         return value
 
@@ -75,7 +84,7 @@ class MemberRegistrationSerializer(serializers.ModelSerializer):
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
         member = Member(**validated_data)
-        member.set_password(password)
+        member.password = hashing.make_password(password)
         member.save()
         return member
 
@@ -103,8 +112,18 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class OriginalPostSerializer(serializers.ModelSerializer):
+    author = MemberSerializer(read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ['id', 'author', 'content', 'image_url', 'video_url', 'created_at']
+        read_only_fields = fields
+
+
 class PostSerializer(serializers.ModelSerializer):
     author = MemberSerializer(read_only=True)
+    repost_of = OriginalPostSerializer(read_only=True)
     likes_count = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
     reposts_count = serializers.SerializerMethodField()
@@ -118,6 +137,7 @@ class PostSerializer(serializers.ModelSerializer):
             'content',
             'image_url',
             'video_url',
+            'repost_of',
             'created_at',
             'updated_at',
             'likes_count',
@@ -127,20 +147,26 @@ class PostSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    # Reposts are references: counters always reflect the original post.
+
     def get_likes_count(self, obj):
-        return Like.objects.filter(post=obj).count()
+        if likebuffer.enabled():
+            return likebuffer.likes_count(obj.original.id)
+        return Like.objects.filter(post=obj.original).count()
 
     def get_comments_count(self, obj):
-        return Comment.objects.filter(post=obj).count()
+        return Comment.objects.filter(post=obj.original).count()
 
     def get_reposts_count(self, obj):
         from api.models import Repost
-        return Repost.objects.filter(post=obj).count()
+        return Repost.objects.filter(post=obj.original).count()
 
     def get_is_liked_by_user(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user') and isinstance(request.user, Member):
-            return Like.objects.filter(post=obj, member=request.user).exists()
+            if likebuffer.enabled():
+                return likebuffer.is_liked(request.user.id, obj.original.id)
+            return Like.objects.filter(post=obj.original, member=request.user).exists()
         return False
 
 
@@ -172,3 +198,84 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = ['id', 'sender', 'receiver', 'content', 'created_at', 'is_read']
         read_only_fields = ['id', 'created_at']
+
+
+class FriendSuggestionSerializer(serializers.ModelSerializer):
+    member = MemberSummarySerializer(source='suggested', read_only=True)
+
+    class Meta:
+        model = FriendSuggestion
+        fields = ['member', 'mutual_count', 'score']
+        read_only_fields = fields
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    chunk_count = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+    file_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Upload
+        fields = [
+            'id', 'filename', 'content_type', 'size', 'sha256', 'chunk_size', 'chunk_count',
+            'received_chunks', 'status', 'error', 'file_url', 'created_at', 'completed_at'
+        ]
+        read_only_fields = ['id', 'chunk_size', 'status', 'error', 'created_at', 'completed_at']
+
+    def validate_content_type(self, value):
+        value = value.split(';')[0].strip().lower()
+        if value not in uploads.MEDIA_TYPES:
+            raise serializers.ValidationError(
+                f"Unsupported content type; expected one of {', '.join(sorted(uploads.MEDIA_TYPES))}"
+            )
+        return value
+
+    def validate_size(self, value):
+        if value < 0 or value > settings.UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"Size must be between 0 and {settings.UPLOAD_MAX_BYTES} bytes")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError("Expected a hex-encoded SHA-256 digest")
+        return value
+
+    def get_received_chunks(self, obj):
+        if obj.status == 'complete':
+            return list(range(obj.chunk_count))
+        return uploads.received_chunks(obj)
+
+    def get_file_url(self, obj):
+        if obj.status != 'complete':
+            return None
+        url = reverse('upload-file', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeletionJob
+        fields = ['id', 'model', 'object_id', 'status', 'rows_deleted', 'current', 'created_at', 'updated_at', 'finished_at']
+        read_only_fields = fields
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    last_actor = MemberSummarySerializer(read_only=True)
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'verb', 'post', 'last_actor', 'actor_count', 'summary', 'is_read', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+    def get_summary(self, obj):
+        return notifications.summary(obj)
+
+
+class TagCountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TagCount
+        fields = ['tag', 'posts']
+        read_only_fields = fields
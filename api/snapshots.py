@@ -0,0 +1,156 @@
+"""
+Consistent SQLite snapshots and fast database provisioning at boot.
+
+Snapshots are taken from the live database with SQLite's online backup API,
+a bounded number of pages per step, so writers are only ever paused for one
+step and the copy is still a consistent point-in-time image. Restores use
+the same API in the other direction, into a temporary file that is renamed
+over the target.
+
+Fresh installs start from a template database that was migrated when the
+image was built, so boot is a file copy instead of a full migration run.
+
+This module only uses the standard library so that ``docker-entrypoint.sh``
+can run it (``python -m api.snapshots``) without starting Django.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+# Pages copied per backup step, and the pause between steps that lets
+# writers in.
+STEP_PAGES = 1024
+STEP_SLEEP = 0.005
+
+SNAPSHOT_GLOB = 'db-*.sqlite3'
+
+MODES = ('preserve', 'fresh', 'restore')
+
+
+def backup(source, target, pages=STEP_PAGES, sleep=STEP_SLEEP):
+    """
+    Copy the SQLite database at ``source`` to ``target`` through the online
+    backup API. ``target`` is written to a temporary file first and only
+    appears once complete.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        with closing(sqlite3.connect(f"file:{source}?mode=ro", uri=True)) as src, \
+                closing(sqlite3.connect(temporary)) as dst:
+            src.backup(dst, pages=pages, sleep=sleep)
+        for suffix in ('-wal', '-shm', '-journal'):
+            Path(f"{target}{suffix}").unlink(missing_ok=True)
+        os.replace(temporary, target)
+    finally:
+        temporary.unlink(missing_ok=True)
+    return target
+
+
+def snapshot(database, directory, keep=None):
+    """
+    Write a timestamped snapshot of ``database`` into ``directory`` and prune
+    all but the newest ``keep`` snapshots. Returns the snapshot path.
+    """
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    path = backup(database, Path(directory) / f"db-{stamp}.sqlite3")
+    if keep:
+        for old in list_snapshots(directory)[:-keep]:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def list_snapshots(directory):
+    """
+    Snapshots in ``directory``, oldest first
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(SNAPSHOT_GLOB))
+
+
+def latest_snapshot(directory):
+    snapshots = list_snapshots(directory)
+    return snapshots[-1] if snapshots else None
+
+
+def applied_migrations(database):
+    with closing(sqlite3.connect(f"file:{database}?mode=ro", uri=True)) as db:
+        try:
+            return set(db.execute("SELECT app, name FROM django_migrations"))
+        except sqlite3.OperationalError:
+            return set()
+
+
+def needs_migrate(database, template):
+    """
+    Whether ``database`` lacks migrations that the image's template has, i.e.
+    whether ``manage.py migrate`` has to run before serving
+    """
+    if not Path(template).exists():
+        return True
+    return not applied_migrations(template) <= applied_migrations(database)
+
+
+def provision(database, template, snapshots, mode='preserve', restore_from=None):
+    """
+    Prepare ``database`` for boot and describe what was done.
+
+    ``preserve`` keeps an existing database and otherwise restores the latest
+    snapshot, falling back to the template. ``fresh`` starts over from the
+    template, after snapshotting whatever was there. ``restore`` replaces the
+    database with ``restore_from`` or the latest snapshot.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    database, template = Path(database), Path(template)
+
+    if mode == 'preserve' and database.exists():
+        return 'Kept the existing database'
+
+    if mode in ('preserve', 'restore'):
+        source = Path(restore_from) if restore_from else latest_snapshot(snapshots)
+        if source is not None and source.exists():
+            backup(source, database)
+            return f'Restored the database from {source}'
+        if mode == 'restore':
+            raise FileNotFoundError("No snapshot to restore from")
+
+    if mode == 'fresh' and database.exists():
+        snapshot(database, snapshots)
+    if not template.exists():
+        database.unlink(missing_ok=True)
+        return 'No template; the database will be migrated from scratch'
+    backup(template, database)
+    return f'Created the database from template {template}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m api.snapshots')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    boot = sub.add_parser('provision', help="Prepare the database before the app starts")
+    boot.add_argument('--database', required=True)
+    boot.add_argument('--template', required=True)
+    boot.add_argument('--snapshots', required=True)
+    boot.add_argument('--mode', choices=MODES, default='preserve')
+    boot.add_argument('--restore-from')
+
+    args = parser.parse_args(argv)
+    started = time.monotonic()
+    action = provision(args.database, args.template, args.snapshots, args.mode, args.restore_from)
+    print(f"==> {action} ({time.monotonic() - started:.2f}s)")
+    # Exit status 3 tells the entrypoint to run migrations.
+    return 3 if needs_migrate(args.database, args.template) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
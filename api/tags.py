@@ -0,0 +1,111 @@
+"""
+Hashtags and mentions.
+
+When a post is created or edited, its ``#tags`` and ``@username`` mentions
+are extracted and stored as ``PostTerm`` rows, ``(term, post, created_at)``,
+with the post's creation time copied in. A tag timeline or a member's
+mentions is then one range scan of the (term, -created_at, -post) index,
+keyset-paginated, instead of a ``LIKE`` over every post.
+
+Tags are stored case-folded as ``#tag``. Mentions are resolved to members
+when the post is saved and stored as ``@<member id>``, so they survive
+username changes; names that match nobody are ignored.
+
+``TagCount`` holds the number of posts per tag. SQLite triggers on
+``api_postterm`` (migration 0020) adjust it on every insert and delete,
+including cascades from the deletion purge, so the top tags are a scan of
+its (-posts, tag) index. Tombstoned posts keep counting until purged.
+"""
+import re
+
+from django.db import transaction
+
+from api.models import Member, PostTerm, TagCount
+
+
+HASHTAG = re.compile(r'(?<![\w#])#(\w{1,100})')
+MENTION = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+
+# Terms indexed per post; the rest of a tag-stuffed post is ignored.
+MAX_TAGS = 30
+MAX_MENTIONS = 30
+
+
+def hashtags(content):
+    found = dict.fromkeys(tag.casefold() for tag in HASHTAG.findall(content or ''))
+    return list(found)[:MAX_TAGS]
+
+
+def mentioned_usernames(content):
+    # A mention at the end of a sentence does not include the full stop.
+    found = dict.fromkeys(name.rstrip('.') for name in MENTION.findall(content or ''))
+    return [name for name in found if name][:MAX_MENTIONS]
+
+
+def terms(content):
+    """
+    The index terms of a post's text
+    """
+    found = {f'#{tag}' for tag in hashtags(content)}
+    usernames = mentioned_usernames(content)
+    if usernames:
+        found.update(
+            f'@{member_id}' for member_id in
+            Member.objects.filter(username__in=usernames).values_list('id', flat=True)
+        )
+    return found
+
+
+@transaction.atomic
+def index_post(post):
+    """
+    Bring the post's ``PostTerm`` rows in line with its current content
+    """
+    wanted = terms(post.content)
+    existing = set(PostTerm.objects.filter(post=post).values_list('term', flat=True))
+    if existing - wanted:
+        PostTerm.objects.filter(post=post, term__in=existing - wanted).delete()
+    PostTerm.objects.bulk_create([
+        PostTerm(term=term, post=post, created_at=post.created_at) for term in wanted - existing
+    ])
+
+
+def index_new_posts(posts):
+    """
+    Create the ``PostTerm`` rows of freshly inserted posts, which have none
+    yet, resolving the mentions of the whole batch in one query
+    """
+    usernames = {name for post in posts for name in mentioned_usernames(post.content)}
+    member_ids = dict(
+        Member.objects.filter(username__in=usernames).values_list('username', 'id')
+    ) if usernames else {}
+    rows = []
+    for post in posts:
+        found = {f'#{tag}' for tag in hashtags(post.content)}
+        found.update(
+            f'@{member_ids[name]}' for name in mentioned_usernames(post.content) if name in member_ids
+        )
+        rows.extend(PostTerm(term=term, post=post, created_at=post.created_at) for term in found)
+    PostTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+def timeline(term):
+    """
+    Live posts indexed under ``term``, newest first; paginate with
+    ``PostTermCursorPagination``
+    """
+    return PostTerm.objects.filter(term=term, post__deleted_at__isnull=True).select_related(
+        'post', 'post__author', 'post__repost_of', 'post__repost_of__author'
+    )
+
+
+def tag_timeline(tag):
+    return timeline(f'#{tag.casefold()}')
+
+
+def mentions(member_id):
+    return timeline(f'@{member_id}')
+
+
+def top_tags(limit=20):
+    return TagCount.objects.filter(posts__gt=0).order_by('-posts', 'tag')[:limit]
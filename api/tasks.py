@@ -0,0 +1,276 @@
+"""
+Background jobs stored in the application database.
+
+Jobs are rows of ``Job``; there is no external broker. A worker claims a job
+with an optimistic ``UPDATE ... WHERE id = ? AND status = 'queued'``: only
+one worker's update can match, so no row lock or long transaction is needed.
+Higher ``priority`` runs first, then earlier ``run_at``. A failed job is
+re-queued with exponential backoff until ``max_attempts`` is reached, and a
+job left ``running`` past ``TASK_TIMEOUT_SECONDS`` (a crashed worker) is
+re-queued.
+
+Tasks are plain functions registered with ``@task``. They take JSON payload
+values as keyword arguments. A task registered with ``every`` re-enqueues
+itself that many seconds after each run. Jobs enqueued with a ``key``
+coalesce: while one is queued, enqueueing the same key again is a no-op.
+
+Jobs that can run for minutes (purges, suggestion refreshes, maintenance,
+upload assembly) are registered with a negative priority. Besides the
+general worker, which takes every job, supervisord runs a worker started
+with ``--min-priority 0``. It only claims the short jobs, so a long job never
+holds them back.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from api.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# Candidates fetched per claim attempt; others may win some of them.
+CLAIM_BATCH = 10
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts, every):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.every = every
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+    def enqueue(self, delay=0, key=None, priority=None, **payload):
+        return enqueue(self.name, payload, delay=delay, key=key, priority=priority)
+
+    def enqueue_on_commit(self, delay=0, key=None, priority=None, **payload):
+        transaction.on_commit(lambda: self.enqueue(delay=delay, key=key, priority=priority, **payload))
+
+
+def task(name=None, priority=0, max_attempts=None, every=None):
+    """
+    Register a function as a task named ``name`` (default: the function's)
+    """
+    def decorator(func):
+        registered = Task(
+            func,
+            name or func.__name__,
+            priority,
+            max_attempts or settings.TASK_MAX_ATTEMPTS,
+            every,
+        )
+        TASKS[registered.name] = registered
+        return registered
+    return decorator
+
+
+def autodiscover():
+    for module in settings.TASK_MODULES:
+        import_module(module)
+
+
+def enqueue(name, payload=None, delay=0, key=None, priority=None):
+    """
+    Queue a job and return it, or return ``None`` when a job with the same
+    ``key`` is already queued
+    """
+    registered = TASKS.get(name)
+    if priority is None:
+        priority = registered.priority if registered else 0
+    job = Job(
+        name=name,
+        payload=payload or {},
+        key=key,
+        priority=priority,
+        max_attempts=registered.max_attempts if registered else settings.TASK_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if key is None:
+            raise
+        return None
+    return job
+
+
+def enqueue_on_commit(name, payload=None, delay=0, key=None, priority=None):
+    """
+    Queue a job once the current transaction commits (immediately outside
+    one), so the job never sees uncommitted or rolled-back data
+    """
+    transaction.on_commit(lambda: enqueue(name, payload, delay=delay, key=key, priority=priority))
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker=None, min_priority=None):
+    """
+    Atomically take the next due job, only among jobs of at least
+    ``min_priority`` if given, or return ``None``
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now)
+    if min_priority is not None:
+        due = due.filter(priority__gte=min_priority)
+    candidates = list(
+        due.order_by('-priority', 'run_at', 'id')
+        .values_list('id', flat=True)[:CLAIM_BATCH]
+    )
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            started_at=now,
+            finished_at=None,
+            attempts=F('attempts') + 1,
+            worker=worker or worker_name(),
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def backoff(attempts):
+    """
+    Seconds to wait before retry number ``attempts``: exponential, capped,
+    with jitter so that jobs failing together do not retry together
+    """
+    delay = min(settings.TASK_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.TASK_RETRY_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _requeue(job, delay):
+    """
+    Put a claimed job back in the queue. If another job with the same key has
+    been queued meanwhile, that one supersedes it.
+    """
+    try:
+        with transaction.atomic():
+            Job.objects.filter(id=job.id).update(
+                status='queued', run_at=timezone.now() + timedelta(seconds=delay), last_error=job.last_error
+            )
+    except IntegrityError:
+        Job.objects.filter(id=job.id).update(
+            status='done', finished_at=timezone.now(), last_error='Superseded by a newer queued job'
+        )
+
+
+def run(job):
+    """
+    Execute a claimed job and record its outcome. Returns ``True`` on success.
+    """
+    registered = TASKS.get(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f"Unknown task: {job.name}")
+        registered(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.name, job.attempts)
+        if registered is not None and job.attempts < job.max_attempts:
+            _requeue(job, backoff(job.attempts))
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'finished_at', 'last_error'])
+            _schedule_next(registered)
+        return False
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    _schedule_next(registered)
+    return True
+
+
+def _schedule_next(registered):
+    if registered is not None and registered.every:
+        enqueue(registered.name, delay=registered.every, key=registered.name)
+
+
+def schedule_periodic():
+    """
+    Make sure every periodic task has a queued job
+    """
+    for registered in TASKS.values():
+        if registered.every:
+            enqueue(registered.name, key=registered.name)
+
+
+def requeue_stale(now=None):
+    """
+    Re-queue jobs whose worker stopped reporting back; returns how many
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.TASK_TIMEOUT_SECONDS)
+    stale = list(Job.objects.filter(status='running', started_at__lt=cutoff))
+    for job in stale:
+        job.last_error = f"Worker {job.worker} timed out"
+        if job.attempts < job.max_attempts:
+            _requeue(job, 0)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'finished_at', 'last_error'])
+    return len(stale)
+
+
+@task(name='purge_jobs', every=3600)
+def purge_jobs():
+    cutoff = timezone.now() - timedelta(hours=settings.TASK_RETENTION_HOURS)
+    Job.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff).delete()
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def stats(window_minutes=60):
+    """
+    Queue depth, age of the oldest due job and recent wait/run latencies
+    """
+    now = timezone.now()
+    depth = dict(Job.objects.values_list('status').annotate(count=Count('id')).order_by())
+    due = Job.objects.filter(status='queued', run_at__lte=now)
+    oldest = due.aggregate(oldest=Min('run_at'))['oldest']
+
+    recent = Job.objects.filter(
+        status__in=['done', 'failed'], finished_at__gte=now - timedelta(minutes=window_minutes)
+    ).values_list('name', 'status', 'run_at', 'started_at', 'finished_at')
+
+    waits, runs, by_name = [], [], {}
+    for name, status, run_at, started_at, finished_at in recent.iterator():
+        waits.append((started_at - run_at).total_seconds())
+        runs.append((finished_at - started_at).total_seconds())
+        counts = by_name.setdefault(name, {'done': 0, 'failed': 0})
+        counts[status] += 1
+
+    return {
+        'depth': {status: depth.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        'due': due.count(),
+        'oldest_due_seconds': (now - oldest).total_seconds() if oldest else 0,
+        'window_minutes': window_minutes,
+        'wait_seconds': {'p50': _percentile(waits, 50), 'p95': _percentile(waits, 95)},
+        'run_seconds': {'p50': _percentile(runs, 50), 'p95': _percentile(runs, 95)},
+        'finished': by_name,
+    }
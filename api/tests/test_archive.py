@@ -0,0 +1,98 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import archive
+from api.models import ArchivedMessageMonth, Member, Message
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+class ArchiveTests(TransactionTestCase):
+    # Archiving attaches the month files, which SQLite refuses inside the
+    # transaction a TestCase runs in.
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(MESSAGE_ARCHIVE_DIR=Path(directory.name))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+        self.old = timezone.now() - timedelta(days=400)
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def message(self, sender, receiver, content, days_ago=400, is_read=True):
+        return Message.objects.create(
+            sender=sender, receiver=receiver, content=content, is_read=is_read,
+            created_at=timezone.now() - timedelta(days=days_ago),
+        )
+
+    def test_moves_only_old_read_messages(self):
+        archived = self.message(self.ann, self.bob, 'old and read')
+        unread = self.message(self.bob, self.ann, 'old but unread', is_read=False)
+        recent = self.message(self.ann, self.bob, 'recent', days_ago=1)
+
+        self.assertEqual(archive.archive_messages(), 1)
+        self.assertEqual(set(Message.objects.values_list('id', flat=True)), {unread.id, recent.id})
+        self.assertEqual(archive.archived_count(self.ann, self.bob), 1)
+        self.assertEqual(ArchivedMessageMonth.objects.get().messages, 1)
+        self.assertEqual([m.id for m in archive.conversation_messages(self.bob, self.ann)], [archived.id])
+
+        # Nothing left to move, and nothing counted twice.
+        self.assertEqual(archive.archive_messages(), 0)
+        self.assertEqual(archive.archived_count(self.ann, self.bob), 1)
+
+    def test_conversation_pages_continue_into_the_archive(self):
+        ids = [self.message(self.ann, self.bob, f'old {i}').id for i in range(3)]
+        ids += [self.message(self.bob, self.ann, f'new {i}', days_ago=1).id for i in range(2)]
+        archive.archive_messages()
+
+        first = self.client.get(f'/api/messages/{self.bob.id}/', {'limit': 3})
+        self.assertEqual(first.data['count'], 5)
+        self.assertEqual([m['id'] for m in first.data['results']], ids[2:])
+        second = self.client.get(f'/api/messages/{self.bob.id}/', {'limit': 3, 'before': first.data['next_before']})
+        self.assertEqual([m['id'] for m in second.data['results']], ids[:2])
+        self.assertIsNone(second.data['next_before'])
+
+    def test_unread_old_messages_do_not_hide_archived_ones(self):
+        # The unread message stays hot but is older than the archived ones.
+        unread = self.message(self.bob, self.ann, 'old unread', days_ago=401, is_read=False).id
+        archived = [self.message(self.ann, self.bob, f'old {i}').id for i in range(3)]
+        recent = [self.message(self.bob, self.ann, f'new {i}', days_ago=1).id for i in range(2)]
+        archive.archive_messages()
+
+        seen, before = [], None
+        while True:
+            params = {'limit': 2, **({'before': before} if before else {})}
+            response = self.client.get(f'/api/messages/{self.bob.id}/', params)
+            seen = [m['id'] for m in response.data['results']] + seen
+            before = response.data['next_before']
+            if before is None:
+                break
+        self.assertEqual(seen, [unread] + archived + recent)
+
+    def test_conversation_list_includes_cold_conversations(self):
+        self.message(self.bob, self.ann, 'only old')
+        archive.archive_messages()
+
+        response = self.client.get('/api/messages/')
+        partners = [c['member']['username'] for c in response.data['results']]
+        self.assertEqual(partners, ['bob'])
+
+    def test_search_reaches_archived_messages(self):
+        cat = Member.objects.create(username='cat', email='cat@example.com')
+        mine = self.message(self.bob, self.ann, 'the lighthouse keeper')
+        self.message(self.bob, cat, 'another lighthouse')
+        archive.archive_messages()
+
+        response = self.client.get('/api/messages/search/', {'q': 'lighthouse'})
+        self.assertEqual([m['id'] for m in response.data['results']], [mine.id])
+        self.assertIn('<mark>lighthouse</mark>', response.data['results'][0]['snippet'])
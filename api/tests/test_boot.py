@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from api.management.commands.profile_boot import parse_importtime
+from api.schema import OpenApiParameter, OpenApiTypes, extend_schema
+
+
+# Boots Django like a worker and prints the modules it loaded but should not
+# have: drf-spectacular, and the ModelAdmin registrations autodiscovery imports.
+CHILD = r"""
+import os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(' '.join(sorted(name for name in ('drf_spectacular', 'api.admin') if name in sys.modules)))
+"""
+
+
+class BootTests(SimpleTestCase):
+    def test_schema_annotations_are_inert_outside_schema_generation(self):
+        self.assertFalse(settings.API_SCHEMA_GENERATION)
+
+        def view():
+            pass
+
+        self.assertIs(extend_schema(description='x', responses={200: OpenApiTypes.BINARY})(view), view)
+        self.assertEqual(OpenApiTypes.BINARY, 'BINARY')
+        OpenApiParameter(name='q', location=OpenApiParameter.QUERY)
+
+    def test_admin_urls_resolve_lazily(self):
+        self.assertEqual(reverse('admin:index'), '/admin/')
+
+    def test_worker_boot_skips_schema_and_admin(self):
+        env = {key: value for key, value in os.environ.items() if key != 'API_SCHEMA_GENERATION'}
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD], capture_output=True, text=True, env=env, check=True,
+            cwd=settings.BASE_DIR,
+        )
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_importtime_output_is_parsed(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      1500 |       2000 | django.urls\n"
+            "unrelated line\n"
+        )
+        self.assertEqual(parse_importtime(stderr), {'_io': (120, 120), 'django.urls': (1500, 2000)})
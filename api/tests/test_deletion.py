@@ -0,0 +1,97 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api import archive, deletion, inbox, search, uploads
+from api.models import (
+    ArchivedMessageMonth, Comment, DeletionJob, InboxCounter, Like, Member, Message, Post, Upload,
+)
+
+
+@override_settings(DELETION_BATCH_SIZE=2, DELETION_BATCH_PAUSE_SECONDS=0)
+class DeletionTests(TransactionTestCase):
+    # Purging a member's archived conversations attaches the month files,
+    # which SQLite refuses inside the transaction a TestCase runs in.
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = Path(directory.name)
+        override = override_settings(MEDIA_ROOT=root / 'media', MESSAGE_ARCHIVE_DIR=root / 'archive')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+
+    def message(self, sender, receiver, content, **kwargs):
+        message = Message.objects.create(sender=sender, receiver=receiver, content=content, **kwargs)
+        if not message.is_read:
+            inbox.message_received(receiver.id)
+        return message
+
+    def upload(self, owner):
+        upload = Upload.objects.create(
+            owner=owner, filename='a.png', content_type='image/png', size=1, chunk_size=1,
+            sha256='0' * 64, status='complete', path='2026/01/a.png',
+        )
+        path = uploads.file_path(upload)
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b'x')
+        return path
+
+    def test_post_tombstone_hides_it_and_purge_removes_dependents(self):
+        post = Post.objects.create(author=self.ann, content='hello')
+        share = Post.objects.create(author=self.bob, content='', repost_of=post)
+        Like.objects.create(member=self.bob, post=post)
+        Comment.objects.create(author=self.bob, post=post, content='nice')
+
+        job = deletion.tombstone(post, requested_by=self.ann)
+        self.assertFalse(Post.objects.filter(pk__in=[post.pk, share.pk]).exists())
+        self.assertTrue(Post.all_objects.filter(pk=post.pk).exists())
+
+        self.assertTrue(deletion.purge(job))
+        self.assertFalse(Post.all_objects.filter(pk__in=[post.pk, share.pk]).exists())
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.rows_deleted, 4)
+
+    def test_member_purge_reaches_everything(self):
+        post = Post.objects.create(author=self.ann, content='mine')
+        share = Post.objects.create(author=self.bob, content='', repost_of=post)
+        self.message(self.ann, self.bob, 'unread one')
+        self.message(self.ann, self.bob, 'unread two')
+        self.message(self.bob, self.bob, 'note to self')
+        self.message(
+            self.ann, self.bob, 'archived secret', is_read=True, created_at=timezone.now() - timedelta(days=400)
+        )
+        archive.archive_messages()
+        file = self.upload(self.ann)
+        self.assertEqual(len(search.search_messages(self.bob.id, 'secret')), 1)
+        self.assertEqual(inbox.unread(self.bob.id), 3)
+
+        job = deletion.tombstone(self.ann, requested_by=self.ann)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertTrue(Post.objects.filter(pk=share.pk).exists())
+
+        # A slice too short for a single step leaves the shares of the
+        # member's posts hidden, then the next run carries on.
+        self.assertFalse(deletion.purge(job, time_slice=0))
+        self.assertFalse(Post.objects.filter(pk=share.pk).exists())
+        self.assertTrue(deletion.purge(job))
+
+        self.assertFalse(Member.all_objects.filter(pk=self.ann.pk).exists())
+        self.assertFalse(Post.all_objects.exists())
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['note to self'])
+        self.assertEqual(InboxCounter.objects.get(pk=self.bob.pk).unread, 1)
+        self.assertEqual(inbox.reconcile(fix=False), [])
+        self.assertFalse(Upload.objects.exists())
+        self.assertFalse(file.exists())
+        self.assertFalse(ArchivedMessageMonth.objects.exists())
+        self.assertEqual(search.search_messages(self.bob.id, 'secret'), [])
+        self.assertEqual(DeletionJob.objects.get(pk=job.pk).status, 'done')
@@ -0,0 +1,90 @@
+import io
+import json
+import tempfile
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import archive
+from api.exporter import SECTIONS, ndjson_stream
+from api.models import Comment, Like, Member, Message, Post, Subscription
+
+
+def _lines(stream):
+    return [json.loads(line) for line in b''.join(stream).decode().splitlines()]
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+        post = Post.objects.create(author=self.ann, content='hello')
+        Post.objects.create(author=self.bob, content='not ann')
+        Comment.objects.create(post=post, author=self.ann, content='first')
+        Like.objects.create(post=post, member=self.ann)
+        Message.objects.create(sender=self.ann, receiver=self.bob, content='hi bob')
+        Message.objects.create(sender=self.bob, receiver=self.ann, content='hi ann')
+        Subscription.objects.create(follower=self.bob, following=self.ann)
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def test_ndjson_holds_only_the_members_rows(self):
+        rows = _lines(ndjson_stream(self.ann))
+        by_type = {}
+        for row in rows:
+            by_type.setdefault(row['type'], []).append(row)
+
+        self.assertEqual(by_type['profile'][0]['username'], 'ann')
+        self.assertEqual([row['content'] for row in by_type['posts']], ['hello'])
+        self.assertEqual(len(by_type['comments']), 1)
+        self.assertEqual(len(by_type['likes']), 1)
+        self.assertEqual({row['content'] for row in by_type['messages']}, {'hi bob', 'hi ann'})
+        self.assertEqual(by_type['subscriptions'], [
+            {'type': 'subscriptions', 'member_id': self.bob.id, 'direction': 'follower',
+             'created_at': by_type['subscriptions'][0]['created_at']},
+        ])
+        self.assertNotIn('password', by_type['profile'][0])
+
+    def test_zip_has_one_file_per_section(self):
+        response = self.client.get('/api/members/me/export/', {'archive': 'zip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response['Content-Disposition'])
+
+        bundle = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(bundle.namelist(), [f'{section}.ndjson' for section in SECTIONS])
+        posts = [json.loads(line) for line in bundle.read('posts.ndjson').decode().splitlines()]
+        self.assertEqual([row['content'] for row in posts], ['hello'])
+
+    def test_filename_is_encoded(self):
+        self.ann.username = 'zoë"; x'
+        self.ann.save()
+        response = self.client.get('/api/members/me/export/')
+        self.assertTrue(response['Content-Disposition'].startswith("attachment; filename*=utf-8''zo%C3%AB%22%3B%20x-"))
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson'))
+
+
+class ArchivedExportTests(TransactionTestCase):
+    # Archiving attaches the month files, which SQLite refuses inside the
+    # transaction a TestCase runs in.
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(MESSAGE_ARCHIVE_DIR=Path(directory.name))
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_archived_messages_are_exported(self):
+        ann = Member.objects.create(username='ann', email='ann@example.com')
+        bob = Member.objects.create(username='bob', email='bob@example.com')
+        old = timezone.now() - timedelta(days=400)
+        Message.objects.create(sender=bob, receiver=ann, content='long ago', is_read=True, created_at=old)
+        Message.objects.create(sender=ann, receiver=bob, content='recent')
+        self.assertEqual(archive.archive_messages(), 1)
+
+        messages = [row['content'] for row in _lines(ndjson_stream(ann)) if row['type'] == 'messages']
+        self.assertEqual(sorted(messages), ['long ago', 'recent'])
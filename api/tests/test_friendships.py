@@ -0,0 +1,51 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Friendship, FriendRequest, Member
+
+
+class FriendshipTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+        self.client = APIClient()
+
+    def as_member(self, member):
+        self.client.force_authenticate(member)
+        return self.client
+
+    def pairs(self):
+        return set(Friendship.objects.values_list('member_id', 'friend_id'))
+
+    def test_pair_key_is_the_same_both_ways(self):
+        self.assertEqual(FriendRequest.pair_key(7, 3), (3, 7))
+        self.assertEqual(FriendRequest.pair_key(3, 7), (3, 7))
+
+    def test_one_request_per_unordered_pair(self):
+        FriendRequest.objects.create(from_member=self.ann, to_member=self.bob)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FriendRequest.objects.create(from_member=self.bob, to_member=self.ann)
+
+        response = self.as_member(self.bob).post('/api/friends/request/', {'to_member': self.ann.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_accept_links_both_directions_and_removal_unlinks(self):
+        created = self.as_member(self.ann).post('/api/friends/request/', {'to_member': self.bob.id}, format='json')
+        self.assertEqual(created.status_code, 201)
+
+        accepted = self.as_member(self.bob).post(f"/api/friends/requests/{created.data['id']}/accept/")
+        self.assertEqual(accepted.status_code, 200)
+        self.assertEqual(self.pairs(), {(self.ann.id, self.bob.id), (self.bob.id, self.ann.id)})
+        self.assertEqual(list(Friendship.friend_ids(self.ann)), [self.bob.id])
+
+        removed = self.as_member(self.bob).delete(f'/api/friends/{self.ann.id}/')
+        self.assertEqual(removed.status_code, 204)
+        self.assertEqual(self.pairs(), set())
+        self.assertFalse(FriendRequest.objects.exists())
+
+    def test_only_the_recipient_can_accept(self):
+        friend_request = FriendRequest.objects.create(from_member=self.ann, to_member=self.bob)
+        response = self.as_member(self.ann).post(f'/api/friends/requests/{friend_request.id}/accept/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.pairs(), set())
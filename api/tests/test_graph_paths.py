@@ -0,0 +1,77 @@
+from array import array
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import deletion
+from api.graph import intersect_sorted, shortest_path
+from api.models import ChangeLogEntry, Friendship, Member
+
+
+class IntersectTests(TestCase):
+    def test_merge_and_binary_search_agree(self):
+        small = array('q', [3, 50, 700])
+        large = array('q', range(0, 1000, 10))
+        self.assertEqual(list(intersect_sorted(small, large)), [50, 700])
+        self.assertEqual(list(intersect_sorted(array('q', [1, 2, 3]), array('q', [2, 3, 4]))), [2, 3])
+        self.assertEqual(list(intersect_sorted(array('q'), large)), [])
+
+
+class ShortestPathTests(TestCase):
+    def setUp(self):
+        self.ids = [Member.objects.create(username=f'm{i}', email=f'm{i}@example.com').id for i in range(8)]
+        # A chain m0 - m1 - ... - m5; m6 and m7 are friends with each other only.
+        for a, b in zip(self.ids[:5], self.ids[1:6]):
+            Friendship.link(a, b)
+        Friendship.link(self.ids[6], self.ids[7])
+
+    def test_finds_the_chain(self):
+        path, exhausted = shortest_path(self.ids[0], self.ids[5])
+        self.assertEqual(path, self.ids[:6])
+        self.assertFalse(exhausted)
+
+    def test_no_path_between_components(self):
+        self.assertEqual(shortest_path(self.ids[0], self.ids[7]), (None, False))
+
+    def test_hop_limit(self):
+        self.assertEqual(shortest_path(self.ids[0], self.ids[5], max_hops=3), (None, True))
+
+    def test_visit_budget_stops_a_dense_neighbourhood(self):
+        hub = Member.objects.create(username='hub', email='hub@example.com')
+        for i in range(50):
+            spoke = Member.objects.create(username=f's{i}', email=f's{i}@example.com')
+            Friendship.link(hub.id, spoke.id)
+        Friendship.link(self.ids[7], hub.id)
+
+        # The hub's 51 friendships are not read past the budget.
+        with self.assertNumQueries(1):
+            path, exhausted = shortest_path(hub.id, self.ids[0], max_visits=10)
+        self.assertEqual((path, exhausted), (None, True))
+        # A path found from the sparse side stays within the same budget.
+        self.assertEqual(shortest_path(self.ids[6], hub.id, max_visits=10), ([self.ids[6], self.ids[7], hub.id], False))
+
+    def test_path_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(Member.objects.get(pk=self.ids[0]))
+        response = client.get(f'/api/members/{self.ids[3]}/path/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['found'], response.data['hops']), (True, 3))
+        self.assertEqual([m['id'] for m in response.data['path']], self.ids[:4])
+
+    def test_paths_do_not_cross_a_deleted_member(self):
+        # m6 also reaches m3 through m2, who deletes their account.
+        Friendship.link(self.ids[2], self.ids[6])
+        Friendship.link(self.ids[6], self.ids[3])
+        deletion.tombstone(Member.objects.get(pk=self.ids[2]))
+
+        client = APIClient()
+        client.force_authenticate(Member.objects.get(pk=self.ids[0]))
+        response = client.get(f'/api/members/{self.ids[3]}/path/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['found'])
+        self.assertEqual(shortest_path(self.ids[6], self.ids[4]), ([self.ids[6], self.ids[3], self.ids[4]], False))
+        self.assertFalse(Friendship.objects.filter(friend_id=self.ids[2]).exists())
+        self.assertEqual(
+            set(ChangeLogEntry.objects.filter(object_id=self.ids[2]).values_list('member_id', 'collection')),
+            {(self.ids[1], 'friends'), (self.ids[3], 'friends'), (self.ids[6], 'friends')},
+        )
@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password as plain_make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import hashing
+from api.models import Member
+
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class HashingPoolTests(SimpleTestCase):
+    def setUp(self):
+        # A thread pool stands in for the process pool, so the test can
+        # hold jobs open.
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+        patcher = mock.patch('api.hashing._get_executor', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def blocked(self):
+        self.release.wait(5)
+        return 'done'
+
+    @override_settings(PASSWORD_HASHING_PROCESSES=0)
+    def test_runs_inline_without_a_pool(self):
+        encoded = hashing.make_password('secret')
+        self.assertTrue(hashing.check_password('secret', encoded))
+        self.assertFalse(hashing.check_password('wrong', encoded))
+
+    @override_settings(PASSWORD_HASHING_PROCESSES=1, PASSWORD_HASHING_MAX_PENDING=1, PASSWORD_HASHING_TIMEOUT=5)
+    def test_sheds_beyond_the_admission_limit(self):
+        waiting = threading.Thread(target=hashing._run, args=(self.blocked,))
+        waiting.start()
+        while hashing.pending() < 1:
+            time.sleep(0.001)
+        with self.assertRaises(hashing.HashingOverloaded):
+            hashing._run(self.blocked)
+        self.release.set()
+        waiting.join()
+        self.assertEqual(hashing.pending(), 0)
+
+    @override_settings(PASSWORD_HASHING_PROCESSES=1, PASSWORD_HASHING_MAX_PENDING=2, PASSWORD_HASHING_TIMEOUT=0.05)
+    def test_timed_out_job_holds_its_slot_until_it_finishes(self):
+        with self.assertRaises(hashing.HashingOverloaded):
+            hashing._run(self.blocked)
+        self.assertEqual(hashing.pending(), 1)
+        self.release.set()
+        self.pool.shutdown(wait=True)
+        self.assertEqual(hashing.pending(), 0)
+
+
+class ExecutorTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('api.hashing.ProcessPoolExecutor')
+        self.pools = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pools.side_effect = lambda **kwargs: mock.Mock(max_workers=kwargs['max_workers'])
+        self.addCleanup(hashing.shutdown)
+        hashing.shutdown()
+
+    def test_pool_follows_the_configured_size(self):
+        with override_settings(PASSWORD_HASHING_PROCESSES=1):
+            first = hashing._get_executor()
+            self.assertIs(hashing._get_executor(), first)
+        with override_settings(PASSWORD_HASHING_PROCESSES=4):
+            second = hashing._get_executor()
+        self.assertEqual((first.max_workers, second.max_workers), (1, 4))
+        first.shutdown.assert_called_once_with(wait=False)
+
+    @override_settings(PASSWORD_HASHING_PROCESSES=2)
+    def test_shutdown_starts_over(self):
+        first = hashing._get_executor()
+        hashing.shutdown()
+        first.shutdown.assert_called_once_with(wait=True)
+        self.assertIsNot(hashing._get_executor(), first)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoginOverloadTests(TestCase):
+    @override_settings(PASSWORD_HASHING_PROCESSES=1, PASSWORD_HASHING_MAX_PENDING=0)
+    def test_login_is_shed_with_503(self):
+        Member.objects.create(username='ann', email='ann@example.com', password=plain_make_password('secret'))
+        response = APIClient().post('/api/auth/login/', {'username': 'ann', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(PASSWORD_HASHING_PROCESSES=0)
+    def test_login_checks_the_password(self):
+        Member.objects.create(username='ann', email='ann@example.com', password=plain_make_password('secret'))
+        client = APIClient()
+        self.assertEqual(client.post('/api/auth/login/', {'username': 'ann', 'password': 'nope'}).status_code, 401)
+        self.assertEqual(client.post('/api/auth/login/', {'username': 'ann', 'password': 'secret'}).status_code, 200)
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from api import idempotency
+from api.models import IdempotencyKey, Member, Post
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+        self.calls = 0
+
+    def post(self, content, key='k1'):
+        return self.client.post('/api/posts/', {'content': content}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def request(self, key='k1', data=None):
+        return SimpleNamespace(
+            headers={'Idempotency-Key': key}, method='POST', path='/api/things/', data=data or {}, user=self.ann,
+        )
+
+    def view(self, status_code):
+        @idempotency.idempotent
+        def view(_, request):
+            self.calls += 1
+            return Response({'n': self.calls}, status=status_code)
+        return view
+
+    def test_retries_replay_the_stored_response(self):
+        first = self.post('hello')
+        retry = self.post('hello')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Post.objects.count(), 1)
+
+        self.assertEqual(self.post('hello', key='k2').status_code, 201)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_reusing_a_key_for_another_body_is_rejected(self):
+        self.post('hello')
+        self.assertEqual(self.post('goodbye').status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_requests_without_a_key_are_not_recorded(self):
+        self.client.post('/api/posts/', {'content': 'hello'}, format='json')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.1)
+    def test_a_duplicate_of_a_running_request_gets_409(self):
+        request = self.request()
+        idempotency._claim(self.ann, 'k1', idempotency.fingerprint(request, {}))
+
+        response = self.view(200)(None, request)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.calls, 0)
+
+    def test_server_errors_are_not_stored(self):
+        view = self.view(503)
+        self.assertEqual(view(None, self.request()).status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        view(None, self.request())
+        self.assertEqual(self.calls, 2)
+
+    def test_long_keys_are_rejected(self):
+        response = self.view(200)(None, self.request(key='k' * 256))
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(IDEMPOTENCY_MAX_KEYS_PER_MEMBER=2)
+    def test_old_completed_keys_are_evicted(self):
+        view = self.view(200)
+        for key in ('a', 'b', 'c', 'd'):
+            view(None, self.request(key=key))
+
+        # Each claim evicts down to the cap, not counting its own key.
+        self.assertEqual(sorted(IdempotencyKey.objects.values_list('key', flat=True)), ['b', 'c', 'd'])
+        # An evicted key runs again.
+        self.assertEqual(view(None, self.request(key='a')).data, {'n': 5})
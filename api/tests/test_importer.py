@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.hashers import is_password_usable
+from django.test import TestCase
+
+from api import tags
+from api.importer import Importer
+from api.models import Friendship, FriendRequest, Member
+
+
+class ImporterTests(TestCase):
+    def write(self, records):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(handle, 'w') as fh:
+            for record in records:
+                fh.write(json.dumps(record) + '\n')
+        self.addCleanup(os.unlink, path)
+        return path
+
+    def members(self, *usernames):
+        return [{'username': name, 'email': f'{name}@example.com', 'password_hash': '!'} for name in usernames]
+
+    def test_reimport_skips_existing_members(self):
+        path = self.write(self.members('ann', 'bob', 'ann'))
+        checkpoint = Importer('members', path, processes=1).run()
+        self.assertEqual((checkpoint.records_done, checkpoint.records_skipped), (3, 1))
+
+        checkpoint = Importer('members', path, name='again', processes=1).run()
+        self.assertEqual((checkpoint.records_done, checkpoint.records_skipped), (3, 3))
+        self.assertEqual(Member.objects.count(), 2)
+
+    def test_resume_continues_after_checkpoint(self):
+        path = self.write(self.members('ann', 'bob', 'cat'))
+        importer = Importer('members', path, batch_size=1, processes=1)
+        Member.objects.create(username='zed', email='zed@example.com')
+        checkpoint = importer.checkpoint()
+        checkpoint.records_done = 2
+        checkpoint.save()
+
+        checkpoint = importer.run()
+        self.assertEqual(checkpoint.records_done, 3)
+        self.assertEqual(set(Member.objects.values_list('username', flat=True)), {'zed', 'cat'})
+
+    def test_member_without_password_gets_unusable_one(self):
+        path = self.write([{'username': 'ann', 'email': 'ann@example.com'}])
+        Importer('members', path, processes=1).run()
+        self.assertFalse(is_password_usable(Member.objects.get(username='ann').password))
+
+    def test_friendships_are_linked_both_ways_once(self):
+        Member.objects.bulk_create([Member(username=name, email=f'{name}@example.com') for name in ('ann', 'bob')])
+        path = self.write([{'from': 'ann', 'to': 'bob'}, {'from': 'bob', 'to': 'ann'}])
+        checkpoint = Importer('friendships', path).run()
+        Importer('friendships', path, name='again').run()
+
+        self.assertEqual(checkpoint.records_skipped, 1)
+        self.assertEqual(FriendRequest.objects.count(), 1)
+        ann, bob = Member.objects.get(username='ann'), Member.objects.get(username='bob')
+        self.assertEqual(
+            set(Friendship.objects.values_list('member_id', 'friend_id')), {(ann.id, bob.id), (bob.id, ann.id)}
+        )
+
+    def test_imported_posts_are_indexed(self):
+        Member.objects.bulk_create([Member(username=name, email=f'{name}@example.com') for name in ('ann', 'bob')])
+        path = self.write([
+            {'author': 'ann', 'content': 'Hello #Django', 'created_at': '2024-01-01T00:00:00Z'},
+            {'author': 'bob', 'content': '#django with @ann.', 'created_at': '2024-01-02T00:00:00Z'},
+            {'author': 'nobody', 'content': '#django'},
+        ])
+        Importer('posts', path, batch_size=2).run()
+
+        timeline = [term.post.content for term in tags.tag_timeline('django').order_by('-created_at')]
+        self.assertEqual(timeline, ['#django with @ann.', 'Hello #Django'])
+        ann = Member.objects.get(username='ann')
+        self.assertEqual([term.post.author.username for term in tags.mentions(ann.id)], ['bob'])
+        self.assertEqual([(tag.tag, tag.posts) for tag in tags.top_tags()], [('django', 2)])
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import inbox
+from api.models import InboxCounter, Member, Message
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+class InboxCounterTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+        self.ann_client = APIClient()
+        self.ann_client.force_authenticate(self.ann)
+        self.bob_client = APIClient()
+        self.bob_client.force_authenticate(self.bob)
+
+    def send(self, content='hi'):
+        return self.ann_client.post(f'/api/messages/{self.bob.id}/', {'content': content}, format='json').data
+
+    def unread(self):
+        return self.bob_client.get('/api/messages/unread-count/').data['unread_count']
+
+    def test_counter_starts_from_an_exact_count(self):
+        Message.objects.create(sender=self.ann, receiver=self.bob, content='before', is_read=False)
+        Message.objects.create(sender=self.ann, receiver=self.bob, content='read', is_read=True)
+        self.assertFalse(InboxCounter.objects.exists())
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(InboxCounter.objects.get(pk=self.bob.pk).unread, 1)
+
+    def test_sending_and_reading_keep_the_counter(self):
+        first = self.send()
+        self.send()
+        self.assertEqual(self.unread(), 2)
+
+        self.bob_client.patch(f"/api/messages/{first['id']}/read/")
+        self.bob_client.patch(f"/api/messages/{first['id']}/read/")
+        self.assertEqual(self.unread(), 1)
+        # The sender cannot mark the receiver's message read.
+        self.assertEqual(self.ann_client.patch(f"/api/messages/{first['id']}/read/").status_code, 404)
+
+    def test_mark_read_reports_whether_it_changed(self):
+        message = Message.objects.get(pk=self.send()['id'])
+        self.assertTrue(inbox.mark_read(message))
+        self.assertFalse(inbox.mark_read(message))
+        self.assertEqual(inbox.unread(self.bob.id), 0)
+
+    def test_removed_messages_are_discounted(self):
+        ids = [self.send()['id'] for _ in range(3)]
+        Message.objects.filter(pk=ids[0]).update(is_read=True)
+        inbox.messages_removed(ids)
+        self.assertEqual(inbox.unread(self.bob.id), 1)
+
+    def test_reconcile_fixes_drift(self):
+        self.send()
+        self.send()
+        InboxCounter.objects.filter(pk=self.bob.pk).update(unread=7)
+
+        self.assertEqual(inbox.reconcile(fix=False), [(self.bob.id, 7, 2)])
+        self.assertEqual(inbox.unread(self.bob.id), 7)
+        self.assertEqual(inbox.reconcile(), [(self.bob.id, 7, 2)])
+        self.assertEqual(inbox.unread(self.bob.id), 2)
+        self.assertEqual(inbox.reconcile(), [])
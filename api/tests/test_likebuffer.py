@@ -0,0 +1,72 @@
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import likebuffer
+from api.models import Like, Member, Notification, Post
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+class LikeBufferTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(LIKE_WRITE_BEHIND=True, LIKE_BUFFER_PATH=Path(directory.name) / 'likes.sqlite3')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(self.close_buffer)
+
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+        self.post = Post.objects.create(author=self.ann, content='hello')
+
+    def close_buffer(self):
+        db = getattr(likebuffer._local, 'db', None)
+        if db is not None:
+            db.close()
+            del likebuffer._local.db
+
+    def test_likes_are_buffered_until_flushed(self):
+        self.assertEqual(likebuffer.toggle(self.bob.id, self.post.id, True), (True, 1))
+        self.assertEqual(likebuffer.toggle(self.bob.id, self.post.id, True), (False, 1))
+        self.assertTrue(likebuffer.is_liked(self.bob.id, self.post.id))
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(likebuffer.pending()['events'], 1)
+
+        self.assertEqual(likebuffer.flush(), (1, 1, 0))
+        self.assertTrue(Like.objects.filter(member=self.bob, post=self.post).exists())
+        self.assertEqual(Notification.objects.get().last_actor, self.bob)
+        self.assertEqual(likebuffer.pending()['events'], 0)
+        self.assertEqual(likebuffer.likes_count(self.post.id), 1)
+
+    def test_only_the_last_event_per_pair_is_applied(self):
+        Like.objects.create(member=self.ann, post=self.post)
+        likebuffer.toggle(self.bob.id, self.post.id, True)
+        likebuffer.toggle(self.bob.id, self.post.id, False)
+        likebuffer.toggle(self.ann.id, self.post.id, False)
+        self.assertEqual(likebuffer.likes_count(self.post.id), 0)
+
+        self.assertEqual(likebuffer.flush(batch_size=2), (3, 0, 1))
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_events_for_deleted_posts_are_dropped(self):
+        likebuffer.toggle(self.bob.id, self.post.id, True)
+        Post.all_objects.filter(pk=self.post.pk).delete()
+
+        self.assertEqual(likebuffer.flush(), (1, 0, 0))
+        self.assertFalse(Like.objects.exists())
+
+    def test_like_endpoints_use_the_buffer(self):
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        url = f'/api/posts/{self.post.id}'
+
+        self.assertEqual(client.post(f'{url}/like/').data, {'likes_count': 1})
+        self.assertEqual(client.post(f'{url}/like/').status_code, 400)
+        self.assertEqual(client.post(f'{url}/unlike/').data, {'likes_count': 0})
+        self.assertEqual(client.post(f'{url}/unlike/').status_code, 400)
+        self.assertFalse(Like.objects.exists())
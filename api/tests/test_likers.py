@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Friendship, Like, Member, Post
+
+
+class LikersTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.post = Post.objects.create(author=self.ann, content='x')
+        now = timezone.now()
+        self.likers = []
+        for i in range(25):
+            member = Member.objects.create(username=f'liker{i:02d}', email=f'liker{i}@example.com')
+            Like.objects.create(post=self.post, member=member, created_at=now - timedelta(minutes=i))
+            self.likers.append(member)
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def test_pages_newest_first_without_gaps(self):
+        url = f'/api/posts/{self.post.id}/likes/'
+        first = self.client.get(url, {'page_size': 10})
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('email', first.data['results'][0])
+
+        seen = [m['username'] for m in first.data['results']]
+        next_url = first.data['next']
+        while next_url:
+            page = self.client.get(next_url)
+            seen += [m['username'] for m in page.data['results']]
+            next_url = page.data['next']
+        self.assertEqual(seen, [m.username for m in self.likers])
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        url = f'/api/posts/{self.post.id}/likes/'
+        # The post, then one page of likes joined to their members.
+        for page_size in (2, 25):
+            with self.assertNumQueries(2):
+                self.client.get(url, {'page_size': page_size})
+
+    def test_friends_listed_separately_on_the_first_page(self):
+        Friendship.link(self.ann.id, self.likers[7].id)
+        response = self.client.get(f'/api/posts/{self.post.id}/likes/', {'friends_first': 'true', 'page_size': 100})
+
+        self.assertEqual([m['username'] for m in response.data['friends']], ['liker07'])
+        self.assertNotIn('liker07', [m['username'] for m in response.data['results']])
+        self.assertEqual(len(response.data['results']), 24)
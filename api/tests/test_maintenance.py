@@ -0,0 +1,60 @@
+import time
+
+from django.db import connection
+from django.test import TestCase
+
+from api import maintenance
+from api.models import MaintenanceRun, Member
+
+
+class MaintenanceTests(TestCase):
+    def setUp(self):
+        # Statistics gathered by earlier tests would make tables look fresh.
+        with connection.cursor() as cursor:
+            if maintenance._stat_rows(cursor):
+                cursor.execute('DELETE FROM sqlite_stat1')
+
+    def members(self, count, prefix='m'):
+        Member.objects.bulk_create(
+            Member(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com') for i in range(count)
+        )
+
+    def test_estimated_rows_follow_the_rowid_range(self):
+        self.members(5)
+        with connection.cursor() as cursor:
+            self.assertEqual(maintenance.estimated_rows(cursor, Member._meta.db_table), 5)
+            self.assertEqual(maintenance.estimated_rows(cursor, MaintenanceRun._meta.db_table), 0)
+
+    def test_tables_are_stale_until_analyzed(self):
+        table = Member._meta.db_table
+        self.members(maintenance.MIN_DRIFT_ROWS)
+        with connection.cursor() as cursor:
+            self.assertIn(table, list(maintenance.stale_tables(cursor)))
+            cursor.execute(f'ANALYZE {table}')
+            self.assertNotIn(table, list(maintenance.stale_tables(cursor)))
+
+            self.members(maintenance.MIN_DRIFT_ROWS, prefix='n')
+            self.assertIn(table, list(maintenance.stale_tables(cursor)))
+
+    def test_a_spent_deadline_stops_the_scan(self):
+        self.members(maintenance.MIN_DRIFT_ROWS)
+        with connection.cursor() as cursor:
+            self.assertEqual(list(maintenance.stale_tables(cursor, deadline=time.monotonic())), [])
+
+    def test_run_analyzes_and_records(self):
+        self.members(maintenance.MIN_DRIFT_ROWS)
+        record = maintenance.run(budget=60)
+
+        self.assertEqual(MaintenanceRun.objects.get(), record)
+        # Either PRAGMA optimize or the drift check analyzed the table.
+        with connection.cursor() as cursor:
+            self.assertEqual(maintenance._stat_rows(cursor).get(Member._meta.db_table), maintenance.MIN_DRIFT_ROWS)
+            self.assertNotIn(Member._meta.db_table, list(maintenance.stale_tables(cursor)))
+
+    def test_run_without_budget_is_incomplete(self):
+        self.members(maintenance.MIN_DRIFT_ROWS)
+        record = maintenance.run(budget=0)
+
+        self.assertFalse(record.completed)
+        self.assertEqual(record.tables_analyzed, 0)
+        self.assertIn('budget spent', record.detail)
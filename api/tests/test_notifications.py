@@ -0,0 +1,72 @@
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import notifications
+from api.models import Member, Notification, NotificationActor, Post
+
+
+@override_settings(NOTIFICATION_WINDOW_SECONDS=3600)
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.ann, self.bob, self.cat = (
+            Member.objects.create(username=name, email=f'{name}@example.com') for name in ('ann', 'bob', 'cat')
+        )
+        self.post = Post.objects.create(author=self.ann, content='hello')
+
+    def test_events_in_a_window_share_one_row_counting_distinct_actors(self):
+        for actor in (self.bob, self.cat, self.bob, self.bob, self.cat):
+            notifications.record(self.post, 'like', actor)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.last_actor, self.cat)
+        self.assertEqual(NotificationActor.objects.count(), 2)
+        self.assertEqual(notifications.summary(notification), 'cat and 1 other liked your post')
+
+    def test_verbs_and_windows_are_kept_apart(self):
+        now = timezone.now()
+        notifications.record(self.post, 'like', self.bob)
+        notifications.record(self.post, 'comment', self.bob)
+        with mock.patch('api.notifications.timezone.now', return_value=now + timedelta(hours=2)):
+            notifications.record(self.post, 'like', self.bob)
+
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(set(Notification.objects.values_list('actor_count', flat=True)), {1})
+
+    def test_own_actions_are_not_notified(self):
+        notifications.record(self.post, 'like', self.ann)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_summary_without_actor(self):
+        notification = Notification(verb='repost', actor_count=3)
+        self.assertEqual(notifications.summary(notification), 'Someone and 2 others reposted your post')
+
+    def test_new_events_mark_read_notifications_unread(self):
+        notifications.record(self.post, 'like', self.bob)
+        self.assertEqual(notifications.mark_read(self.ann), 1)
+        self.assertEqual(notifications.mark_read(self.ann), 0)
+
+        notifications.record(self.post, 'like', self.cat)
+        self.assertFalse(Notification.objects.get().is_read)
+
+    def test_list_and_mark_read(self):
+        notifications.record(self.post, 'like', self.bob)
+        notifications.record(self.post, 'repost', self.cat)
+        client = APIClient()
+        client.force_authenticate(self.ann)
+
+        response = client.get('/api/notifications/')
+        self.assertEqual(response.data['unread_count'], 2)
+        self.assertEqual(
+            [n['summary'] for n in response.data['results']],
+            ['cat reposted your post', 'bob liked your post'],
+        )
+
+        first = response.data['results'][1]['updated_at']
+        client.post('/api/notifications/read/?' + urlencode({'up_to': first}))
+        self.assertEqual(client.get('/api/notifications/', {'unread': 'true'}).data['unread_count'], 1)
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import Comment, Like, Member, Post, Repost
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+class RepostTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+        self.cat = Member.objects.create(username='cat', email='cat@example.com')
+        self.post = Post.objects.create(author=self.ann, content='original', image_url='https://example.com/a.png')
+        self.client = APIClient()
+
+    def repost(self, member, post):
+        self.client.force_authenticate(member)
+        return self.client.post(f'/api/posts/{post.id}/repost/', {'content': 'look'}, format='json')
+
+    def test_repost_references_the_original(self):
+        response = self.repost(self.bob, self.post)
+        self.assertEqual(response.status_code, 201)
+
+        repost = Post.objects.get(pk=response.data['id'])
+        self.assertEqual(repost.repost_of_id, self.post.id)
+        self.assertIsNone(repost.image_url)
+        self.assertEqual(response.data['repost_of']['id'], self.post.id)
+        self.assertEqual(response.data['reposts_count'], 1)
+
+    def test_reposting_a_repost_reposts_the_original(self):
+        repost_id = self.repost(self.bob, self.post).data['id']
+        response = self.repost(self.cat, Post.objects.get(pk=repost_id))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.get(pk=response.data['id']).repost_of_id, self.post.id)
+        self.assertEqual(Repost.objects.filter(post=self.post).count(), 2)
+
+    def test_second_repost_is_refused(self):
+        self.repost(self.bob, self.post)
+        self.assertEqual(self.repost(self.bob, self.post).status_code, 400)
+
+    def test_engagement_on_a_repost_goes_to_the_original(self):
+        repost = Post.objects.get(pk=self.repost(self.bob, self.post).data['id'])
+        self.client.force_authenticate(self.cat)
+        self.client.post(f'/api/posts/{repost.id}/like/')
+
+        self.assertTrue(Like.objects.filter(post=self.post, member=self.cat).exists())
+        self.assertFalse(Like.objects.filter(post=repost).exists())
+        response = self.client.get(f'/api/posts/{repost.id}/')
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertTrue(response.data['is_liked_by_user'])
+
+
+class ConvertDuplicatedRepostsTests(TestCase):
+    def test_chains_of_copies_resolve_to_the_root(self):
+        migration = import_module('api.migrations.0004_convert_duplicated_reposts')
+        ann, bob, cat = (
+            Member.objects.create(username=name, email=f'{name}@example.com') for name in ('ann', 'bob', 'cat')
+        )
+        media = {'image_url': 'https://example.com/a.png', 'video_url': None}
+        original = Post.objects.create(author=ann, content='original', **media)
+        start = original.created_at
+
+        # bob reposts the original, cat reposts bob's copy: the old endpoint
+        # left two copies, the second one of the first.
+        Repost.objects.create(member=bob, post=original, created_at=start + timedelta(minutes=1))
+        first = Post.objects.create(author=bob, content='', created_at=start + timedelta(minutes=1, seconds=1), **media)
+        Repost.objects.create(member=cat, post=first, created_at=start + timedelta(minutes=2))
+        second = Post.objects.create(author=cat, content='', created_at=start + timedelta(minutes=2, seconds=1), **media)
+        Like.objects.create(member=cat, post=first)
+        Comment.objects.create(author=ann, post=second, content='thanks')
+
+        migration.convert_reposts(apps, None)
+
+        self.assertEqual(
+            dict(Post.objects.filter(pk__in=[first.pk, second.pk]).values_list('pk', 'repost_of_id')),
+            {first.pk: original.pk, second.pk: original.pk},
+        )
+        self.assertEqual(Repost.objects.filter(post=original).count(), 2)
+        self.assertEqual(Like.objects.get().post_id, original.pk)
+        self.assertEqual(Comment.objects.get().post_id, original.pk)
+        self.assertIsNone(Post.objects.get(pk=second.pk).image_url)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import search
+from api.models import Member, Message, Post
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+class SearchTests(TestCase):
+    def setUp(self):
+        self.ann, self.bob, self.cat = (
+            Member.objects.create(username=name, email=f'{name}@example.com') for name in ('ann', 'bob', 'cat')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def post(self, content, **kwargs):
+        return Post.objects.create(author=self.ann, content=content, **kwargs)
+
+    def ids(self, hits):
+        return [row_id for row_id, _ in hits]
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        post = self.post('Sourdough starter')
+        self.assertEqual(self.ids(search.search_posts('sourdough')), [post.id])
+
+        post.content = 'Rye bread'
+        post.save()
+        self.assertEqual(search.search_posts('sourdough'), [])
+        self.assertEqual(self.ids(search.search_posts('rye')), [post.id])
+
+        Post.all_objects.filter(pk=post.pk).delete()
+        self.assertEqual(search.search_posts('rye'), [])
+
+    def test_queries_are_words_not_match_syntax(self):
+        post = self.post('Crème brûlée, NEAR the café')
+        self.assertEqual(self.ids(search.search_posts('CREME cafe')), [post.id])
+        self.assertEqual(self.ids(search.search_posts('near(creme) "café*')), [post.id])
+        self.assertEqual(search.search_posts('crème tiramisu'), [])
+        self.assertEqual(search.search_posts('*:'), [])
+
+    def test_tombstoned_posts_are_not_found(self):
+        self.post('hidden words', deleted_at=timezone.now())
+        self.assertEqual(search.search_posts('hidden'), [])
+
+    def test_relevance_is_discounted_by_age(self):
+        old = self.post('cats cats cats', created_at=timezone.now() - timedelta(days=300))
+        new = self.post('cats and dogs')
+        self.assertEqual(self.ids(search.search_posts('cats')), [new.id, old.id])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        text = '<b>bold</b> & cats'
+        self.assertEqual(
+            search.snippet(text, {'cats'}), '&lt;b&gt;bold&lt;/b&gt; &amp; <mark>cats</mark>'
+        )
+        long = ' '.join(['filler'] * 20 + ['cats'] + ['filler'] * 20)
+        self.assertTrue(search.snippet(long, {'cats'}).startswith('…'))
+        self.assertIn('<mark>cats</mark>', search.snippet(long, {'cats'}))
+
+    def test_messages_are_searched_per_participant(self):
+        to_bob = Message.objects.create(sender=self.ann, receiver=self.bob, content='dinner tonight?')
+        to_cat = Message.objects.create(sender=self.cat, receiver=self.ann, content='dinner tomorrow')
+        Message.objects.create(sender=self.bob, receiver=self.cat, content='dinner without ann')
+
+        self.assertEqual(
+            set(self.ids(search.search_messages(self.ann.id, 'dinner', archived=False))), {to_bob.id, to_cat.id}
+        )
+        self.assertEqual(
+            self.ids(search.search_messages(self.ann.id, 'dinner', other_id=self.bob.id, archived=False)), [to_bob.id]
+        )
+
+    def test_search_endpoints(self):
+        post = self.post('Weekend hike <3')
+        Message.objects.create(sender=self.bob, receiver=self.ann, content='hike on sunday')
+
+        response = self.client.get('/api/posts/search/', {'q': 'hike'})
+        self.assertEqual([p['id'] for p in response.data['results']], [post.id])
+        self.assertEqual(response.data['results'][0]['snippet'], 'Weekend <mark>hike</mark> &lt;3')
+
+        response = self.client.get('/api/messages/search/', {'q': 'sunday', 'with': self.bob.id})
+        self.assertEqual(response.data['results'][0]['snippet'], 'hike on <mark>sunday</mark>')
+        self.assertEqual(self.client.get('/api/posts/search/', {'q': ' '}).status_code, 400)
@@ -0,0 +1,92 @@
+import io
+import sqlite3
+import tempfile
+from contextlib import closing, redirect_stdout
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from api import snapshots
+
+
+class SnapshotTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        self.database = self.dir / 'db.sqlite3'
+        self.template = self.dir / 'template.sqlite3'
+        self.snapshots = self.dir / 'snapshots'
+
+    def create(self, path, migrations=(), value=None):
+        with closing(sqlite3.connect(path)) as db:
+            db.execute("CREATE TABLE django_migrations (app TEXT, name TEXT)")
+            db.executemany("INSERT INTO django_migrations VALUES (?, ?)", [('api', name) for name in migrations])
+            db.execute("CREATE TABLE marker (value TEXT)")
+            if value is not None:
+                db.execute("INSERT INTO marker VALUES (?)", [value])
+            db.commit()
+
+    def marker(self, path):
+        with closing(sqlite3.connect(path)) as db:
+            return db.execute("SELECT value FROM marker").fetchone()[0]
+
+    def test_backup_is_a_complete_copy(self):
+        self.create(self.database, value='live')
+        target = snapshots.backup(self.database, self.dir / 'copy' / 'db.sqlite3', pages=1)
+        self.assertEqual(self.marker(target), 'live')
+        self.assertEqual(list(target.parent.glob('*.tmp')), [])
+
+    def test_snapshots_are_pruned_to_keep(self):
+        self.create(self.database, value='live')
+        for _ in range(3):
+            newest = snapshots.snapshot(self.database, self.snapshots, keep=2)
+        self.assertEqual(len(snapshots.list_snapshots(self.snapshots)), 2)
+        self.assertEqual(snapshots.latest_snapshot(self.snapshots), newest)
+
+    def test_preserve_keeps_then_restores_then_falls_back_to_template(self):
+        self.create(self.template, value='template')
+        self.create(self.database, value='live')
+        self.assertEqual(snapshots.provision(self.database, self.template, self.snapshots), 'Kept the existing database')
+        self.assertEqual(self.marker(self.database), 'live')
+
+        snapshots.snapshot(self.database, self.snapshots)
+        self.database.unlink()
+        self.assertIn('Restored', snapshots.provision(self.database, self.template, self.snapshots))
+        self.assertEqual(self.marker(self.database), 'live')
+
+        self.database.unlink()
+        for path in snapshots.list_snapshots(self.snapshots):
+            path.unlink()
+        self.assertIn('template', snapshots.provision(self.database, self.template, self.snapshots))
+        self.assertEqual(self.marker(self.database), 'template')
+
+    def test_fresh_snapshots_the_old_database_first(self):
+        self.create(self.template, value='template')
+        self.create(self.database, value='live')
+        snapshots.provision(self.database, self.template, self.snapshots, mode='fresh')
+
+        self.assertEqual(self.marker(self.database), 'template')
+        self.assertEqual(self.marker(snapshots.latest_snapshot(self.snapshots)), 'live')
+
+    def test_restore_without_a_snapshot_fails(self):
+        with self.assertRaises(FileNotFoundError):
+            snapshots.provision(self.database, self.template, self.snapshots, mode='restore')
+        with self.assertRaises(ValueError):
+            snapshots.provision(self.database, self.template, self.snapshots, mode='reset')
+
+    def test_migrate_is_needed_when_the_template_is_ahead(self):
+        self.create(self.template, migrations=['0001', '0002'])
+        self.create(self.database, migrations=['0001'])
+        self.assertTrue(snapshots.needs_migrate(self.database, self.template))
+        with redirect_stdout(io.StringIO()):
+            status = snapshots.main([
+                'provision', '--database', str(self.database), '--template', str(self.template),
+                '--snapshots', str(self.snapshots),
+            ])
+        self.assertEqual(status, 3)
+
+        self.database.unlink()
+        self.create(self.database, migrations=['0001', '0002', '0003'])
+        self.assertFalse(snapshots.needs_migrate(self.database, self.template))
+        self.assertTrue(snapshots.needs_migrate(self.database, self.dir / 'missing.sqlite3'))
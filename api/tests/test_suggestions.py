@@ -0,0 +1,58 @@
+from django.test import TestCase
+
+from api.graph import SuggestionEngine, mark_follow_changed, mark_neighbourhood_changed, refresh_suggestions
+from api.models import FriendRequest, FriendSuggestion, Friendship, Member, Subscription, SuggestionRefresh
+
+
+class SuggestionTests(TestCase):
+    def setUp(self):
+        names = ('ann', 'bob', 'cat', 'dan', 'eve', 'fay', 'gus')
+        self.m = {name: Member.objects.create(username=name, email=f'{name}@example.com') for name in names}
+        for a, b in [('ann', 'bob'), ('ann', 'eve'), ('bob', 'cat'), ('eve', 'cat'), ('bob', 'dan'), ('bob', 'fay')]:
+            Friendship.link(self.m[a].id, self.m[b].id)
+        # A pending request keeps fay out of ann's suggestions.
+        FriendRequest.objects.create(from_member=self.m['fay'], to_member=self.m['ann'])
+
+    def suggested(self, name):
+        rows = FriendSuggestion.objects.filter(member=self.m[name]).order_by('-score', 'suggested_id')
+        return [(row.suggested.username, row.mutual_count) for row in rows]
+
+    def test_friends_of_friends_ranked_by_mutual_count(self):
+        refresh_suggestions(full=True)
+        self.assertEqual(self.suggested('ann'), [('cat', 2), ('dan', 1)])
+
+    def test_follows_add_to_the_score(self):
+        Subscription.objects.create(follower=self.m['ann'], following=self.m['gus'])
+        Subscription.objects.create(follower=self.m['gus'], following=self.m['dan'])
+        refresh_suggestions(full=True)
+        rows = {row.suggested.username: row.score for row in FriendSuggestion.objects.filter(member=self.m['ann'])}
+        self.assertEqual(rows['dan'], 1.5)
+
+    def test_neighbourhood_engine_matches_whole_network(self):
+        Subscription.objects.create(follower=self.m['dan'], following=self.m['gus'])
+        everyone = SuggestionEngine.whole_network()
+        for member in self.m.values():
+            local = SuggestionEngine.neighbourhood([member.id])
+            expected = [(s, c, everyone.ids[w]) for s, c, w in everyone.suggest(everyone.friends.position(member.id))]
+            actual = [(s, c, local.ids[w]) for s, c, w in local.suggest(local.friends.position(member.id))]
+            self.assertEqual(actual, expected, member.username)
+
+    def test_changes_queue_the_affected_members(self):
+        mark_neighbourhood_changed(self.m['ann'].id, self.m['dan'].id)
+        queued = set(SuggestionRefresh.objects.values_list('member__username', flat=True))
+        self.assertEqual(queued, {'ann', 'dan', 'bob', 'eve'})
+
+        SuggestionRefresh.objects.all().delete()
+        Subscription.objects.create(follower=self.m['cat'], following=self.m['ann'])
+        mark_follow_changed(self.m['ann'].id, self.m['gus'].id)
+        queued = set(SuggestionRefresh.objects.values_list('member__username', flat=True))
+        self.assertEqual(queued, {'ann', 'gus', 'cat'})
+
+    def test_refresh_only_recomputes_queued_members(self):
+        mark_neighbourhood_changed(self.m['cat'].id)
+        refreshed, _ = refresh_suggestions()
+
+        self.assertEqual(refreshed, 3)
+        self.assertFalse(SuggestionRefresh.objects.exists())
+        self.assertEqual(self.suggested('ann'), [])
+        self.assertEqual(self.suggested('cat'), [('ann', 2), ('dan', 1), ('fay', 1)])
@@ -0,0 +1,124 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import changelog, tasks
+from api.models import Friendship, Member, Subscription
+
+
+def entries(*changes):
+    return [SimpleNamespace(collection='posts', object_id=object_id, op=op) for object_id, op in changes]
+
+
+class CollapseTests(SimpleTestCase):
+    def test_repeated_changes_collapse_to_the_net_change(self):
+        self.assertEqual(changelog._collapse(entries((1, 'insert'), (1, 'update'), (1, 'update'))), [
+            ('posts', 1, 'insert'),
+        ])
+        self.assertEqual(changelog._collapse(entries((1, 'insert'), (1, 'delete'))), [])
+        self.assertEqual(changelog._collapse(entries((1, 'delete'), (1, 'insert'))), [('posts', 1, 'update')])
+        self.assertEqual(changelog._collapse(entries((1, 'update'), (1, 'delete'))), [('posts', 1, 'delete')])
+
+    def test_objects_are_ordered_by_their_last_change(self):
+        changes = changelog._collapse(entries((1, 'update'), (2, 'update'), (1, 'update')))
+        self.assertEqual([object_id for _, object_id, _ in changes], [2, 1])
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+class SyncTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob', email='bob@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def sync(self, token):
+        return self.client.get('/api/sync/', {'since': token}).data
+
+    def start(self):
+        response = self.client.get('/api/sync/').data
+        self.assertTrue(response['reset'])
+        return response['token']
+
+    def test_posts_are_synced_with_their_current_state(self):
+        token = self.start()
+        kept = self.client.post('/api/posts/', {'content': 'draft'}, format='json').data['id']
+        self.client.patch(f'/api/posts/{kept}/', {'content': 'final'}, format='json')
+        gone = self.client.post('/api/posts/', {'content': 'oops'}, format='json').data['id']
+        self.client.delete(f'/api/posts/{gone}/')
+
+        response = self.sync(token)
+        self.assertFalse(response['reset'])
+        self.assertEqual(len(response['changes']), 1)
+        change = response['changes'][0]
+        self.assertEqual((change['collection'], change['op'], change['id']), ('posts', 'insert', kept))
+        self.assertEqual(change['data']['content'], 'final')
+
+        self.assertEqual(self.sync(response['token'])['changes'], [])
+
+    def test_friends_and_conversations_reach_both_members(self):
+        bob = APIClient()
+        bob.force_authenticate(self.bob)
+        ann_token, bob_token = self.start(), bob.get('/api/sync/').data['token']
+
+        request = self.client.post('/api/friends/request/', {'to_member': self.bob.id}, format='json').data
+        bob.post(f"/api/friends/requests/{request['id']}/accept/")
+        self.client.post(f'/api/messages/{self.bob.id}/', {'content': 'hi'}, format='json')
+
+        changes = {(c['collection'], c['id']): c for c in bob.get('/api/sync/', {'since': bob_token}).data['changes']}
+        self.assertEqual(changes[('friends', self.ann.id)]['data']['username'], 'ann')
+        self.assertEqual(changes[('conversations', self.ann.id)]['data']['unread_count'], 1)
+
+        Friendship.objects.all().delete()
+        changelog.friendship(self.ann.id, self.bob.id, 'update')
+        changes = self.sync(ann_token)['changes']
+        # No longer a friend by the time of the sync.
+        self.assertIn({'collection': 'friends', 'op': 'delete', 'id': self.bob.id}, changes)
+
+    def test_profile_updates_reach_friends_and_subscribers(self):
+        cat = Member.objects.create(username='cat', email='cat@example.com')
+        dan = Member.objects.create(username='dan', email='dan@example.com')
+        Friendship.objects.bulk_create([
+            Friendship(member=self.ann, friend=self.bob), Friendship(member=self.bob, friend=self.ann),
+        ])
+        Subscription.objects.create(follower=cat, following=self.ann)
+        Subscription.objects.create(follower=self.ann, following=dan)
+        tokens = {member: changelog.current_token(member) for member in (self.bob, cat, dan)}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/members/{self.ann.id}/', {'bio': 'hello'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        while job := tasks.claim():
+            tasks.run(job)
+
+        for member, collection in ((self.bob, 'friends'), (cat, 'following'), (dan, 'followers')):
+            client = APIClient()
+            client.force_authenticate(member)
+            changes = client.get('/api/sync/', {'since': tokens[member]}).data['changes']
+            self.assertEqual([(c['collection'], c['op'], c['id']) for c in changes], [(collection, 'update', self.ann.id)])
+            self.assertEqual(changes[0]['data']['bio'], 'hello')
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_changes_are_paged(self):
+        token = self.start()
+        for object_id in range(1, 6):
+            changelog.record(self.ann.id, 'following', object_id, 'delete')
+
+        seen = []
+        while True:
+            response = self.sync(token)
+            seen += [c['id'] for c in response['changes']]
+            token = response['token']
+            if not response['has_more']:
+                break
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+
+    def test_expired_and_invalid_tokens(self):
+        old = changelog.make_token(0, timezone.now() - timedelta(days=settings.SYNC_RETENTION_DAYS + 1))
+        self.assertTrue(self.sync(old)['reset'])
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'since': '1.99999999999999999'}).status_code, 400)
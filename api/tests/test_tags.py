@@ -0,0 +1,59 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import tags
+from api.models import Member, Post, PostTerm, TagCount
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.bob = Member.objects.create(username='bob.smith', email='bob@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def post(self, content):
+        return self.client.post('/api/posts/', {'content': content}, format='json').data['id']
+
+    def counts(self):
+        return dict(TagCount.objects.values_list('tag', 'posts'))
+
+    def test_terms_are_extracted_and_resolved(self):
+        self.assertEqual(tags.hashtags('#Cats and #cats, #dogs#x a#b'), ['cats', 'dogs'])
+        self.assertEqual(
+            tags.terms('Hi @bob.smith. and @nobody #Fun'), {'#fun', f'@{self.bob.id}'}
+        )
+
+    def test_counts_follow_inserts_edits_and_deletes(self):
+        first = self.post('#cats #dogs')
+        self.post('more #cats')
+        self.assertEqual(self.counts(), {'cats': 2, 'dogs': 1})
+
+        self.client.patch(f'/api/posts/{first}/', {'content': 'only #dogs now #birds'}, format='json')
+        self.assertEqual(self.counts(), {'cats': 1, 'dogs': 1, 'birds': 1})
+
+        Post.all_objects.filter(pk=first).delete()
+        self.assertEqual(self.counts(), {'cats': 1})
+        self.assertEqual(set(PostTerm.objects.values_list('term', flat=True)), {'#cats'})
+
+    def test_top_tags_skip_unused_ones(self):
+        for content in ('#b', '#b #a', '#c', '#c'):
+            self.post(content)
+        Post.all_objects.filter(content='#b').delete()
+
+        response = self.client.get('/api/posts/tags/', {'limit': 5})
+        self.assertEqual(response.data, [{'tag': 'c', 'posts': 2}, {'tag': 'a', 'posts': 1}, {'tag': 'b', 'posts': 1}])
+        self.assertEqual(self.client.get('/api/posts/tags/', {'limit': 'x'}).status_code, 400)
+
+    def test_timelines_are_newest_first_and_live_only(self):
+        older = self.post('#Python tips for @bob.smith')
+        newer = self.post('#python again')
+        hidden = Post.objects.create(author=self.ann, content='#python gone')
+        tags.index_post(hidden)
+        Post.all_objects.filter(pk=hidden.pk).update(deleted_at=hidden.created_at)
+
+        response = self.client.get('/api/posts/tags/PYTHON/')
+        self.assertEqual([p['id'] for p in response.data['results']], [newer, older])
+
+        response = self.client.get(f'/api/members/{self.bob.id}/mentions/')
+        self.assertEqual([p['id'] for p in response.data['results']], [older])
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api import tasks
+from api.models import Job
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def register(self, name, func=None, **options):
+        registered = tasks.task(name=name, **options)(func or (lambda **payload: self.calls.append((name, payload))))
+        self.addCleanup(tasks.TASKS.pop, name)
+        return registered
+
+    def test_queued_keys_coalesce(self):
+        job = tasks.enqueue('refresh', {'member': 1}, key='refresh:1')
+        self.assertIsNotNone(job)
+        self.assertIsNone(tasks.enqueue('refresh', {'member': 1}, key='refresh:1'))
+        self.assertEqual(Job.objects.count(), 1)
+
+        # Once the first one runs, the key is free again.
+        Job.objects.filter(pk=job.pk).update(status='running')
+        self.assertIsNotNone(tasks.enqueue('refresh', {'member': 1}, key='refresh:1'))
+
+    def test_higher_priority_runs_first_and_min_priority_filters(self):
+        self.register('long', priority=-1)
+        self.register('short')
+        long = tasks.enqueue('long')
+        short = tasks.enqueue('short')
+        urgent = tasks.enqueue('short', priority=5)
+        tasks.enqueue('short', delay=60)
+
+        self.assertEqual(tasks.claim(worker='w', min_priority=0), urgent)
+        self.assertEqual(tasks.claim(worker='w', min_priority=0), short)
+        self.assertIsNone(tasks.claim(worker='w', min_priority=0))
+        claimed = tasks.claim(worker='w')
+        self.assertEqual(claimed, long)
+        self.assertEqual((claimed.status, claimed.attempts, claimed.worker), ('running', 1, 'w'))
+        self.assertIsNone(tasks.claim(worker='w'))
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        def broken():
+            raise RuntimeError('boom')
+
+        self.register('broken', broken, max_attempts=2)
+        job = tasks.enqueue('broken')
+
+        with self.assertLogs('api.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(tasks.claim()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('api.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(tasks.claim()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    @override_settings(TASK_RETRY_BACKOFF_SECONDS=5, TASK_RETRY_BACKOFF_MAX_SECONDS=60)
+    def test_backoff_grows_and_is_capped(self):
+        with mock.patch('api.tasks.random.uniform', return_value=1):
+            self.assertEqual([tasks.backoff(n) for n in (1, 2, 3, 10)], [5, 10, 20, 60])
+
+    def test_periodic_tasks_are_scheduled_once_and_reschedule(self):
+        self.register('tick', every=30)
+        tasks.schedule_periodic()
+        tasks.schedule_periodic()
+        self.assertEqual(Job.objects.filter(name='tick').count(), 1)
+        Job.objects.exclude(name='tick').delete()
+
+        self.assertTrue(tasks.run(tasks.claim()))
+        self.assertEqual(self.calls, [('tick', {})])
+        following = Job.objects.get(name='tick', status='queued')
+        self.assertGreater(following.run_at, timezone.now() + timedelta(seconds=20))
+
+    @override_settings(TASK_TIMEOUT_SECONDS=60)
+    def test_stale_running_jobs_are_requeued(self):
+        self.register('slow', max_attempts=2)
+        job = tasks.enqueue('slow')
+        tasks.claim(worker='gone')
+        later = timezone.now() + timedelta(seconds=61)
+
+        self.assertEqual(tasks.requeue_stale(now=timezone.now()), 0)
+        self.assertEqual(tasks.requeue_stale(now=later), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('gone', job.last_error)
+
+        tasks.claim(worker='gone again')
+        tasks.requeue_stale(now=later + timedelta(seconds=61))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import Member
+from api.throttling import SharedBucketTable, parse_rate
+
+
+def _table(test, slots=64):
+    handle, path = tempfile.mkstemp()
+    os.close(handle)
+    test.addCleanup(os.unlink, path)
+    return SharedBucketTable(path, slots)
+
+
+class BucketTableTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('30/min'), (30, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+
+    def test_bucket_empties_then_refills(self):
+        table = _table(self)
+        for _ in range(3):
+            self.assertEqual(table.consume(['k'], 3, 60, now=1000.0), 0)
+        self.assertAlmostEqual(table.consume(['k'], 3, 60, now=1000.0), 20.0)
+        # One token comes back every 20 seconds.
+        self.assertEqual(table.consume(['k'], 3, 60, now=1020.0), 0)
+        self.assertGreater(table.consume(['k'], 3, 60, now=1020.0), 0)
+
+    def test_tokens_are_taken_from_all_keys_or_none(self):
+        table = _table(self)
+        table.consume(['ip'], 1, 60, now=1000.0)
+        self.assertGreater(table.consume(['ip', 'member'], 1, 60, now=1000.0), 0)
+        # The refused request did not spend the member's token.
+        self.assertEqual(table.consume(['member'], 1, 60, now=1000.0), 0)
+
+    def test_handles_share_buckets_through_the_file(self):
+        first = _table(self)
+        second = SharedBucketTable(first.path, first.slots)
+        first.consume(['k'], 1, 60, now=1000.0)
+        self.assertGreater(second.consume(['k'], 1, 60, now=1000.0), 0)
+
+    def test_threads_never_overspend(self):
+        table = _table(self)
+        allowed = []
+
+        def worker():
+            for _ in range(50):
+                if not table.consume(['k'], 100, 3600, now=1000.0):
+                    allowed.append(1)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(allowed), 100)
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'member_search': '2/min'},
+})
+class ThrottledViewTests(TestCase):
+    def test_scoped_action_gets_429_with_retry_after(self):
+        table = _table(self)
+        client = APIClient()
+        client.force_authenticate(Member.objects.create(username='ann', email='ann@example.com'))
+
+        with mock.patch('api.throttling.get_table', return_value=table):
+            statuses = [client.get('/api/members/search/', {'q': 'a'}).status_code for _ in range(3)]
+            response = client.get('/api/members/search/', {'q': 'a'})
+            # Unscoped actions are not throttled.
+            listing = client.get('/api/members/')
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertIn('Retry-After', response)
+        self.assertEqual(listing.status_code, 200)
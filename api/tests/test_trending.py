@@ -0,0 +1,55 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api import trending
+from api.models import Member, Post, TrendingPost
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+
+    def post(self, **kwargs):
+        return Post.objects.create(author=self.ann, content='x', **kwargs)
+
+    def test_heavier_engagement_ranks_first(self):
+        liked, reposted, quiet = self.post(), self.post(), self.post()
+        trending.record(liked, 'like')
+        trending.record(liked, 'like')
+        trending.record(reposted, 'repost')
+
+        self.assertEqual(trending.top_posts(10), [reposted, liked])
+        self.assertNotIn(quiet, trending.top_posts(10))
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS=12)
+    def test_recent_events_outweigh_older_ones(self):
+        old, new = self.post(), self.post()
+        now = timezone.now()
+        with mock.patch('api.trending.timezone.now', return_value=now - timedelta(hours=12)):
+            for _ in range(3):
+                trending.record(old, 'like')
+        with mock.patch('api.trending.timezone.now', return_value=now):
+            trending.record(new, 'comment')
+
+        # Three likes one half-life ago are worth 1.5, a comment now 2.
+        self.assertEqual(trending.top_posts(2), [new, old])
+
+    def test_posts_outside_the_window_are_ignored_and_compacted(self):
+        stale = self.post(created_at=timezone.now() - timedelta(days=30))
+        trending.record(stale, 'like')
+        self.assertFalse(TrendingPost.objects.exists())
+
+        fresh = self.post()
+        trending.record(fresh, 'like')
+        later = timezone.now() + timedelta(days=30)
+        self.assertEqual(trending.compact(now=later), 1)
+        self.assertFalse(TrendingPost.objects.exists())
+
+    def test_deleted_posts_drop_out(self):
+        post = self.post()
+        trending.record(post, 'like')
+        Post.objects.filter(pk=post.pk).update(deleted_at=timezone.now())
+        self.assertEqual(trending.top_posts(10), [])
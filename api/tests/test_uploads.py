@@ -0,0 +1,137 @@
+import hashlib
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import tasks, uploads
+from api.models import Job, Member, Upload
+
+
+class UploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name, UPLOAD_CHUNK_SIZE=4, UPLOAD_ACCEL_REDIRECT=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.ann = Member.objects.create(username='ann', email='ann@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def start(self, body, content_type='image/png', sha256=None):
+        return self.client.post('/api/uploads/', {
+            'filename': 'picture.png',
+            'content_type': content_type,
+            'size': len(body),
+            'sha256': sha256 or hashlib.sha256(body).hexdigest(),
+        }, format='json')
+
+    def send(self, upload_id, body):
+        for index in range(0, len(body), 4):
+            response = self.client.put(
+                f'/api/uploads/{upload_id}/chunks/{index // 4}/', body[index:index + 4],
+                content_type='application/octet-stream'
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+
+    def complete(self, upload_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/api/uploads/{upload_id}/complete/')
+
+    def work(self):
+        while job := tasks.claim():
+            tasks.run(job)
+
+    def test_only_media_types_are_accepted(self):
+        self.assertEqual(self.start(b'<script>', content_type='text/html').status_code, 400)
+        self.assertEqual(self.start(b'<svg/>', content_type='image/svg+xml').status_code, 400)
+
+        response = self.start(b'x', content_type='Image/PNG; charset=binary')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['content_type'], 'image/png')
+
+    def test_completion_is_assembled_by_a_task(self):
+        body = b'0123456789'
+        upload_id = self.start(body).data['id']
+        self.send(upload_id, body)
+
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'assembling')
+        self.assertTrue(Job.objects.filter(name='assemble_upload', key=f'assemble_upload:{upload_id}').exists())
+
+        # No chunk may change while the file is put together.
+        response = self.client.put(
+            f'/api/uploads/{upload_id}/chunks/0/', b'abcd', content_type='application/octet-stream'
+        )
+        self.assertEqual(response.status_code, 409)
+
+        self.work()
+        upload = Upload.objects.get(pk=upload_id)
+        self.assertEqual(upload.status, 'complete')
+        self.assertTrue(upload.path.endswith('.png'))
+        self.assertEqual(uploads.file_path(upload).read_bytes(), body)
+        self.assertFalse(uploads.parts_dir(upload).exists())
+        self.assertEqual(self.complete(upload_id).status_code, 200)
+
+    def test_checksum_mismatch_returns_the_upload_to_pending(self):
+        body = b'01234567'
+        upload_id = self.start(body, sha256='0' * 64).data['id']
+        self.send(upload_id, body)
+        self.complete(upload_id)
+        self.work()
+
+        upload = Upload.objects.get(pk=upload_id)
+        self.assertEqual(upload.status, 'pending')
+        self.assertIn('checksum', upload.error)
+        self.assertFalse(list(Path(uploads.parts_dir(upload)).glob('*.tmp')))
+        # The chunks are kept, so the client can fix what is wrong and retry.
+        self.assertEqual(uploads.received_chunks(upload), [0, 1])
+
+    def test_missing_chunks_are_reported(self):
+        body = b'0123456789'
+        upload_id = self.start(body).data['id']
+        self.send(upload_id, body[:4])
+
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('[1, 2]', response.data['detail'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_chunk_checksum_and_length_are_checked(self):
+        upload_id = self.start(b'01234567').data['id']
+        url = f'/api/uploads/{upload_id}/chunks/0/'
+        self.assertEqual(
+            self.client.put(url, b'012', content_type='application/octet-stream').status_code, 400
+        )
+        response = self.client.put(
+            url, b'0123', content_type='application/octet-stream', HTTP_X_CHUNK_SHA256='0' * 64
+        )
+        self.assertEqual(response.status_code, 400)
+        upload = Upload.objects.get(pk=upload_id)
+        self.assertEqual(uploads.received_chunks(upload), [])
+        self.assertEqual(list(uploads.parts_dir(upload).iterdir()), [])
+
+    def test_files_are_served_with_safe_headers(self):
+        body = b'0123'
+        upload_id = self.start(body).data['id']
+        self.send(upload_id, body)
+        self.complete(upload_id)
+        self.work()
+
+        response = APIClient().get(f'/api/uploads/{upload_id}/file/')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertEqual(b''.join(response.streaming_content), body)
+        response.close()
+
+        # A type accepted before the allowlist existed is only downloadable.
+        Upload.objects.filter(pk=upload_id).update(content_type='text/html')
+        response = APIClient().get(f'/api/uploads/{upload_id}/file/')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        response.close()
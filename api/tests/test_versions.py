@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import tasks, versions
+from api.models import Friendship, Member, MemberVersions, Subscription
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+class VersionTests(TestCase):
+    def setUp(self):
+        self.ann, self.bob, self.cat, self.dan = (
+            Member.objects.create(username=name, email=f'{name}@example.com')
+            for name in ('ann', 'bob', 'cat', 'dan')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def versions(self, member):
+        return versions.current(member)
+
+    def test_rows_are_created_on_first_read_and_bumps_before_are_lost(self):
+        versions.bump(self.ann.id, 'inbox')
+        self.assertFalse(MemberVersions.objects.exists())
+        self.assertEqual(self.client.get('/api/me/versions/').data, dict.fromkeys(versions.FIELDS, 0))
+
+        versions.bump(self.ann.id, 'inbox', 'feed')
+        self.assertEqual(self.client.get('/api/me/versions/').data, {
+            'feed': 1, 'inbox': 1, 'friend_requests': 0, 'notifications': 0,
+        })
+
+    def test_messages_bump_both_inboxes_and_reading_bumps_the_receiver(self):
+        for member in (self.ann, self.bob):
+            self.versions(member)
+        message = self.client.post(f'/api/messages/{self.bob.id}/', {'content': 'hi'}, format='json').data
+        self.assertEqual(self.versions(self.ann)['inbox'], 1)
+        self.assertEqual(self.versions(self.bob)['inbox'], 1)
+
+        bob = APIClient()
+        bob.force_authenticate(self.bob)
+        bob.patch(f"/api/messages/{message['id']}/read/")
+        bob.patch(f"/api/messages/{message['id']}/read/")
+        self.assertEqual(self.versions(self.bob)['inbox'], 2)
+        self.assertEqual(self.versions(self.ann)['inbox'], 1)
+
+    def test_friend_requests_bump_both_members(self):
+        for member in (self.ann, self.bob):
+            self.versions(member)
+        self.client.post('/api/friends/request/', {'to_member': self.bob.id}, format='json')
+        self.assertEqual(self.versions(self.ann)['friend_requests'], 1)
+        self.assertEqual(self.versions(self.bob)['friend_requests'], 1)
+
+    def test_posts_bump_the_feeds_of_the_audience_once_per_burst(self):
+        Friendship.objects.create(member=self.ann, friend=self.bob)
+        Friendship.objects.create(member=self.bob, friend=self.ann)
+        Subscription.objects.create(follower=self.cat, following=self.ann)
+        for member in (self.ann, self.bob, self.cat, self.dan):
+            self.versions(member)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/posts/', {'content': 'one'}, format='json')
+            self.client.post('/api/posts/', {'content': 'two'}, format='json')
+        job = tasks.claim()
+        self.assertEqual(job.name, 'bump_audience')
+        self.assertIsNone(tasks.claim())
+        tasks.run(job)
+
+        feeds = dict(MemberVersions.objects.values_list('member__username', 'feed'))
+        self.assertEqual(feeds, {'ann': 1, 'bob': 1, 'cat': 1, 'dan': 0})
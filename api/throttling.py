@@ -0,0 +1,161 @@
+"""
+Token-bucket throttling shared by every gunicorn worker.
+
+Buckets live in a fixed-size, memory-mapped hash table backed by a file
+(``THROTTLE_TABLE_PATH``, on tmpfs by default), so limits hold across all
+preforked workers without an external store. Each slot is
+``(key hash, tokens, updated_at)``; collisions are resolved by a short linear
+probe, and when the probe window is full the least recently touched slot is
+recycled, which at worst resets an idle client's bucket to full.
+
+``flock`` only excludes other processes: its lock belongs to the open file
+description, which every thread of a worker shares. Threads of one worker
+(gunicorn runs gthread workers) are serialised by a module-level lock
+taken around it.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+SLOT = struct.Struct('<Qdd')
+
+PROBE_LENGTH = 8
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Held by a thread while it opens the table or updates buckets.
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """
+    Parse a DRF-style rate such as ``'30/min'`` into ``(capacity, seconds)``
+    """
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def _key_hash(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+class SharedBucketTable:
+    """
+    Fixed-size table of token buckets in a shared memory-mapped file
+    """
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * SLOT.size
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+
+    def _find_slot(self, key_hash):
+        start = key_hash % self.slots
+        free = stalest = None
+        stalest_at = float('inf')
+        for step in range(PROBE_LENGTH):
+            index = (start + step) % self.slots
+            stored_hash, tokens, updated_at = SLOT.unpack_from(self.map, index * SLOT.size)
+            if stored_hash == key_hash:
+                return index, tokens, updated_at
+            if stored_hash == 0 and free is None:
+                free = index
+            if updated_at < stalest_at:
+                stalest, stalest_at = index, updated_at
+        return (free if free is not None else stalest), None, None
+
+    def consume(self, keys, capacity, period, now=None):
+        """
+        Take one token from every bucket in ``keys`` or from none of them.
+        Returns the seconds to wait before a retry could pass, 0 if allowed.
+        """
+        now = now or time.time()
+        rate = capacity / period
+        with _lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                return self._consume(keys, capacity, rate, now)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _consume(self, keys, capacity, rate, now):
+        buckets = []
+        wait = 0.0
+        for key in keys:
+            key_hash = _key_hash(key)
+            index, tokens, updated_at = self._find_slot(key_hash)
+            if tokens is None:
+                tokens = float(capacity)
+            else:
+                tokens = min(float(capacity), tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+            buckets.append((index, key_hash, tokens))
+
+        for index, key_hash, tokens in buckets:
+            if not wait:
+                tokens -= 1
+            SLOT.pack_into(self.map, index * SLOT.size, key_hash, tokens, now)
+        return wait
+
+
+_table = None
+_table_pid = None
+
+
+def get_table():
+    """
+    Return this process's handle on the shared table. The file is reopened
+    after a fork because flock() locks belong to the open file description,
+    which a forked child would otherwise share with its parent.
+    """
+    global _table, _table_pid
+    with _lock:
+        if _table is None or _table_pid != os.getpid():
+            _table = SharedBucketTable(settings.THROTTLE_TABLE_PATH, settings.THROTTLE_TABLE_SLOTS)
+            _table_pid = os.getpid()
+        return _table
+
+
+class SharedTokenBucketThrottle(BaseThrottle):
+    """
+    Per-member and per-IP token buckets for scoped view actions.
+
+    Views opt in with ``throttle_scopes = {'<action>': '<scope>'}``; each scope
+    needs a rate in ``DEFAULT_THROTTLE_RATES``. Actions without a scope are not
+    throttled.
+    """
+
+    def __init__(self):
+        self.wait_seconds = 0
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scopes', {}).get(getattr(view, 'action', None))
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        keys = [f'{scope}:ip:{self.get_ident(request)}']
+        if getattr(request.user, 'is_authenticated', False) and getattr(request.user, 'id', None):
+            keys.append(f'{scope}:member:{request.user.id}')
+
+        self.wait_seconds = get_table().consume(keys, capacity, period)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,91 @@
+"""
+Incrementally maintained, time-decayed ranking of recent posts.
+
+Every like, comment or repost adds ``weight * 2 ** ((t - EPOCH) / half_life)``
+to the post's score. Because all events are measured against the same fixed
+epoch, ordering by the accumulated score is the same as ordering by the
+decayed score at any later moment, so stored scores never need rewriting as
+time passes. Scores are kept in log2 space to stay within float range.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from api import tasks
+from api.models import Post, TrendingPost
+
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+WEIGHTS = {
+    'like': 1.0,
+    'comment': 2.0,
+    'repost': 3.0,
+}
+
+
+def window_start(now=None):
+    return (now or timezone.now()) - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+
+
+def _log2_add(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+
+def event_score(kind, at):
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return math.log2(WEIGHTS[kind]) + (at - EPOCH).total_seconds() / half_life
+
+
+def record(post, kind):
+    """
+    Add one engagement event to the post's trending score
+    """
+    now = timezone.now()
+    if post.created_at < window_start(now):
+        return
+
+    gain = event_score(kind, now)
+    # A lost update under concurrent writers only drops a single event from
+    # an approximate ranking, so a plain read-modify-write is good enough.
+    with transaction.atomic():
+        entry = TrendingPost.objects.filter(pk=post.pk).first()
+        if entry is None:
+            try:
+                with transaction.atomic():
+                    TrendingPost.objects.create(post=post, score=gain, post_created_at=post.created_at)
+                return
+            except IntegrityError:
+                entry = TrendingPost.objects.get(pk=post.pk)
+        entry.score = _log2_add(entry.score, gain)
+        entry.save(update_fields=['score', 'updated_at'])
+
+
+def top_posts(limit):
+    """
+    Return up to ``limit`` trending posts, highest score first
+    """
+    post_ids = list(
+        TrendingPost.objects.filter(post_created_at__gte=window_start())
+        .order_by('-score')
+        .values_list('post_id', flat=True)[:limit]
+    )
+    posts = Post.objects.select_related('author', 'repost_of', 'repost_of__author').in_bulk(post_ids)
+    return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def compact(now=None):
+    """
+    Drop scores of posts that have aged out of the window
+    """
+    deleted, _ = TrendingPost.objects.filter(post_created_at__lt=window_start(now)).delete()
+    return deleted
+
+
+@tasks.task(name='compact_trending', every=3600)
+def compact_trending():
+    compact()
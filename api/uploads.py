@@ -0,0 +1,237 @@
+"""
+Chunked, resumable media uploads stored under ``MEDIA_ROOT``.
+
+A client creates an upload declaring the file's size and SHA-256, then PUTs
+the chunks in any order and as often as needed. Each chunk is streamed from
+the request straight into its own part file, hashed on the way, and only
+renamed into place once complete, so a dropped connection leaves nothing
+half-written and the set of part files on disk is the resume state. Every
+write goes to its own ``mkstemp`` file first, so two threads or processes
+writing the same chunk never share a temporary file.
+
+Completing an upload only marks it ``assembling`` and queues the
+``assemble_upload`` task: concatenating up to ``UPLOAD_MAX_BYTES`` is disk
+work a request thread should not wait on. The task copies the parts into
+the final file in fixed-size blocks while the whole-file digest is
+computed, so memory use never depends on the file size, then marks the
+upload ``complete``. If a chunk is missing or the digest does not match, the
+upload goes back to ``pending`` with the reason in ``error``, and the client
+can re-send chunks and complete again.
+
+Finished files are served by nginx through ``X-Accel-Redirect``, from the
+API's own origin and without authentication, so only the image and video
+types in ``MEDIA_TYPES`` are accepted and ever served inline. A file stored
+under any other type (from before the allowlist) is sent as an
+``application/octet-stream`` attachment, and every response carries
+``X-Content-Type-Options: nosniff``.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api import tasks
+from api.models import Upload
+
+
+# Bytes read from the request or copied between files at a time.
+BLOCK_SIZE = 1024 * 1024
+
+# Content types an upload may declare, with the extension its file is
+# stored under; nginx's internal location maps the same extensions back.
+MEDIA_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'video/mp4': '.mp4',
+    'video/webm': '.webm',
+    'video/ogg': '.ogv',
+    'video/quicktime': '.mov',
+}
+
+
+class UploadError(Exception):
+    pass
+
+
+def _root():
+    return Path(settings.MEDIA_ROOT) / 'uploads'
+
+
+def parts_dir(upload):
+    return _root() / 'partial' / str(upload.id)
+
+
+def _part_path(upload, index):
+    return parts_dir(upload) / f"{index:06d}.part"
+
+
+def received_chunks(upload):
+    """
+    Indexes of the chunks already stored for ``upload``
+    """
+    directory = parts_dir(upload)
+    if not directory.is_dir():
+        return []
+    return sorted(int(name.split('.')[0]) for name in os.listdir(directory) if name.endswith('.part'))
+
+
+def missing_chunks(upload):
+    return sorted(set(range(upload.chunk_count)) - set(received_chunks(upload)))
+
+
+def _temporary(directory):
+    handle, name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    return os.fdopen(handle, 'wb'), Path(name)
+
+
+def write_chunk(upload, index, stream, sha256=None):
+    """
+    Copy one chunk from ``stream`` to disk. The chunk must have exactly the
+    expected length and, when ``sha256`` is given, that digest.
+    """
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError(f"Chunk index must be between 0 and {upload.chunk_count - 1}")
+
+    expected = upload.chunk_length(index)
+    directory = parts_dir(upload)
+    directory.mkdir(parents=True, exist_ok=True)
+    final = _part_path(upload, index)
+    fh, temporary = _temporary(directory)
+
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with fh:
+            while written <= expected:
+                block = stream.read(min(BLOCK_SIZE, expected + 1 - written))
+                if not block:
+                    break
+                digest.update(block)
+                fh.write(block)
+                written += len(block)
+        if written != expected:
+            raise UploadError(f"Chunk {index} must be {expected} bytes, got {written if written <= expected else 'more'}")
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise UploadError(f"Chunk {index} checksum mismatch")
+        os.replace(temporary, final)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+    return written
+
+
+def _final_path(upload):
+    # The extension follows the checked content type, never the client's
+    # filename.
+    extension = MEDIA_TYPES.get(upload.content_type, '.bin')
+    now = timezone.now()
+    return Path(f"{now:%Y}") / f"{now:%m}" / f"{upload.id}{extension}"
+
+
+def assemble(upload):
+    """
+    Concatenate all chunks into the final file and verify the declared
+    SHA-256. Returns the path relative to the uploads root.
+    """
+    missing = missing_chunks(upload)
+    if missing:
+        raise UploadError(f"Missing chunks: {missing[:20]}")
+
+    relative = _final_path(upload)
+    target = _root() / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+    out, temporary = _temporary(target.parent)
+
+    digest = hashlib.sha256()
+    try:
+        with out:
+            for index in range(upload.chunk_count):
+                with open(_part_path(upload, index), 'rb') as part:
+                    while block := part.read(BLOCK_SIZE):
+                        digest.update(block)
+                        out.write(block)
+        if digest.hexdigest() != upload.sha256.lower():
+            raise UploadError("File checksum mismatch")
+        os.replace(temporary, target)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+    discard_parts(upload)
+    return str(relative)
+
+
+def start_assembly(upload):
+    """
+    Mark a pending upload ``assembling`` and queue its assembly. Returns
+    False if it was not pending any more.
+    """
+    if not Upload.objects.filter(pk=upload.pk, status='pending').update(status='assembling', error=''):
+        return False
+    assemble_task.enqueue_on_commit(key=f'assemble_upload:{upload.pk}', upload_id=str(upload.pk))
+    return True
+
+
+@tasks.task(name='assemble_upload', priority=-1)
+def assemble_task(upload_id):
+    upload = Upload.objects.filter(pk=upload_id, status='assembling').first()
+    if upload is None:
+        return
+    try:
+        path = assemble(upload)
+    except UploadError as exc:
+        Upload.objects.filter(pk=upload.pk, status='assembling').update(status='pending', error=str(exc))
+        return
+    finished = Upload.objects.filter(pk=upload.pk, status='assembling').update(
+        status='complete', path=path, completed_at=timezone.now()
+    )
+    if not finished:
+        # Deleted while it was being assembled.
+        (_root() / path).unlink(missing_ok=True)
+
+
+def discard_parts(upload):
+    shutil.rmtree(parts_dir(upload), ignore_errors=True)
+
+
+def delete_file(upload):
+    if upload.path:
+        (_root() / upload.path).unlink(missing_ok=True)
+    discard_parts(upload)
+
+
+def delete_files_on_commit(upload_ids):
+    """
+    Delete the stored data of ``upload_ids`` once the transaction deleting
+    their rows commits
+    """
+    doomed = list(Upload.objects.filter(pk__in=upload_ids).only('id', 'path'))
+    transaction.on_commit(lambda: [delete_file(upload) for upload in doomed])
+
+
+def accel_redirect_path(upload):
+    """
+    Internal nginx location of a completed upload
+    """
+    return f"{settings.UPLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{upload.path}"
+
+
+def file_path(upload):
+    return _root() / upload.path
+
+
+def served_as(upload):
+    """
+    ``(content type, inline)`` to serve a completed upload with
+    """
+    if upload.content_type in MEDIA_TYPES:
+        return upload.content_type, True
+    return 'application/octet-stream', False
@@ -10,7 +10,12 @@ from api.views import (
     FriendRequestViewSet,
     FriendViewSet,
     SubscriptionViewSet,
-    MessageViewSet
+    MessageViewSet,
+    UploadViewSet,
+    DeletionViewSet,
+    NotificationViewSet,
+    VersionsView,
+    SyncView
 )
 
 router = DefaultRouter()
@@ -23,6 +28,12 @@ urlpatterns = [
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
     
+    # Change counters for polling clients
+    path('me/versions/', VersionsView.as_view(), name='me-versions'),
+
+    # Change feed for clients that keep a local copy
+    path('sync/', SyncView.as_view(), name='sync'),
+    
     # Friend requests
     path('friends/request/', FriendRequestViewSet.as_view({'post': 'create'}), name='friend-request-create'),
     path('friends/requests/', FriendRequestViewSet.as_view({'get': 'list'}), name='friend-request-list'),
@@ -43,6 +54,21 @@ urlpatterns = [
     path('messages/<int:pk>/', MessageViewSet.as_view({'get': 'retrieve', 'post': 'create'}), name='message-conversation'),
     path('messages/<int:pk>/read/', MessageViewSet.as_view({'patch': 'mark_read'}), name='message-mark-read'),
     path('messages/unread-count/', MessageViewSet.as_view({'get': 'unread_count'}), name='message-unread-count'),
+    path('messages/search/', MessageViewSet.as_view({'get': 'search'}), name='message-search'),
+    
+    # Uploads
+    path('uploads/', UploadViewSet.as_view({'post': 'create'}), name='upload-create'),
+    path('uploads/<uuid:pk>/', UploadViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'}), name='upload-detail'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/', UploadViewSet.as_view({'put': 'chunk'}), name='upload-chunk'),
+    path('uploads/<uuid:pk>/complete/', UploadViewSet.as_view({'post': 'complete'}), name='upload-complete'),
+    path('uploads/<uuid:pk>/file/', UploadViewSet.as_view({'get': 'file'}), name='upload-file'),
+    
+    # Notifications
+    path('notifications/', NotificationViewSet.as_view({'get': 'list'}), name='notification-list'),
+    path('notifications/read/', NotificationViewSet.as_view({'post': 'mark_read'}), name='notification-read'),
+    
+    # Background deletions
+    path('deletions/<int:pk>/', DeletionViewSet.as_view({'get': 'retrieve'}), name='deletion-detail'),
     
     path('', include(router.urls)),
 ]
@@ -0,0 +1,58 @@
+"""
+Per-member version counters for cheap "anything new?" polling.
+
+Clients read ``GET /me/versions/`` (one primary-key lookup) and only refetch
+the feed, inbox, friend requests or notifications when the matching counter
+has moved. Write paths bump counters with a single ``UPDATE ... SET n = n + 1``.
+
+Rows are created the first time a member asks for their versions, and bumps
+only update existing rows, so members who never poll cost nothing. A bump
+that happens before the row exists is lost, which is harmless: the client
+has no earlier version to compare against.
+"""
+from django.db.models import F, Q
+
+from api import tasks
+from api.models import Friendship, MemberVersions, Subscription
+
+
+FIELDS = ('feed', 'inbox', 'friend_requests', 'notifications')
+
+
+def current(member):
+    """
+    The member's counters, creating their row on first use
+    """
+    row = MemberVersions.objects.filter(pk=member.pk).values(*FIELDS).first()
+    if row is None:
+        MemberVersions.objects.get_or_create(member=member)
+        row = dict.fromkeys(FIELDS, 0)
+    return row
+
+
+def bump(member_ids, *fields):
+    """
+    Advance ``fields`` for the given member id or ids
+    """
+    if isinstance(member_ids, int):
+        member_ids = [member_ids]
+    MemberVersions.objects.filter(member_id__in=member_ids).update(**{name: F(name) + 1 for name in fields})
+
+
+def bump_feeds_of_audience(author_id):
+    """
+    Advance the feed version of everyone whose feed shows the author's
+    posts: the author, their friends and their followers. Audiences are
+    unbounded, so this runs as a task, and a burst of posts by one author
+    coalesces into one job.
+    """
+    bump_audience_task.enqueue_on_commit(key=f'bump_audience:{author_id}', author_id=author_id)
+
+
+@tasks.task(name='bump_audience', priority=1)
+def bump_audience_task(author_id):
+    MemberVersions.objects.filter(
+        Q(member_id=author_id)
+        | Q(member_id__in=Friendship.objects.filter(member_id=author_id).values('friend_id'))
+        | Q(member_id__in=Subscription.objects.filter(following_id=author_id).values('follower_id'))
+    ).update(feed=F('feed') + 1)
@@ -1,15 +1,34 @@
+import io
+
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import content_disposition_header
+from django.db import IntegrityError, transaction
 from django.db.models import Q, Max, Count, Case, When, IntegerField
-from drf_spectacular.utils import extend_schema, OpenApiParameter
-from drf_spectacular.types import OpenApiTypes
 
-from api.models import Member, Post, Comment, Like, Repost, FriendRequest, Subscription, Message
+from api.models import (
+    Member,
+    Post,
+    Comment,
+    Like,
+    Repost,
+    FriendRequest,
+    Subscription,
+    Message,
+    FriendSuggestion,
+    Friendship,
+    Upload,
+    DeletionJob,
+    Notification
+)
 from api.serializers import (
     MemberSerializer,
     MemberRegistrationSerializer,
@@ -20,9 +39,84 @@ from api.serializers import (
     CommentSerializer,
     FriendRequestSerializer,
     SubscriptionSerializer,
-    MessageSerializer
+    MessageSerializer,
+    FriendSuggestionSerializer,
+    MemberSummarySerializer,
+    UploadSerializer,
+    DeletionJobSerializer,
+    NotificationSerializer,
+    TagCountSerializer
 )
 from api.authentication import MemberJWTAuthentication
+from api.pagination import LikeCursorPagination, NotificationCursorPagination, PostTermCursorPagination
+from api.exporter import ndjson_stream, zip_stream
+from api import (
+    archive, changelog, deletion, hashing, inbox, likebuffer, notifications, search, tags, trending, uploads, versions
+)
+from api.schema import extend_schema, OpenApiParameter, OpenApiTypes
+from api.idempotency import idempotent
+from api.graph import mark_follow_changed, mark_neighbourhood_changed, friend_id_arrays, intersect_sorted, shortest_path
+
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name='Idempotency-Key',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.HEADER,
+    description='Client-generated key; a retry with the same key replays the first response',
+    required=False
+)
+
+SEARCH_PARAMETERS = [
+    OpenApiParameter(
+        name='q',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description='Words to search for; a result contains all of them',
+        required=True
+    ),
+    OpenApiParameter(
+        name='limit',
+        type=OpenApiTypes.INT,
+        location=OpenApiParameter.QUERY,
+        description='Results per page (1-50)',
+        required=False
+    ),
+    OpenApiParameter(
+        name='offset',
+        type=OpenApiTypes.INT,
+        location=OpenApiParameter.QUERY,
+        description='next_offset of the previous page',
+        required=False
+    ),
+]
+
+
+def search_page(request):
+    """
+    ``(query, limit, offset)`` of a search request, or an error ``Response``
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response(
+            {"detail": "Search query parameter 'q' is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        return Response(
+            {"detail": "limit and offset must be integers"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return query, limit, offset
+
+
+def next_offset(hits, limit, offset):
+    # Ranking only ever considers SEARCH_CANDIDATES matches.
+    if len(hits) < limit or offset + limit >= settings.SEARCH_CANDIDATES:
+        return None
+    return offset + limit
 
 
 class RegisterView(APIView):
@@ -82,7 +176,7 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        if not member.check_password(password):
+        if not hashing.check_password(password, member.password):
             return Response(
                 {"detail": "Invalid credentials"},
                 status=status.HTTP_401_UNAUTHORIZED
@@ -138,6 +232,7 @@ class MemberViewSet(viewsets.ModelViewSet):
     search_fields = ['username', 'first_name', 'last_name', 'email']
     ordering_fields = ['date_joined', 'username']
     ordering = ['-date_joined']
+    throttle_scopes = {'search': 'member_search'}
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'search']:
@@ -186,6 +281,26 @@ class MemberViewSet(viewsets.ModelViewSet):
             )
         return super().partial_update(request, *args, **kwargs)
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        changelog.member_updated(serializer.instance.id)
+
+    @extend_schema(
+        responses={202: DeletionJobSerializer},
+        description="Delete own account. The account disappears at once; its posts, "
+                    "messages and other data are purged in the background."
+    )
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if instance.id != request.user.id:
+            return Response(
+                {"detail": "You can only delete your own account"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        job = deletion.tombstone(instance, requested_by=request.user)
+        changelog.member_deleted(instance.id)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -248,7 +363,7 @@ class MemberViewSet(viewsets.ModelViewSet):
         description="Get user settings"
     )
     @action(detail=False, methods=['get'], url_path='me/settings')
-    def settings(self, request):
+    def member_settings(self, request):
         member = request.user
         return Response({
             'email': member.email,
@@ -261,7 +376,7 @@ class MemberViewSet(viewsets.ModelViewSet):
         responses={200: dict},
         description="Update user settings"
     )
-    @action(detail=False, methods=['put'], url_path='me/settings')
+    @member_settings.mapping.put
     def update_settings(self, request):
         member = request.user
         
@@ -269,7 +384,7 @@ class MemberViewSet(viewsets.ModelViewSet):
             member.email = request.data['email']
         
         if 'password' in request.data:
-            member.set_password(request.data['password'])
+            member.password = hashing.make_password(request.data['password'])
         
         member.save()
         
@@ -277,6 +392,47 @@ class MemberViewSet(viewsets.ModelViewSet):
             'message': 'Settings updated successfully'
         })
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='archive',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description="Set to 'zip' to receive a zip with one NDJSON file per section",
+                required=False
+            )
+        ],
+        responses={200: OpenApiTypes.BINARY},
+        description="Stream an export of the current user's posts, comments, likes, messages and graph"
+    )
+    @action(detail=False, methods=['get'], url_path='me/export')
+    def export(self, request):
+        member = request.user
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+
+        if request.query_params.get('archive') == 'zip':
+            response = StreamingHttpResponse(zip_stream(member), content_type='application/zip')
+            filename = f'{member.username}-{stamp}.zip'
+        else:
+            response = StreamingHttpResponse(ndjson_stream(member), content_type='application/x-ndjson')
+            filename = f'{member.username}-{stamp}.ndjson'
+
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+
+    @extend_schema(
+        responses={200: FriendSuggestionSerializer(many=True)},
+        description="Get friend suggestions for the current user, best first"
+    )
+    @action(detail=False, methods=['get'], url_path='me/suggestions')
+    def suggestions(self, request):
+        suggestions = FriendSuggestion.objects.filter(
+            member=request.user
+        ).select_related('suggested').order_by('-score')[:settings.FRIEND_SUGGESTIONS_TOP_K]
+        
+        serializer = FriendSuggestionSerializer(suggestions, many=True)
+        return Response(serializer.data)
+
     @extend_schema(
         responses={200: MemberSerializer(many=True)},
         description="Get member's friends list"
@@ -285,19 +441,7 @@ class MemberViewSet(viewsets.ModelViewSet):
     def friends(self, request, pk=None):
         member = self.get_object()
         
-        friend_requests = FriendRequest.objects.filter(
-            Q(from_member=member) | Q(to_member=member),
-            status='accepted'
-        )
-        
-        friend_ids = set()
-        for fr in friend_requests:
-            if fr.from_member.id == member.id:
-                friend_ids.add(fr.to_member.id)
-            else:
-                friend_ids.add(fr.from_member.id)
-        
-        friends = Member.objects.filter(id__in=friend_ids)
+        friends = Member.objects.filter(id__in=Friendship.friend_ids(member))
         
         page = self.paginate_queryset(friends)
         if page is not None:
@@ -307,6 +451,68 @@ class MemberViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(friends, many=True)
         return Response(serializer.data)
 
+    @extend_schema(
+        responses={200: MemberSummarySerializer(many=True)},
+        description="Get friends shared by the current user and this member"
+    )
+    @action(detail=True, methods=['get'])
+    def mutual(self, request, pk=None):
+        member = self.get_object()
+        
+        friend_ids = friend_id_arrays([request.user.id, member.id])
+        mutual_ids = intersect_sorted(friend_ids[request.user.id], friend_ids[member.id])
+        
+        mutual_friends = Member.objects.filter(id__in=list(mutual_ids)).order_by('id')
+        page = self.paginate_queryset(mutual_friends)
+        if page is not None:
+            serializer = MemberSummarySerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = MemberSummarySerializer(mutual_friends, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='max_hops',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Maximum path length to search (1-6, default 6)',
+                required=False
+            )
+        ],
+        responses={200: dict},
+        description="Find the shortest friendship path from the current user to this member"
+    )
+    @action(detail=True, methods=['get'])
+    def path(self, request, pk=None):
+        member = self.get_object()
+        
+        try:
+            max_hops = min(max(int(request.query_params.get('max_hops', 6)), 1), 6)
+        except ValueError:
+            return Response(
+                {"detail": "max_hops must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        path_ids, exhausted = shortest_path(request.user.id, member.id, max_hops=max_hops)
+        if path_ids is None:
+            return Response({
+                'found': False,
+                'budget_exhausted': exhausted,
+                'hops': None,
+                'path': []
+            })
+        
+        members = Member.objects.in_bulk(path_ids)
+        return Response({
+            'found': True,
+            'budget_exhausted': False,
+            'hops': len(path_ids) - 1,
+            'path': MemberSummarySerializer([members[i] for i in path_ids], many=True).data
+        })
+
     @extend_schema(
         responses={200: MemberSerializer(many=True)},
         description="Get member's followers"
@@ -343,6 +549,18 @@ class MemberViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(following, many=True)
         return Response(serializer.data)
 
+    @extend_schema(
+        responses={200: PostSerializer(many=True)},
+        description="Get posts mentioning a member, newest first (cursor-paginated)"
+    )
+    @action(detail=True, methods=['get'])
+    def mentions(self, request, pk=None):
+        member = self.get_object()
+        paginator = PostTermCursorPagination()
+        page = paginator.paginate_queryset(tags.mentions(member.id), request, view=self)
+        serializer = PostSerializer([term.post for term in page], many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
 
 class PostViewSet(viewsets.ModelViewSet):
     """
@@ -353,9 +571,10 @@ class PostViewSet(viewsets.ModelViewSet):
     authentication_classes = [MemberJWTAuthentication]
     permission_classes = [IsAuthenticated]
     ordering = ['-created_at']
+    throttle_scopes = {'like': 'post_like', 'unlike': 'post_like', 'search': 'content_search'}
 
     def get_queryset(self):
-        queryset = Post.objects.all()
+        queryset = Post.objects.select_related('author', 'repost_of', 'repost_of__author')
         author_id = self.request.query_params.get('author')
         
         if author_id:
@@ -365,20 +584,12 @@ class PostViewSet(viewsets.ModelViewSet):
             user = self.request.user
             
             # Get friends
-            friend_requests = FriendRequest.objects.filter(
-                Q(from_member=user) | Q(to_member=user),
-                status='accepted'
-            )
-            friend_ids = set()
-            for fr in friend_requests:
-                if fr.from_member.id == user.id:
-                    friend_ids.add(fr.to_member.id)
-                else:
-                    friend_ids.add(fr.from_member.id)
+            friend_ids = set(Friendship.friend_ids(user))
             
             # Get subscriptions
-            subscriptions = Subscription.objects.filter(follower=user)
-            subscription_ids = set(sub.following.id for sub in subscriptions)
+            subscription_ids = set(
+                Subscription.objects.filter(follower=user).values_list('following_id', flat=True)
+            )
             
             # Combine with own posts
             all_ids = friend_ids | subscription_ids | {user.id}
@@ -407,15 +618,27 @@ class PostViewSet(viewsets.ModelViewSet):
 
     @extend_schema(
         request=PostSerializer,
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={201: PostSerializer},
         description="Create new post"
     )
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(author=request.user)
+        with transaction.atomic():
+            post = serializer.save(author=request.user)
+            tags.index_post(post)
+            changelog.record(request.user.id, 'posts', post.id, 'insert')
+        versions.bump_feeds_of_audience(request.user.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            post = serializer.save()
+            tags.index_post(post)
+            changelog.record(post.author_id, 'posts', post.id, 'update')
+
     @extend_schema(
         request=PostSerializer,
         responses={200: PostSerializer},
@@ -428,7 +651,9 @@ class PostViewSet(viewsets.ModelViewSet):
                 {"detail": "You can only update your own posts"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        return super().update(request, *args, **kwargs)
+        response = super().update(request, *args, **kwargs)
+        versions.bump_feeds_of_audience(request.user.id)
+        return response
 
     @extend_schema(
         request=PostSerializer,
@@ -442,11 +667,14 @@ class PostViewSet(viewsets.ModelViewSet):
                 {"detail": "You can only update your own posts"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        return super().partial_update(request, *args, **kwargs)
+        response = super().partial_update(request, *args, **kwargs)
+        versions.bump_feeds_of_audience(request.user.id)
+        return response
 
     @extend_schema(
-        responses={204: None},
-        description="Delete post (author only)"
+        responses={202: DeletionJobSerializer},
+        description="Delete post (author only). The post disappears at once; its likes, "
+                    "comments and reposts are purged in the background."
     )
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -455,7 +683,96 @@ class PostViewSet(viewsets.ModelViewSet):
                 {"detail": "You can only delete your own posts"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        return super().destroy(request, *args, **kwargs)
+        job = deletion.tombstone(instance, requested_by=request.user)
+        changelog.record(request.user.id, 'posts', instance.id, 'delete')
+        versions.bump_feeds_of_audience(request.user.id)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='limit',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Number of posts to return (max 100, default 20)',
+                required=False
+            )
+        ],
+        responses={200: PostSerializer(many=True)},
+        description="Get trending posts ranked by time-decayed likes, comments and reposts"
+    )
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response(
+                {"detail": "limit must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        posts = trending.top_posts(limit)
+        serializer = self.get_serializer(posts, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='limit',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Number of tags to return (max 100, default 20)',
+                required=False
+            )
+        ],
+        responses={200: TagCountSerializer(many=True)},
+        description="Get the hashtags used by the most posts"
+    )
+    @action(detail=False, methods=['get'], url_path='tags')
+    def top_tags(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response(
+                {"detail": "limit must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(TagCountSerializer(tags.top_tags(limit), many=True).data)
+
+    @extend_schema(
+        responses={200: PostSerializer(many=True)},
+        description="Get posts carrying a hashtag, newest first (cursor-paginated)"
+    )
+    @action(detail=False, methods=['get'], url_path=r'tags/(?P<tag>\w+)')
+    def tag_timeline(self, request, tag=None):
+        paginator = PostTermCursorPagination()
+        page = paginator.paginate_queryset(tags.tag_timeline(tag), request, view=self)
+        serializer = self.get_serializer([term.post for term in page], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        parameters=SEARCH_PARAMETERS,
+        responses={200: dict},
+        description="Full-text search over posts of visible members, ranked by relevance and recency, "
+                    "with highlighted snippets"
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        page = search_page(request)
+        if isinstance(page, Response):
+            return page
+        query, limit, offset = page
+
+        hits = search.search_posts(query, limit=limit, offset=offset)
+        posts = self.get_queryset().in_bulk([post_id for post_id, _ in hits])
+        results = []
+        for post_id, snippet in hits:
+            if post_id in posts:
+                results.append(dict(self.get_serializer(posts[post_id]).data, snippet=snippet))
+        return Response({
+            'results': results,
+            'next_offset': next_offset(hits, limit, offset)
+        })
 
     @extend_schema(
         responses={200: dict},
@@ -463,9 +780,18 @@ class PostViewSet(viewsets.ModelViewSet):
     )
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
-        post = self.get_object()
+        post = self.get_object().original
         user = request.user
         
+        if likebuffer.enabled():
+            changed, likes_count = likebuffer.toggle(user.id, post.id, True)
+            if not changed:
+                return Response(
+                    {"detail": "You already liked this post"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response({"likes_count": likes_count}, status=status.HTTP_200_OK)
+        
         like, created = Like.objects.get_or_create(member=user, post=post)
         
         if not created:
@@ -474,6 +800,9 @@ class PostViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        trending.record(post, 'like')
+        notifications.record(post, 'like', user)
+        
         likes_count = Like.objects.filter(post=post).count()
         return Response({"likes_count": likes_count}, status=status.HTTP_200_OK)
 
@@ -483,9 +812,18 @@ class PostViewSet(viewsets.ModelViewSet):
     )
     @action(detail=True, methods=['post'])
     def unlike(self, request, pk=None):
-        post = self.get_object()
+        post = self.get_object().original
         user = request.user
         
+        if likebuffer.enabled():
+            changed, likes_count = likebuffer.toggle(user.id, post.id, False)
+            if not changed:
+                return Response(
+                    {"detail": "You have not liked this post"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response({"likes_count": likes_count}, status=status.HTTP_200_OK)
+        
         try:
             like = Like.objects.get(member=user, post=post)
             like.delete()
@@ -498,24 +836,60 @@ class PostViewSet(viewsets.ModelViewSet):
             )
 
     @extend_schema(
-        responses={200: MemberSerializer(many=True)},
-        description="Get list of users who liked the post"
+        parameters=[
+            OpenApiParameter(
+                name='cursor',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Cursor from the previous page',
+                required=False
+            ),
+            OpenApiParameter(
+                name='friends_first',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description="List the current user's friends separately on the first page",
+                required=False
+            )
+        ],
+        responses={200: MemberSummarySerializer(many=True)},
+        description="Get users who liked the post, newest first, cursor-paginated"
     )
     @action(detail=True, methods=['get'])
     def likes(self, request, pk=None):
-        post = self.get_object()
+        post = self.get_object().original
         likes = Like.objects.filter(post=post).select_related('member')
-        members = [like.member for like in likes]
-        serializer = MemberSerializer(members, many=True)
-        return Response(serializer.data)
+        
+        friends_first = request.query_params.get('friends_first') in ('1', 'true')
+        friend_likes = None
+        if friends_first:
+            friend_ids = list(friend_id_arrays([request.user.id])[request.user.id])
+            likes = likes.exclude(member_id__in=friend_ids)
+            if not request.query_params.get('cursor'):
+                friend_likes = Like.objects.filter(
+                    post=post, member_id__in=friend_ids
+                ).select_related('member').order_by('-created_at')[:LikeCursorPagination.max_page_size]
+        
+        paginator = LikeCursorPagination()
+        page = paginator.paginate_queryset(likes, request, view=self)
+        serializer = MemberSummarySerializer([like.member for like in page], many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        
+        if friend_likes is not None:
+            response.data['friends'] = MemberSummarySerializer(
+                [like.member for like in friend_likes], many=True
+            ).data
+        return response
 
     @extend_schema(
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={200: CommentSerializer(many=True)},
         description="Get comments for post"
     )
     @action(detail=True, methods=['get', 'post'])
+    @idempotent
     def comments(self, request, pk=None):
-        post = self.get_object()
+        post = self.get_object().original
         
         if request.method == 'GET':
             comments = Comment.objects.filter(post=post).select_related('author').order_by('-created_at')
@@ -541,6 +915,8 @@ class PostViewSet(viewsets.ModelViewSet):
                 post=post,
                 content=content
             )
+            trending.record(post, 'comment')
+            notifications.record(post, 'comment', request.user)
             
             serializer = CommentSerializer(comment)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -551,7 +927,7 @@ class PostViewSet(viewsets.ModelViewSet):
     )
     @action(detail=True, methods=['post'])
     def repost(self, request, pk=None):
-        original_post = self.get_object()
+        original_post = self.get_object().original
         user = request.user
         
         # Check if already reposted
@@ -564,14 +940,19 @@ class PostViewSet(viewsets.ModelViewSet):
         
         # Create repost record
         repost = Repost.objects.create(member=user, post=original_post)
+        trending.record(original_post, 'repost')
+        notifications.record(original_post, 'repost', user)
         
-        # Create new post as repost
+        # The timeline entry only references the original; media and
+        # counters are read from it through repost_of.
         new_post = Post.objects.create(
             author=user,
             content=request.data.get('content', ''),
-            image_url=original_post.image_url,
-            video_url=original_post.video_url
+            repost_of=original_post
         )
+        tags.index_post(new_post)
+        changelog.record(user.id, 'posts', new_post.id, 'insert')
+        versions.bump_feeds_of_audience(user.id)
         
         serializer = PostSerializer(new_post, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -609,9 +990,11 @@ class FriendRequestViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={201: FriendRequestSerializer},
         description="Send friend request"
     )
+    @idempotent
     def create(self, request):
         to_member_id = request.data.get('to_member')
         
@@ -635,11 +1018,19 @@ class FriendRequestViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if request already exists
-        existing_request = FriendRequest.objects.filter(
-            Q(from_member=request.user, to_member=to_member) |
-            Q(from_member=to_member, to_member=request.user)
-        ).first()
+        # One request per unordered pair, enforced by the unique pair key
+        pair_low, pair_high = FriendRequest.pair_key(request.user.id, to_member.id)
+        existing_request = FriendRequest.objects.filter(pair_low=pair_low, pair_high=pair_high).exists()
+        
+        if not existing_request:
+            try:
+                with transaction.atomic():
+                    friend_request = FriendRequest.objects.create(
+                        from_member=request.user,
+                        to_member=to_member
+                    )
+            except IntegrityError:
+                existing_request = True
         
         if existing_request:
             return Response(
@@ -647,10 +1038,7 @@ class FriendRequestViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        friend_request = FriendRequest.objects.create(
-            from_member=request.user,
-            to_member=to_member
-        )
+        versions.bump([request.user.id, to_member.id], 'friend_requests')
         
         serializer = FriendRequestSerializer(friend_request)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -690,8 +1078,13 @@ class FriendRequestViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        friend_request.status = 'accepted'
-        friend_request.save()
+        with transaction.atomic():
+            friend_request.status = 'accepted'
+            friend_request.save()
+            Friendship.link(friend_request.from_member_id, friend_request.to_member_id)
+            changelog.friendship(friend_request.from_member_id, friend_request.to_member_id, 'insert')
+        mark_neighbourhood_changed(friend_request.from_member_id, friend_request.to_member_id)
+        versions.bump([friend_request.from_member_id, friend_request.to_member_id], 'friend_requests', 'feed')
         
         serializer = FriendRequestSerializer(friend_request)
         return Response(serializer.data)
@@ -717,6 +1110,7 @@ class FriendRequestViewSet(viewsets.ViewSet):
         
         friend_request.status = 'rejected'
         friend_request.save()
+        versions.bump([friend_request.from_member_id, friend_request.to_member_id], 'friend_requests')
         
         serializer = FriendRequestSerializer(friend_request)
         return Response(serializer.data)
@@ -736,19 +1130,7 @@ class FriendViewSet(viewsets.ViewSet):
     def list(self, request):
         user = request.user
         
-        friend_requests = FriendRequest.objects.filter(
-            Q(from_member=user) | Q(to_member=user),
-            status='accepted'
-        )
-        
-        friend_ids = set()
-        for fr in friend_requests:
-            if fr.from_member.id == user.id:
-                friend_ids.add(fr.to_member.id)
-            else:
-                friend_ids.add(fr.from_member.id)
-        
-        friends = Member.objects.filter(id__in=friend_ids)
+        friends = Member.objects.filter(id__in=Friendship.friend_ids(user))
         serializer = MemberSerializer(friends, many=True)
         return Response(serializer.data)
 
@@ -768,9 +1150,10 @@ class FriendViewSet(viewsets.ViewSet):
             )
         
         # Find and delete friend request
+        pair_low, pair_high = FriendRequest.pair_key(user.id, friend.id)
         friend_request = FriendRequest.objects.filter(
-            Q(from_member=user, to_member=friend) |
-            Q(from_member=friend, to_member=user),
+            pair_low=pair_low,
+            pair_high=pair_high,
             status='accepted'
         ).first()
         
@@ -780,7 +1163,12 @@ class FriendViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        friend_request.delete()
+        with transaction.atomic():
+            friend_request.delete()
+            Friendship.unlink(user.id, friend.id)
+            changelog.friendship(user.id, friend.id, 'delete')
+        mark_neighbourhood_changed(user.id, friend.id)
+        versions.bump([user.id, friend.id], 'friend_requests', 'feed')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -820,6 +1208,9 @@ class SubscriptionViewSet(viewsets.ViewSet):
                 {"detail": "Already subscribed"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        changelog.subscription(request.user.id, following.id, 'insert')
+        mark_follow_changed(request.user.id, following.id)
+        versions.bump(request.user.id, 'feed')
         
         serializer = SubscriptionSerializer(subscription)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -843,6 +1234,9 @@ class SubscriptionViewSet(viewsets.ViewSet):
                 following=following
             )
             subscription.delete()
+            changelog.subscription(request.user.id, following.id, 'delete')
+            mark_follow_changed(request.user.id, following.id)
+            versions.bump(request.user.id, 'feed')
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Subscription.DoesNotExist:
             return Response(
@@ -877,6 +1271,7 @@ class MessageViewSet(viewsets.ViewSet):
     """
     authentication_classes = [MemberJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_scopes = {'create': 'message_send', 'search': 'content_search'}
 
     @extend_schema(
         responses={200: dict},
@@ -915,6 +1310,15 @@ class MessageViewSet(viewsets.ViewSet):
             ).count()
             conversations[partner_id]['unread_count'] = unread_count
         
+        # Conversations whose messages have all been archived
+        for partner_id, message in archive.cold_conversations(user, exclude=conversations).items():
+            partner = message.receiver if message.sender.id == user.id else message.sender
+            conversations[partner_id] = {
+                'member': partner,
+                'last_message': message,
+                'unread_count': 0
+            }
+
         # Convert to list and serialize
         results = []
         for partner_id, conv_data in conversations.items():
@@ -933,8 +1337,24 @@ class MessageViewSet(viewsets.ViewSet):
         })
 
     @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='limit',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Messages per page',
+                required=False
+            ),
+            OpenApiParameter(
+                name='before',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Only return messages older than this message id (next_before of the previous page)',
+                required=False
+            )
+        ],
         responses={200: dict},
-        description="Get message history with specific user"
+        description="Get message history with specific user, newest page first"
     )
     def retrieve(self, request, pk=None):
         user = request.user
@@ -946,24 +1366,53 @@ class MessageViewSet(viewsets.ViewSet):
                 {"detail": "Member not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', settings.MESSAGE_PAGE_SIZE)), 1), 200)
+            before = int(request.query_params['before']) if request.query_params.get('before') else None
+        except ValueError:
+            return Response(
+                {"detail": "limit and before must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Get all messages between these two users
+        # Messages between these two users, newest first
         messages = Message.objects.filter(
             Q(sender=user, receiver=other_member) |
             Q(sender=other_member, receiver=user)
-        ).select_related('sender', 'receiver').order_by('created_at')
-        
-        serializer = MessageSerializer(messages, many=True)
+        )
+        archived = archive.archived_count(user, other_member)
+        count = messages.count() + archived
+        if before:
+            messages = messages.filter(id__lt=before)
+
+        # One extra row tells whether there is another page.
+        page = list(messages.select_related('sender', 'receiver').order_by('-id')[:limit + 1])
+        if archived:
+            # Unread messages are never archived, so old hot messages and
+            # archived ones interleave: merge the archive's rows from the
+            # same cursor. Below a full hot page nothing can make the cut.
+            floor = page[-1].id if len(page) > limit else None
+            page += archive.conversation_messages(user, other_member, before=before, limit=limit + 1, after=floor)
+            page.sort(key=lambda message: message.id, reverse=True)
+            page = page[:limit + 1]
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        serializer = MessageSerializer(reversed(page), many=True)
         
         return Response({
-            'count': messages.count(),
-            'results': serializer.data
+            'count': count,
+            'results': serializer.data,
+            'next_before': page[-1].id if has_more else None
         })
 
     @extend_schema(
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={201: MessageSerializer},
         description="Send message to user"
     )
+    @idempotent
     def create(self, request, pk=None):
         user = request.user
         
@@ -982,11 +1431,15 @@ class MessageViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        message = Message.objects.create(
-            sender=user,
-            receiver=receiver,
-            content=content
-        )
+        with transaction.atomic():
+            message = Message.objects.create(
+                sender=user,
+                receiver=receiver,
+                content=content
+            )
+            inbox.message_received(receiver.id)
+            changelog.conversation(user.id, receiver.id)
+        versions.bump([user.id, receiver.id], 'inbox')
         
         serializer = MessageSerializer(message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -1007,23 +1460,329 @@ class MessageViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        message.is_read = True
-        message.save()
+        if inbox.mark_read(message):
+            changelog.record(user.id, 'conversations', message.sender_id, 'update')
+            versions.bump(user.id, 'inbox')
         
         serializer = MessageSerializer(message)
         return Response(serializer.data)
 
+    @extend_schema(
+        parameters=SEARCH_PARAMETERS + [
+            OpenApiParameter(
+                name='with',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Only search the conversation with this member',
+                required=False
+            )
+        ],
+        responses={200: dict},
+        description="Full-text search over the current user's messages, archived ones included, "
+                    "with highlighted snippets"
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        page = search_page(request)
+        if isinstance(page, Response):
+            return page
+        query, limit, offset = page
+        try:
+            other_id = int(request.query_params['with']) if request.query_params.get('with') else None
+        except ValueError:
+            return Response(
+                {"detail": "with must be a member id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        hits = search.search_messages(request.user.id, query, other_id=other_id, limit=limit, offset=offset)
+        messages = Message.objects.select_related('sender', 'receiver').in_bulk([message_id for message_id, _ in hits])
+        archived = [message_id for message_id, _ in hits if message_id not in messages]
+        if archived:
+            messages.update(archive.messages_by_id(request.user, archived))
+        results = [
+            dict(MessageSerializer(messages[message_id]).data, snippet=snippet)
+            for message_id, snippet in hits if message_id in messages
+        ]
+        return Response({
+            'results': results,
+            'next_offset': next_offset(hits, limit, offset)
+        })
+
     @extend_schema(
         responses={200: dict},
         description="Get unread messages count"
     )
     @action(detail=False, methods=['get'], url_path='unread-count')
     def unread_count(self, request):
-        user = request.user
-        
-        count = Message.objects.filter(
-            receiver=user,
-            is_read=False
-        ).count()
-        
-        return Response({'unread_count': count})
+        return Response({'unread_count': inbox.unread(request.user.id)})
+
+
+class UploadViewSet(viewsets.ViewSet):
+    """
+    ViewSet for chunked, resumable media uploads
+    """
+    authentication_classes = [MemberJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_permissions(self):
+        # Finished files are linked from posts and avatars; the upload id is
+        # the capability.
+        if self.action == 'file':
+            return [AllowAny()]
+        return [IsAuthenticated()]
+
+    def _get_upload(self, request, pk):
+        return Upload.objects.filter(id=pk, owner=request.user).first()
+
+    @extend_schema(
+        request=UploadSerializer,
+        responses={201: UploadSerializer},
+        description="Start an upload: declare filename, content type, size and SHA-256 of the whole file"
+    )
+    def create(self, request):
+        serializer = UploadSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(owner=request.user, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+        return Response(UploadSerializer(upload, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        responses={200: UploadSerializer},
+        description="Get upload state, including which chunks have been received"
+    )
+    def retrieve(self, request, pk=None):
+        upload = self._get_upload(request, pk)
+        if upload is None:
+            return Response({"detail": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadSerializer(upload, context={'request': request}).data)
+
+    @extend_schema(
+        request={'application/octet-stream': OpenApiTypes.BINARY},
+        parameters=[
+            OpenApiParameter(
+                name='X-Chunk-SHA256',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.HEADER,
+                description='Hex SHA-256 of the chunk body',
+                required=False
+            )
+        ],
+        responses={200: dict},
+        description="Upload one chunk as the raw request body; re-sending a chunk replaces it"
+    )
+    def chunk(self, request, pk=None, index=None):
+        upload = self._get_upload(request, pk)
+        if upload is None:
+            return Response({"detail": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if upload.status != 'pending':
+            return Response({"detail": f"Upload is already {upload.status}"}, status=status.HTTP_409_CONFLICT)
+
+        # The body is read from the raw stream; request.data would buffer it.
+        try:
+            written = uploads.write_chunk(
+                upload, int(index), request.stream or io.BytesIO(), request.headers.get('X-Chunk-SHA256')
+            )
+        except uploads.UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'index': int(index), 'size': written})
+
+    @extend_schema(
+        request=None,
+        responses={200: UploadSerializer, 202: UploadSerializer},
+        description="Queue assembly of the received chunks and verification of the file checksum; "
+                    "poll the upload until its status is complete, or pending again with an error"
+    )
+    def complete(self, request, pk=None):
+        upload = self._get_upload(request, pk)
+        if upload is None:
+            return Response({"detail": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if upload.status == 'pending':
+            missing = uploads.missing_chunks(upload)
+            if missing:
+                return Response({"detail": f"Missing chunks: {missing[:20]}"}, status=status.HTTP_400_BAD_REQUEST)
+            uploads.start_assembly(upload)
+            upload.refresh_from_db()
+        data = UploadSerializer(upload, context={'request': request}).data
+        return Response(data, status=status.HTTP_200_OK if upload.status == 'complete' else status.HTTP_202_ACCEPTED)
+
+    @extend_schema(
+        responses={204: None},
+        description="Delete an upload and its stored data"
+    )
+    def destroy(self, request, pk=None):
+        upload = self._get_upload(request, pk)
+        if upload is None:
+            return Response({"detail": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        uploads.delete_file(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(
+        responses={(200, '*/*'): OpenApiTypes.BINARY},
+        description="Download a completed upload"
+    )
+    def file(self, request, pk=None):
+        upload = Upload.objects.filter(id=pk, status='complete').first()
+        if upload is None:
+            return Response({"detail": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        content_type, inline = uploads.served_as(upload)
+        if settings.UPLOAD_ACCEL_REDIRECT:
+            # nginx serves the bytes (with range support) from its internal
+            # location; the worker only returns headers.
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = uploads.accel_redirect_path(upload)
+        else:
+            response = FileResponse(open(uploads.file_path(upload), 'rb'), content_type=content_type)
+        response['Content-Disposition'] = content_disposition_header(not inline, upload.filename)
+        response['X-Content-Type-Options'] = 'nosniff'
+        response['Cache-Control'] = 'public, max-age=604800, immutable'
+        return response
+
+
+class DeletionViewSet(viewsets.ViewSet):
+    """
+    Progress of background deletions
+    """
+    authentication_classes = [MemberJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        responses={200: DeletionJobSerializer},
+        description="Progress of a post deletion requested by the current member"
+    )
+    def retrieve(self, request, pk=None):
+        job = DeletionJob.objects.filter(pk=pk, requested_by=request.user).first()
+        if job is None:
+            return Response(
+                {"detail": "Deletion not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(DeletionJobSerializer(job).data)
+
+
+class NotificationViewSet(viewsets.ViewSet):
+    """
+    ViewSet for the current member's notifications
+    """
+    authentication_classes = [MemberJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='cursor',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Cursor from the previous page',
+                required=False
+            ),
+            OpenApiParameter(
+                name='unread',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description='Only unread notifications',
+                required=False
+            )
+        ],
+        responses={200: NotificationSerializer(many=True)},
+        description="Get notifications, most recently updated first, cursor-paginated"
+    )
+    def list(self, request):
+        queryset = Notification.objects.filter(
+            recipient=request.user, post__deleted_at__isnull=True
+        ).select_related('last_actor')
+        if request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(is_read=False)
+
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        response = paginator.get_paginated_response(NotificationSerializer(page, many=True).data)
+        response.data['unread_count'] = Notification.objects.filter(recipient=request.user, is_read=False).count()
+        return response
+
+    @extend_schema(
+        request=None,
+        parameters=[
+            OpenApiParameter(
+                name='up_to',
+                type=OpenApiTypes.DATETIME,
+                location=OpenApiParameter.QUERY,
+                description="Only mark notifications updated at or before this time (the newest updated_at seen)",
+                required=False
+            )
+        ],
+        responses={200: dict},
+        description="Mark notifications as read"
+    )
+    def mark_read(self, request):
+        up_to = request.query_params.get('up_to')
+        if up_to:
+            up_to = parse_datetime(up_to)
+            if up_to is None:
+                return Response(
+                    {"detail": "up_to must be an ISO 8601 datetime"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(up_to):
+                up_to = timezone.make_aware(up_to)
+        marked = notifications.mark_read(request.user, up_to=up_to)
+        return Response({"marked_read": marked}, status=status.HTTP_200_OK)
+
+
+class VersionsView(APIView):
+    """
+    Version counters of the current member
+    """
+    authentication_classes = [MemberJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        responses={200: dict},
+        description="Counters for feed, inbox, friend requests and notifications that increase "
+                    "whenever the matching list changes; refetch a list only when its counter moved"
+    )
+    def get(self, request):
+        return Response(versions.current(request.user))
+
+
+class SyncView(APIView):
+    """
+    Incremental changes to the current member's friends, subscriptions,
+    conversations and posts
+    """
+    authentication_classes = [MemberJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='since',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='token of the previous response; omit on first sync',
+                required=False
+            )
+        ],
+        responses={200: dict},
+        description="Inserts, updates and deletes since the token, one entry per changed object. "
+                    "When reset is true (no or expired token), refetch the full lists and sync from "
+                    "the returned token; while has_more is true, call again at once."
+    )
+    def get(self, request):
+        token = request.query_params.get('since')
+        if not token:
+            return Response({
+                'reset': True,
+                'token': changelog.current_token(request.user),
+                'has_more': False,
+                'changes': []
+            })
+        try:
+            return Response(changelog.changes_since(request.user, token, request=request))
+        except changelog.InvalidToken:
+            return Response(
+                {"detail": "Invalid sync token"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
@@ -0,0 +1,14 @@
+"""
+Admin URLconf, imported on the first request under /admin/.
+
+The admin app is installed as SimpleAdminConfig, so ModelAdmin registration
+(autodiscovery of every app's admin module) happens here rather than at
+startup.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+app_name = "admin"
+
+urlpatterns = admin.site.get_urls()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 
@@ -55,8 +56,15 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 # Application definition
 
+# The OpenAPI schema is only generated offline (manage.py spectacular), so
+# drf-spectacular and the real extend_schema decorators are only loaded then
+# (see api/schema.py). API_SCHEMA_GENERATION=1 forces them on.
+API_SCHEMA_GENERATION = sys.argv[1:2] == ["spectacular"] or os.environ.get("API_SCHEMA_GENERATION") == "1"
+
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    # No admin autodiscovery at startup; config/admin_urls.py loads the admin
+    # on the first /admin/ request.
+    "django.contrib.admin.apps.SimpleAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -65,21 +73,46 @@ INSTALLED_APPS = [
     # Third party
     "rest_framework",
     "rest_framework_simplejwt",
-    "drf_spectacular",
     # Local
     "api",
 ]
 
+if API_SCHEMA_GENERATION:
+    INSTALLED_APPS.append("drf_spectacular")
+
 # REST Framework configuration
 REST_FRAMEWORK = {
-    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # The router touches every view's schema while building URLs; outside
+    # schema generation a bare inspector keeps drf-spectacular unimported.
+    "DEFAULT_SCHEMA_CLASS": (
+        "drf_spectacular.openapi.AutoSchema"
+        if API_SCHEMA_GENERATION
+        else "rest_framework.schemas.inspectors.ViewInspector"
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    "DEFAULT_THROTTLE_CLASSES": ("api.throttling.SharedTokenBucketThrottle",),
+    # nginx appends the client address to X-Forwarded-For; trust only that hop.
+    "NUM_PROXIES": 1,
+    "DEFAULT_THROTTLE_RATES": {
+        "member_search": os.environ.get("THROTTLE_MEMBER_SEARCH", "30/min"),
+        "post_like": os.environ.get("THROTTLE_POST_LIKE", "120/min"),
+        "message_send": os.environ.get("THROTTLE_MESSAGE_SEND", "60/min"),
+        "content_search": os.environ.get("THROTTLE_CONTENT_SEARCH", "30/min"),
+    },
 }
 
+# Token buckets for SharedTokenBucketThrottle live in this memory-mapped file,
+# shared by all gunicorn workers. Keep it on tmpfs where available.
+THROTTLE_TABLE_PATH = os.environ.get(
+    "THROTTLE_TABLE_PATH",
+    "/dev/shm/django-api-throttle" if os.path.isdir("/dev/shm") else "/tmp/django-api-throttle",
+)
+THROTTLE_TABLE_SLOTS = int(os.environ.get("THROTTLE_TABLE_SLOTS", "65536"))
+
 # Simple JWT configuration
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=24),
@@ -141,11 +174,143 @@ WSGI_APPLICATION = "config.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "persistent" / "db" / "db.sqlite3",
+        "NAME": os.environ.get("DATABASE_PATH", BASE_DIR / "persistent" / "db" / "db.sqlite3"),
+        "OPTIONS": {
+            # Lets db_maintenance hand free pages back in small steps. On an
+            # existing database this only takes effect after one full VACUUM
+            # (db_maintenance --convert).
+            "init_command": "PRAGMA auto_vacuum=INCREMENTAL",
+        },
     }
 }
 
 
+# Trending posts: only posts younger than the window are ranked, and each
+# like/comment/repost loses half its weight every half-life.
+TRENDING_WINDOW_HOURS = int(os.environ.get("TRENDING_WINDOW_HOURS", "72"))
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", "12"))
+
+# Friend suggestions kept per member by the refresh_suggestions batch job.
+FRIEND_SUGGESTIONS_TOP_K = int(os.environ.get("FRIEND_SUGGESTIONS_TOP_K", "20"))
+# Changes to the graph are picked up by one refresh job this long after the
+# first of them.
+FRIEND_SUGGESTIONS_REFRESH_DELAY_SECONDS = int(os.environ.get("FRIEND_SUGGESTIONS_REFRESH_DELAY_SECONDS", "30"))
+
+# Password hashing runs in a per-worker process pool (0 hashes inline). Each
+# worker admits at most PASSWORD_HASHING_MAX_PENDING jobs and sheds the rest
+# with 503. The defaults split the cores between the gunicorn workers
+# (gunicorn.conf.py reads the same GUNICORN_* variables) and admit no more
+# jobs than a worker's pool runs at once, always leaving one of its threads
+# free for other requests.
+GUNICORN_WORKERS = int(os.environ.get("GUNICORN_WORKERS", "2"))
+GUNICORN_THREADS = int(os.environ.get("GUNICORN_THREADS", "4"))
+PASSWORD_HASHING_PROCESSES = int(
+    os.environ.get("PASSWORD_HASHING_PROCESSES", str(max(1, (os.cpu_count() or 1) // GUNICORN_WORKERS)))
+)
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.environ.get(
+        "PASSWORD_HASHING_MAX_PENDING",
+        str(max(1, min(PASSWORD_HASHING_PROCESSES or GUNICORN_THREADS, GUNICORN_THREADS - 1))),
+    )
+)
+PASSWORD_HASHING_TIMEOUT = float(os.environ.get("PASSWORD_HASHING_TIMEOUT", "5"))
+
+# Read messages older than MESSAGE_HOT_DAYS are moved by archive_messages into
+# one SQLite file per month under MESSAGE_ARCHIVE_DIR. Conversations are
+# served newest first in pages of MESSAGE_PAGE_SIZE.
+MESSAGE_HOT_DAYS = int(os.environ.get("MESSAGE_HOT_DAYS", "90"))
+MESSAGE_ARCHIVE_DIR = BASE_DIR / "persistent" / "archive"
+MESSAGE_PAGE_SIZE = int(os.environ.get("MESSAGE_PAGE_SIZE", "50"))
+
+# db_maintenance: each run stops starting new steps after the time budget;
+# incremental vacuum releases this many pages per write transaction. A
+# positive interval has the task worker schedule a run that often.
+DB_MAINTENANCE_BUDGET_SECONDS = float(os.environ.get("DB_MAINTENANCE_BUDGET_SECONDS", "5"))
+DB_MAINTENANCE_VACUUM_PAGES = int(os.environ.get("DB_MAINTENANCE_VACUUM_PAGES", "256"))
+DB_MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get("DB_MAINTENANCE_INTERVAL_SECONDS", "0"))
+
+# Chunked uploads are stored under MEDIA_ROOT/uploads. Finished files are
+# handed to nginx with X-Accel-Redirect (its internal location for the same
+# directory is UPLOAD_ACCEL_REDIRECT_PREFIX); without nginx, set
+# UPLOAD_ACCEL_REDIRECT=0 to let Django stream them instead.
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(2 * 1024**3)))
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(8 * 1024**2)))
+UPLOAD_EXPIRY_HOURS = int(os.environ.get("UPLOAD_EXPIRY_HOURS", "24"))
+UPLOAD_ACCEL_REDIRECT = os.environ.get("UPLOAD_ACCEL_REDIRECT", "1") == "1"
+UPLOAD_ACCEL_REDIRECT_PREFIX = "/_uploads/"
+
+# Online snapshots taken by snapshot_db, and the database migrated at image
+# build time that fresh installs are copied from (see docker-entrypoint.sh).
+DB_SNAPSHOT_DIR = BASE_DIR / "persistent" / "snapshots"
+DB_SNAPSHOT_KEEP = int(os.environ.get("DB_SNAPSHOT_KEEP", "7"))
+DB_TEMPLATE_PATH = BASE_DIR / "db-template.sqlite3"
+
+# Background jobs (api/tasks.py) run by manage.py run_worker. Modules listed
+# here register their tasks when the worker starts.
+TASK_MODULES = [
+    "api.tasks",
+    "api.graph",
+    "api.trending",
+    "api.maintenance",
+    "api.deletion",
+    "api.notifications",
+    "api.likebuffer",
+    "api.idempotency",
+    "api.versions",
+    "api.inbox",
+    "api.uploads",
+    "api.changelog",
+]
+TASK_MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", "5"))
+TASK_RETRY_BACKOFF_SECONDS = float(os.environ.get("TASK_RETRY_BACKOFF_SECONDS", "5"))
+TASK_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get("TASK_RETRY_BACKOFF_MAX_SECONDS", "3600"))
+TASK_TIMEOUT_SECONDS = int(os.environ.get("TASK_TIMEOUT_SECONDS", "900"))
+TASK_POLL_INTERVAL_SECONDS = float(os.environ.get("TASK_POLL_INTERVAL_SECONDS", "1"))
+TASK_RETENTION_HOURS = int(os.environ.get("TASK_RETENTION_HOURS", "24"))
+
+# Deleted members and posts are tombstoned at once and purged by the
+# purge_deleted task (api/deletion.py): this many rows per transaction, with
+# a pause between batches, re-queueing itself after each time slice.
+DELETION_BATCH_SIZE = int(os.environ.get("DELETION_BATCH_SIZE", "500"))
+DELETION_BATCH_PAUSE_SECONDS = float(os.environ.get("DELETION_BATCH_PAUSE_SECONDS", "0.01"))
+DELETION_TIME_SLICE_SECONDS = float(os.environ.get("DELETION_TIME_SLICE_SECONDS", "60"))
+
+# Likes, comments and reposts of a post within one window are aggregated
+# into a single notification (api/notifications.py).
+NOTIFICATION_WINDOW_SECONDS = int(os.environ.get("NOTIFICATION_WINDOW_SECONDS", str(6 * 3600)))
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "90"))
+
+# Write-behind likes (api/likebuffer.py): when enabled, likes and unlikes go
+# to a separate WAL-mode SQLite buffer and the flush_likes task applies them
+# to the main database in batches every LIKE_FLUSH_INTERVAL_SECONDS.
+LIKE_WRITE_BEHIND = os.environ.get("LIKE_WRITE_BEHIND", "0") == "1"
+LIKE_BUFFER_PATH = Path(os.environ.get("LIKE_BUFFER_PATH", BASE_DIR / "persistent" / "db" / "like-buffer.sqlite3"))
+LIKE_FLUSH_INTERVAL_SECONDS = int(os.environ.get("LIKE_FLUSH_INTERVAL_SECONDS", "2"))
+LIKE_FLUSH_BATCH_SIZE = int(os.environ.get("LIKE_FLUSH_BATCH_SIZE", "5000"))
+
+# Idempotency-Key support (api/idempotency.py): stored responses expire after
+# the TTL; a duplicate waits up to IDEMPOTENCY_WAIT_SECONDS for the first
+# request, and a claim older than IDEMPOTENCY_LOCK_SECONDS counts as crashed.
+# A member keeps at most IDEMPOTENCY_MAX_KEYS_PER_MEMBER completed keys; the
+# oldest are evicted as new ones are claimed.
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_MAX_KEYS_PER_MEMBER = int(os.environ.get("IDEMPOTENCY_MAX_KEYS_PER_MEMBER", "1000"))
+
+# Full-text search (api/search.py): the newest SEARCH_CANDIDATES matches are
+# ranked by BM25, discounted with age so that a post SEARCH_RECENCY_DAYS old
+# scores half as much as an equally relevant new one.
+SEARCH_CANDIDATES = int(os.environ.get("SEARCH_CANDIDATES", "1000"))
+SEARCH_RECENCY_DAYS = float(os.environ.get("SEARCH_RECENCY_DAYS", "30"))
+
+# Change feed (api/changelog.py): GET /sync/ returns up to SYNC_PAGE_SIZE log
+# entries per call; entries older than SYNC_RETENTION_DAYS are purged, and
+# clients holding an older token are told to resync in full.
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", "500"))
+SYNC_RETENTION_DAYS = int(os.environ.get("SYNC_RETENTION_DAYS", "30"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -15,10 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
-from django.urls import path, include
+from django.urls import URLResolver, path, include
+from django.urls.resolvers import RoutePattern
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
+    # The admin URLconf is given by name, so the admin site is only imported
+    # once an /admin/ URL is resolved or reversed.
+    URLResolver(RoutePattern("admin/"), "config.admin_urls", app_name="admin", namespace="admin"),
     path("api/", include("api.urls")),
 ]
@@ -3,36 +3,60 @@ set -euxo pipefail
 
 echo "==> Django Pre-Start Script"
 
-# Remove existing database for fresh start on each deploy
-echo "==> Removing existing database..."
-if [ -f "/app/persistent/db/db.sqlite3" ]; then
-    rm -f /app/persistent/db/db.sqlite3
-    echo "==> Database removed successfully"
-else
-    echo "==> No existing database found, creating new one"
-fi
+DB_PATH=/app/persistent/db/db.sqlite3
+DB_TEMPLATE=/app/db-template.sqlite3
+
+# DB_BOOT_MODE:
+#   preserve (default) - keep the existing database; without one, restore the
+#                        latest snapshot, or start from the pre-migrated template
+#   fresh              - snapshot the existing database, then start over from
+#                        the template
+#   restore            - replace the database with DB_RESTORE_FROM or the
+#                        latest snapshot
+DB_BOOT_MODE="${DB_BOOT_MODE:-preserve}"
 
 # Create persistent dirs
 /bin/mkdir -p /app/persistent/db
 /bin/mkdir -p /app/persistent/media
+/bin/mkdir -p /app/persistent/snapshots
+
+[ -f "$DB_PATH" ] && DB_INIT=false || DB_INIT=true
+
+# Provisioning is a page copy with the SQLite backup API and does not start
+# Django. Exit status 3 means the database is behind the image's migrations.
+PROVISION_STATUS=0
+/opt/venv/bin/python -m api.snapshots provision \
+    --database "$DB_PATH" \
+    --template "$DB_TEMPLATE" \
+    --snapshots /app/persistent/snapshots \
+    --mode "$DB_BOOT_MODE" \
+    ${DB_RESTORE_FROM:+--restore-from "$DB_RESTORE_FROM"} || PROVISION_STATUS=$?
+
+if [ "$PROVISION_STATUS" -eq 3 ]; then
+    echo "==> Running database migrations..."
+    DJANGO_SETTINGS_MODULE="config.settings" /opt/venv/bin/python \
+        manage.py migrate --noinput
+elif [ "$PROVISION_STATUS" -ne 0 ]; then
+    exit "$PROVISION_STATUS"
+fi
 
-# Run migrations
-echo "==> Running database migrations..."
-
-[ -f "/app/persistent/db/db.sqlite3" ] && DB_INIT=false || DB_INIT=true
-
-DJANGO_SETTINGS_MODULE="config.settings" /opt/venv/bin/python \
-    manage.py migrate --noinput
-
-if [ "$DB_INIT" = true ]; then
-    DJANGO_SETTINGS_MODULE="config.settings" DJANGO_SUPERUSER_PASSWORD="$DJANGO_SUPERUSER_PASSWORD" /opt/venv/bin/python \
-        manage.py createsuperuser --noinput \
-        --username "$DJANGO_SUPERUSER_USERNAME" \
-        --email "$DJANGO_SUPERUSER_EMAIL"
+# A database created or replaced at this boot gets the superuser from the
+# runtime environment, unless it already has one (a restored snapshot). The
+# template is built without users, so no credential is baked into the image.
+if [ "$DB_INIT" = true ] || [ "$DB_BOOT_MODE" != preserve ]; then
+    if ! DJANGO_SETTINGS_MODULE="config.settings" /opt/venv/bin/python manage.py shell -c \
+        "import os; from django.contrib.auth import get_user_model; raise SystemExit(0 if get_user_model().objects.filter(username=os.environ['DJANGO_SUPERUSER_USERNAME']).exists() else 1)"; then
+        DJANGO_SETTINGS_MODULE="config.settings" DJANGO_SUPERUSER_PASSWORD="$DJANGO_SUPERUSER_PASSWORD" /opt/venv/bin/python \
+            manage.py createsuperuser --noinput \
+            --username "$DJANGO_SUPERUSER_USERNAME" \
+            --email "$DJANGO_SUPERUSER_EMAIL"
+    fi
 fi
 
-/bin/chown -R appuser:appuser /app/persistent
+# Only the database files change owner at boot; media is written by appuser.
+/bin/chown appuser:appuser /app/persistent /app/persistent/media
+/bin/chown -R appuser:appuser /app/persistent/db /app/persistent/snapshots
 
 echo "==> Pre-start script completed successfully!"
 
-exec /usr/bin/supervisord -c /etc/supervisor/conf.d/supervisord.conf
\ No newline at end of file
+exec /usr/bin/supervisord -c /etc/supervisor/conf.d/supervisord.conf
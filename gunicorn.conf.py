@@ -1,11 +1,17 @@
 """Gunicorn configuration for Docker deployment"""
 
+import os
+
 # Server socket - bind to different port for nginx upstream
 bind = "127.0.0.1:8001"
 
 # Worker processes
-workers = 2
-worker_class = "sync"
+# config/settings.py sizes the password hashing pool from the same variables.
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+# Threaded workers keep serving other requests while a thread waits on the
+# password hashing pool (see api/hashing.py).
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
 worker_connections = 1000
 max_requests = 10000
 max_requests_jitter = 1000
@@ -36,3 +42,13 @@ limit_request_field_size = 8190
 
 # Preload app for better performance
 preload_app = True
+
+
+def when_ready(server):
+    # preload_app imports the WSGI application in the master, but the URLconf
+    # (and with it every view module) is otherwise only loaded by each
+    # worker's first request. Load it before workers are forked so that new
+    # and respawned workers inherit it.
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns